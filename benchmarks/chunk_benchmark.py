@@ -0,0 +1,63 @@
+"""Compares the native character chunker with the LangChain CharacterTextSplitter path it replaced.
+
+    python -m benchmarks.chunk_benchmark [--docs 2000] [--size 500] [--overlap 50]
+"""
+
+import argparse
+import time
+
+from essential_generators import DocumentGenerator
+from langchain.text_splitter import CharacterTextSplitter
+
+from chroma_dp import EmbeddableTextResource
+from chroma_dp.processor.chunk import ChunkProcessor
+from chroma_dp.processor.langchain_utils import (
+    convert_chroma_emb_resource_to_lc_doc,
+    convert_lc_doc_to_chroma_resource,
+)
+
+
+def langchain_chunks(docs, size, overlap):
+    # a splitter per document, as `cdp chunk` did
+    for doc in docs:
+        splitter = CharacterTextSplitter(
+            separator="\n", chunk_size=size, chunk_overlap=overlap, add_start_index=True
+        )
+        for split_doc in splitter.split_documents(
+            [convert_chroma_emb_resource_to_lc_doc(doc)]
+        ):
+            yield convert_lc_doc_to_chroma_resource(split_doc, doc.metadata)
+
+
+def native_chunks(docs, size, overlap):
+    processor = ChunkProcessor(size=size, overlap=overlap, add_start_index=True)
+    yield from processor.process(documents=docs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=50)
+    args = parser.parse_args()
+    generator = DocumentGenerator()
+    docs = [
+        EmbeddableTextResource(
+            text_chunk="\n".join(generator.sentence() for _ in range(30)),
+            metadata={"source": f"doc-{i}.txt", "page": i},
+            id=str(i),
+            embedding=None,
+        )
+        for i in range(args.docs)
+    ]
+    for name, chunk in [("langchain", langchain_chunks), ("native", native_chunks)]:
+        start = time.perf_counter()
+        count = sum(1 for _ in chunk(docs, args.size, args.overlap))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:>10}: {count} chunks in {elapsed:.3f}s ({args.docs / elapsed:.0f} docs/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -68,7 +68,7 @@ class EmbeddableTextResource(EmbeddableResource):
     def model_dump(self, **kwargs):
         # Convert NumPy arrays to lists before dumping
         data = super().model_dump(**kwargs)
-        if isinstance(data["embedding"], np.ndarray):
+        if isinstance(data.get("embedding"), np.ndarray):
             data["embedding"] = data["embedding"].tolist()
         return data
 
@@ -0,0 +1,385 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from typing import Annotated, Optional, List, Dict, Any, Set, Tuple, Iterable
+
+import numpy as np
+import orjson as json
+import typer
+from chromadb import EmbeddingFunction, Where, WhereDocument
+from chromadb.api.models import Collection
+from chromadb.api.types import validate_where, validate_where_document
+
+from chroma_dp.utils.chroma import CDPUri, get_client_for_uri
+from chroma_dp.utils.embedding import (
+    SupportedEmbeddingFunctions,
+    get_embedding_function_for_name,
+)
+
+
+PageKey = Tuple[Any, ...]
+
+
+def page_key(
+    offset: Optional[int] = None,
+    limit: Optional[int] = None,
+    ids: Optional[List[str]] = None,
+) -> PageKey:
+    """The checkpoint key of a page - its offset and limit, or a digest of its ids for pages selected by id."""
+    if ids is not None:
+        digest = hashlib.blake2b("\0".join(ids).encode("utf-8"), digest_size=16)
+        return ("ids", digest.hexdigest())
+    return (offset, limit)
+
+
+def _collection_scope(uri: CDPUri) -> Dict[str, Any]:
+    """The location of the collection of a URI, without its credentials and options."""
+    return {
+        "host_or_path": uri.host_or_path,
+        "port": uri.port,
+        "tenant": uri.tenant,
+        "database": uri.database,
+        "collection": uri.collection,
+    }
+
+
+class CopyCheckpoint:
+    """Append-only log of source pages that were written to the destination. Used to resume interrupted copies.
+
+    The first line of the log is a digest of the `scope` of the copy (the source and destination collections and the
+    filters), a copy with a different scope cannot resume from it - its pages would match the ones of the other copy.
+    """
+
+    def __init__(
+        self, path: Optional[str] = None, scope: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._done: Set[PageKey] = set()
+        scope_digest = hashlib.blake2b(
+            json.dumps(scope, option=json.OPT_SORT_KEYS), digest_size=16
+        ).hexdigest()
+        if path and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+            if not lines or lines[0].get("scope") != scope_digest:
+                raise ValueError(
+                    f"The checkpoint {path} was written by a copy with a different source, destination or filters. "
+                    "Remove it to start over, or use another checkpoint file."
+                )
+            for page in lines[1:]:
+                if "ids" in page:
+                    self._done.add(("ids", page["ids"]))
+                else:
+                    self._done.add((page["offset"], page["limit"]))
+        elif path:
+            with open(path, "wb") as f:
+                f.write(json.dumps({"scope": scope_digest}) + b"\n")
+
+    def is_done(self, key: PageKey) -> bool:
+        return key in self._done
+
+    def mark_done(self, key: PageKey) -> None:
+        if not self._path:
+            return
+        with self._lock:
+            self._done.add(key)
+            line = (
+                {"ids": key[1]}
+                if key[0] == "ids"
+                else {"offset": key[0], "limit": key[1]}
+            )
+            with open(self._path, "ab") as f:
+                f.write(json.dumps(line) + b"\n")
+
+
+def _read_page(
+    collection: Collection,
+    queue: "Queue[Optional[Dict[str, Any]]]",
+    stop: threading.Event,
+    errors: List[BaseException],
+    offset: Optional[int] = None,
+    limit: Optional[int] = None,
+    where: Optional[Where] = None,
+    where_document: Optional[WhereDocument] = None,
+    include: Optional[List[str]] = None,
+    ids: Optional[List[str]] = None,
+) -> None:
+    """Reads a page from the source collection and puts it on the (bounded) queue. Pages selected by `ids` are read
+    without an offset, as Chroma applies it within the matching records."""
+    if stop.is_set():
+        return
+    try:
+        result = collection.get(
+            ids=ids,
+            where=where,
+            where_document=where_document,
+            limit=limit,
+            offset=offset if ids is None else None,
+            include=include or ["embeddings", "documents", "metadatas"],
+        )
+        _embeddings = result.get("embeddings")
+        queue.put(
+            {
+                "key": page_key(offset, limit, ids),
+                "ids": result["ids"],
+                "documents": result.get("documents"),
+                "metadatas": result.get("metadatas"),
+                # a single contiguous array per page, no per-record conversions
+                "embeddings": (
+                    np.asarray(_embeddings, dtype=np.float32)
+                    if _embeddings is not None and len(result["ids"]) > 0
+                    else None
+                ),
+            }
+        )
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+
+
+def _write_pages(
+    collection: Collection,
+    queue: "Queue[Optional[Dict[str, Any]]]",
+    stop: threading.Event,
+    errors: List[BaseException],
+    checkpoint: CopyCheckpoint,
+    upsert: bool = True,
+    ef: Optional[EmbeddingFunction] = None,  # type: ignore
+) -> int:
+    """Writes pages from the queue to the destination collection until a sentinel (None) is received."""
+    written = 0
+    while True:
+        page = queue.get()
+        if page is None:
+            return written
+        if stop.is_set():
+            # keep draining so that readers never block on a full queue
+            continue
+        try:
+            if len(page["ids"]) > 0:
+                embeddings = page["embeddings"]
+                if ef is not None:
+                    embeddings = np.asarray(ef(page["documents"]), dtype=np.float32)
+                batch = {
+                    "ids": page["ids"],
+                    "documents": page["documents"],
+                    "metadatas": page["metadatas"],
+                    # Chroma clients < 0.6 only accept lists, convert the whole page at once
+                    "embeddings": embeddings.tolist(),
+                }
+                if upsert:
+                    collection.upsert(**batch)
+                else:
+                    collection.add(**batch)
+                written += len(page["ids"])
+            checkpoint.mark_done(page["key"])
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+
+def chroma_copy(
+    src_uri: str,
+    dst_uri: str,
+    limit: Optional[int] = -1,
+    offset: Optional[int] = 0,
+    batch_size: Optional[int] = 100,
+    where: Optional[str] = None,
+    where_document: Optional[str] = None,
+    create: bool = False,
+    upsert: bool = True,
+    embedding_function: Optional[SupportedEmbeddingFunctions] = None,
+    embedding_model: Optional[str] = None,
+    read_threads: int = 2,
+    write_threads: int = 2,
+    checkpoint: Optional[str] = None,
+) -> int:
+    """Copies records between two Chroma collections without serializing them. Returns the number of copied records."""
+    parsed_src_uri = CDPUri.from_uri(src_uri)
+    parsed_dst_uri = CDPUri.from_uri(dst_uri)
+    src_client = get_client_for_uri(parsed_src_uri)
+    dst_client = get_client_for_uri(parsed_dst_uri)
+    _batch_size = parsed_src_uri.batch_size or batch_size
+    _offset = parsed_src_uri.offset or offset
+    _limit = parsed_src_uri.limit or limit
+    _start = _offset if _offset > 0 else 0
+    _create = parsed_dst_uri.create_collection or create
+    src_collection = src_client.get_collection(parsed_src_uri.collection)
+    if _create:
+        dst_collection = dst_client.get_or_create_collection(
+            parsed_dst_uri.collection, metadata=src_collection.metadata
+        )
+    else:
+        dst_collection = dst_client.get_collection(parsed_dst_uri.collection)
+    _ef = None
+    include = ["embeddings", "documents", "metadatas"]
+    if embedding_function is not None:
+        _ef = get_embedding_function_for_name(embedding_function, model=embedding_model)
+        # embeddings are recomputed, no need to transfer them
+        include = ["documents", "metadatas"]
+    _where = None
+    if where:
+        _where = validate_where(json.loads(where))
+    _where_document = None
+    if where_document:
+        _where_document = validate_where_document(json.loads(where_document))
+    col_count = src_collection.count()
+    total_results_to_fetch = min(col_count, _limit) if _limit > 0 else col_count
+    _checkpoint = CopyCheckpoint(
+        checkpoint,
+        scope={
+            "src": _collection_scope(parsed_src_uri),
+            "dst": _collection_scope(parsed_dst_uri),
+            "where": _where,
+            "where_document": _where_document,
+        },
+    )
+    pages = []
+    for page_offset in range(_start, total_results_to_fetch, _batch_size):
+        page_limit = min(total_results_to_fetch - page_offset, _batch_size)
+        if _checkpoint.is_done(page_key(page_offset, page_limit)):
+            continue
+        pages.append(
+            {
+                "offset": page_offset,
+                "limit": page_limit,
+                "where": _where,
+                "where_document": _where_document,
+            }
+        )
+    return copy_pages(
+        src_collection,
+        dst_collection,
+        pages,
+        include=include,
+        read_threads=read_threads,
+        write_threads=write_threads,
+        checkpoint=_checkpoint,
+        upsert=upsert,
+        ef=_ef,
+    )
+
+
+def copy_pages(
+    src_collection: Collection,
+    dst_collection: Collection,
+    pages: Iterable[Dict[str, Any]],
+    include: Optional[List[str]] = None,
+    read_threads: int = 2,
+    write_threads: int = 2,
+    checkpoint: Optional[CopyCheckpoint] = None,
+    upsert: bool = True,
+    ef: Optional[EmbeddingFunction] = None,  # type: ignore
+) -> int:
+    """Copies pages (`offset` and `limit`, or `ids`, and optional `where`, `where_document`) using parallel readers and
+    writers."""
+    _checkpoint = checkpoint or CopyCheckpoint()
+    # bounded so that fast readers cannot outrun slow writers (and vice versa)
+    queue: "Queue[Optional[Dict[str, Any]]]" = Queue(
+        maxsize=read_threads + write_threads
+    )
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    with ThreadPoolExecutor(max_workers=write_threads) as writers:
+        writer_futures = [
+            writers.submit(
+                _write_pages,
+                dst_collection,
+                queue,
+                stop,
+                errors,
+                _checkpoint,
+                upsert,
+                ef,
+            )
+            for _ in range(write_threads)
+        ]
+        with ThreadPoolExecutor(max_workers=read_threads) as readers:
+            for page in pages:
+                readers.submit(
+                    _read_page,
+                    src_collection,
+                    queue,
+                    stop,
+                    errors,
+                    include=include,
+                    **page,
+                )
+        for _ in range(write_threads):
+            queue.put(None)
+        copied = sum(f.result() for f in writer_futures)
+    if errors:
+        raise errors[0]
+    return copied
+
+
+def chroma_copy_cli(
+    src_uri: Annotated[str, typer.Argument(help="The source Chroma endpoint.")],
+    dst_uri: Annotated[str, typer.Argument(help="The destination Chroma endpoint.")],
+    limit: Annotated[int, typer.Option(help="The limit.")] = -1,
+    offset: Annotated[int, typer.Option(help="The offset.")] = 0,
+    batch_size: Annotated[int, typer.Option(help="The batch size.")] = 100,
+    where: Optional[str] = typer.Option(
+        None,
+        "--where",
+        "-m",
+        help='Metadata filter. JSON with Chroma syntax is expected - \'{"metadata_key": "metadata_value"}\'',
+    ),
+    where_document: Optional[str] = typer.Option(
+        None,
+        "--where-document",
+        "-d",
+        help='Document filter string - JSON with Chroma syntax is expected - \'{"$contains": "search for this"}\'',
+    ),
+    create: Annotated[
+        bool,
+        typer.Option(
+            help="Create the destination collection (with the source collection metadata) if it does not exist."
+        ),
+    ] = False,
+    upsert: Annotated[
+        bool,
+        typer.Option(help="Upsert documents. Required for idempotent resumes."),
+    ] = True,
+    embedding_function: Optional[SupportedEmbeddingFunctions] = typer.Option(
+        None, "--ef", help="Re-embed the documents with this embedding function."
+    ),
+    embedding_model: Optional[str] = typer.Option(
+        None,
+        "--model",
+        help="The embedding model to be used by the embedding function.",
+    ),
+    read_threads: Annotated[
+        int,
+        typer.Option("--read-threads", "-r", help="The number of reader threads."),
+    ] = 2,
+    write_threads: Annotated[
+        int,
+        typer.Option("--write-threads", "-w", help="The number of writer threads."),
+    ] = 2,
+    checkpoint: Optional[str] = typer.Option(
+        None,
+        "--checkpoint",
+        help="Checkpoint file. Pages recorded in it are skipped, which allows resuming an interrupted copy.",
+    ),
+) -> None:
+    copied = chroma_copy(
+        src_uri=src_uri,
+        dst_uri=dst_uri,
+        limit=limit,
+        offset=offset,
+        batch_size=batch_size,
+        where=where,
+        where_document=where_document,
+        create=create,
+        upsert=upsert,
+        embedding_function=embedding_function,
+        embedding_model=embedding_model,
+        read_threads=read_threads,
+        write_threads=write_threads,
+        checkpoint=checkpoint,
+    )
+    typer.echo(f"Copied {copied} records.", err=True)
@@ -9,18 +9,29 @@ from chromadb.api.models import Collection
 from chromadb.api.types import validate_where, validate_where_document
 
 from chroma_dp import EmbeddableTextResource
-from chroma_dp.utils.chroma import CDPUri, get_client_for_uri
+from chroma_dp.utils import smart_open
+from chroma_dp.utils.chroma import CDPUri, get_client_for_uri, IncludeFeature
+
+# maps Chroma include features to EmbeddableTextResource fields
+_RECORD_FEATURES = {
+    IncludeFeature.documents.value: "text_chunk",
+    IncludeFeature.embeddings.value: "embedding",
+    IncludeFeature.metadatas.value: "metadata",
+}
 
 
 def _get_result_to_chroma_doc_list(result: GetResult) -> List[EmbeddableTextResource]:
-    """Converts a GetResult to a list of ChromaDocuments."""
+    """Converts a GetResult to a list of ChromaDocuments. Features that were not included in the result are None."""
+    _documents = result.get("documents")
+    _embeddings = result.get("embeddings")
+    _metadatas = result.get("metadatas")
     docs = []
     for idx, _ in enumerate(result["ids"]):
         docs.append(
             EmbeddableTextResource(
-                text_chunk=result["documents"][idx],
-                embedding=result["embeddings"][idx],
-                metadata=result["metadatas"][idx],
+                text_chunk=_documents[idx] if _documents is not None else None,
+                embedding=_embeddings[idx] if _embeddings is not None else None,
+                metadata=_metadatas[idx] if _metadatas is not None else None,
                 id=result["ids"][idx],
             )
         )
@@ -34,7 +45,7 @@ def remap_features(
     id_feature: str = "id",
     meta_features: Optional[List[str]] = None,
 ) -> Dict[str, Any]:
-    """Remaps EmbeddableTextResource features to a dictionary."""
+    """Remaps EmbeddableTextResource features to a dictionary. Features set to None are skipped."""
 
     _metas = (
         doc.metadata
@@ -45,10 +56,14 @@ def remap_features(
             if doc.metadata is not None and k in doc.metadata
         }
     )
+    _remapped: Dict[str, Any] = {}
+    if doc_feature:
+        _remapped[doc_feature] = doc.text_chunk
+    if embed_feature:
+        _remapped[embed_feature] = doc.embedding
+    _remapped[id_feature] = doc.id
     return {
-        f"{doc_feature}": doc.text_chunk,
-        f"{embed_feature}": doc.embedding,
-        f"{id_feature}": doc.id,
+        **_remapped,
         **(_metas if _metas is not None else {}),
     }
 
@@ -60,6 +75,7 @@ def read_large_data_in_chunks(
     limit: Optional[int] = None,
     where: Where = None,
     where_document: WhereDocument = None,
+    include: Optional[List[str]] = None,
 ):
     """Reads large data in chunks from ChromaDB."""
     result = collection.get(
@@ -67,7 +83,9 @@ def read_large_data_in_chunks(
         where_document=where_document,
         limit=limit,
         offset=offset,
-        include=["embeddings", "documents", "metadatas"],
+        include=(
+            include if include is not None else ["embeddings", "documents", "metadatas"]
+        ),
     )
     try:
         queue.put(result)
@@ -89,8 +107,15 @@ def chroma_export(
     where_document: Optional[str] = None,
     format_output: Optional[str] = "record",
     max_threads: Optional[int] = 1,
+    include: Optional[List[str]] = None,
 ) -> Generator[Dict[str, Any], None, None]:
-    """Exports data from ChromaDB."""
+    """Exports data from ChromaDB. Only the `include` features (and ids) are fetched and serialized."""
+    _include = (
+        [IncludeFeature(i).value for i in include]
+        if include
+        else [f.value for f in IncludeFeature]
+    )
+    _exclude = {v for k, v in _RECORD_FEATURES.items() if k not in _include}
     parsed_uri = CDPUri.from_uri(uri)
     client = get_client_for_uri(parsed_uri)
     _collection = parsed_uri.collection or collection
@@ -100,8 +125,9 @@ def chroma_export(
     _start = _offset if _offset > 0 else 0
     chroma_collection = client.get_collection(_collection)
     col_count = chroma_collection.count()
-    # precondition the DB for fetching data
-    chroma_collection.get(limit=1, include=["embeddings"])  # noqa
+    if IncludeFeature.embeddings.value in _include:
+        # precondition the DB for fetching data
+        chroma_collection.get(limit=1, include=["embeddings"])  # noqa
     total_results_to_fetch = min(col_count, _limit) if _limit > 0 else col_count
     _where = None
     if where:
@@ -125,6 +151,7 @@ def chroma_export(
                 limit=batch_limit,
                 where=_where,
                 where_document=_where_document,
+                include=_include,
             )
 
         while fetched_results < total_results_to_fetch:
@@ -136,13 +163,21 @@ def chroma_export(
             _results = _get_result_to_chroma_doc_list(_results)
             fetched_results += len(_results)
             if format_output == "record":
-                _final_results = [r.model_dump() for r in _results]
+                _final_results = [r.model_dump(exclude=_exclude) for r in _results]
             elif format_output == "jsonl":
                 _final_results = [
                     remap_features(
                         doc,
-                        doc_feature=doc_feature,
-                        embed_feature=embed_feature,
+                        doc_feature=(
+                            doc_feature
+                            if IncludeFeature.documents.value in _include
+                            else None
+                        ),
+                        embed_feature=(
+                            embed_feature
+                            if IncludeFeature.embeddings.value in _include
+                            else None
+                        ),
                         id_feature=id_feature,
                         meta_features=meta_features,
                     )
@@ -160,7 +195,9 @@ def chroma_export_cli(
         Optional[str], typer.Option(help="The Chroma collection.")
     ] = None,
     export_file: Optional[str] = typer.Option(
-        None, "--out", help="Export .jsonl file."
+        None,
+        "--out",
+        help="Export .jsonl file. Files ending with .gz, .zst or .lz4 are compressed.",
     ),
     append: Annotated[bool, typer.Option(help="Append to export file.")] = False,
     limit: Annotated[int, typer.Option(help="The limit.")] = -1,
@@ -196,12 +233,16 @@ def chroma_export_cli(
     max_threads: Optional[int] = typer.Option(
         1, "--max-threads", "-t", help="The maximum number of threads."
     ),
+    include: Optional[List[IncludeFeature]] = typer.Option(
+        None,
+        "--include",
+        "-i",
+        help="The features to export. Can be repeated e.g. `--include metadatas --include documents`. "
+        "IDs are always exported. Default is all features.",
+    ),
 ) -> None:
-    if export_file and not append:
-        with open(export_file, "w") as f:
-            f.write("")
     if export_file:
-        with open(export_file, "a") as f:
+        with smart_open(export_file, mode="a" if append else "w") as f:
             for _doc in chroma_export(
                 uri=uri,
                 collection=collection,
@@ -216,8 +257,9 @@ def chroma_export_cli(
                 where_document=where_document,
                 format_output=format_output,
                 max_threads=max_threads,
+                include=include,
             ):
-                f.write(str(json.dumps(_doc)) + "\n")
+                f.write(json.dumps(_doc).decode() + "\n")
     else:
         for _doc in chroma_export(
             uri=uri,
@@ -233,5 +275,6 @@ def chroma_export_cli(
             where_document=where_document,
             format_output=format_output,
             max_threads=max_threads,
+            include=include,
         ):
             typer.echo(json.dumps(_doc))
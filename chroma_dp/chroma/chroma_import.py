@@ -14,6 +14,8 @@ from chroma_dp.utils.embedding import (
     SupportedEmbeddingFunctions,
     get_embedding_function_for_name,
 )
+from chroma_dp.utils.embedding_cache import get_cache_stats
+from chroma_dp.utils.embedding_executor import LengthBucketedEmbeddingFunction
 from chroma_dp.utils.chroma import (
     CDPUri,
     get_client_for_uri,
@@ -27,6 +29,7 @@ def add_to_col(
     batch: Dict[str, Any],
     upsert: bool = False,
     ef: EmbeddingFunction = None,
+    add_batch_size: Optional[int] = None,
 ) -> None:
     try:
         if "embeddings" in batch and len(batch["embeddings"]) > 0:
@@ -36,10 +39,13 @@ def add_to_col(
             ]
         if ef:
             batch["embeddings"] = ef(batch["documents"])
-        if upsert:
-            col.upsert(**batch)
-        else:
-            col.add(**batch)
+        _step = max(add_batch_size or len(batch["ids"]), 1)
+        for i in range(0, len(batch["ids"]), _step):
+            _add_batch = {k: v[i : i + _step] for k, v in batch.items()}
+            if upsert:
+                col.upsert(**_add_batch)
+            else:
+                col.add(**_add_batch)
     except Exception as e:
         print(e, file=sys.stderr)
         raise e
@@ -84,16 +90,37 @@ def chroma_import(
     max_threads: Optional[int] = typer.Option(
         1, "--max-threads", "-t", help="The maximum number of threads."
     ),
+    length_window: Annotated[
+        int,
+        typer.Option(
+            help="Buffer this many documents, sort them by length and embed them in batches (of --batch-size) of "
+            "similar length. Reduces padding for local embedding functions."
+        ),
+    ] = 0,
+    embed_workers: Annotated[
+        int,
+        typer.Option(
+            help="Run local embedding functions (default, st) in this many processes, each with its own model and "
+            "an equal share of the CPU cores."
+        ),
+    ] = 0,
 ) -> None:
     _embedding_function = None
     if embedding_function is not None:
-        _embedding_function = get_embedding_function_for_name(embedding_function)
+        _embedding_function = get_embedding_function_for_name(
+            embedding_function, embed_workers=embed_workers
+        )
+    _ef = _embedding_function
     if uri is None:
         raise ValueError("Please provide a ChromaDP URI.")
     parsed_uri = CDPUri.from_uri(uri)
     client = get_client_for_uri(parsed_uri)
     _collection = parsed_uri.collection or collection
     _batch_size = parsed_uri.batch_size or batch_size
+    _read_size = _batch_size
+    if length_window > 0 and _embedding_function is not None:
+        _ef = LengthBucketedEmbeddingFunction(_embedding_function, _batch_size)
+        _read_size = max(length_window, _batch_size)
     _offset = parsed_uri.offset or offset
     _limit = parsed_uri.limit or limit
     _upsert = parsed_uri.upsert or upsert
@@ -134,13 +161,14 @@ def chroma_import(
                 )  # call EF?
                 _batch["metadatas"].append(doc.metadata)
                 _batch["ids"].append(doc.id if doc.id else uuid.uuid4())
-                if len(_batch["documents"]) >= _batch_size:
+                if len(_batch["documents"]) >= _read_size:
                     executor.submit(
                         add_to_col,
                         chroma_collection,
                         _batch,
                         _upsert,
-                        _embedding_function,
+                        _ef,
+                        _batch_size,
                     )
                     _batch = {
                         "documents": [],
@@ -151,5 +179,16 @@ def chroma_import(
                 lc_count += 1
             if len(_batch["documents"]) > 0:
                 executor.submit(
-                    add_to_col, chroma_collection, _batch, _upsert, _embedding_function
+                    add_to_col,
+                    chroma_collection,
+                    _batch,
+                    _upsert,
+                    _ef,
+                    _batch_size,
                 )
+    _cache_stats = get_cache_stats(_embedding_function)
+    if _cache_stats:
+        typer.echo(
+            f"Embedding cache: {_cache_stats['hits']} hits, {_cache_stats['misses']} misses.",
+            err=True,
+        )
@@ -0,0 +1,304 @@
+import hashlib
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Optional, List, Dict, Any, Tuple, Set, Iterator, Callable
+
+import numpy as np
+import orjson as json
+import typer
+from chromadb import GetResult
+from chromadb.api.models import Collection
+
+from chroma_dp.chroma.chroma_copy import copy_pages
+from chroma_dp.utils.chroma import CDPUri, get_client_for_uri
+
+
+def _record_hash(
+    id: str,
+    document: Optional[str],
+    metadata: Optional[Dict[str, Any]],
+    embedding: Optional[Any] = None,
+) -> int:
+    """64-bit hash of a record's id and content."""
+    h = hashlib.blake2b(digest_size=8)
+    h.update(id.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps([document, metadata], option=json.OPT_SORT_KEYS))
+    if embedding is not None:
+        h.update(np.asarray(embedding, dtype=np.float32).tobytes())
+    return int.from_bytes(h.digest(), "little")
+
+
+def _bucket(id: str, num_buckets: int) -> int:
+    return zlib.crc32(id.encode("utf-8")) % num_buckets
+
+
+def _records(result: GetResult) -> Iterator[Tuple[str, int]]:
+    """The ids and hashes of the records of a result."""
+    _documents = result.get("documents")
+    _metadatas = result.get("metadatas")
+    _embeddings = result.get("embeddings")
+    for idx, _id in enumerate(result["ids"]):
+        yield _id, _record_hash(
+            _id,
+            _documents[idx] if _documents is not None else None,
+            _metadatas[idx] if _metadatas is not None else None,
+            _embeddings[idx] if _embeddings is not None else None,
+        )
+
+
+class CollectionDigest:
+    """Hash-bucketed digest of a collection.
+
+    Records are assigned to buckets by id. Each bucket keeps the XOR of its record hashes and its record count, so the
+    digest takes O(buckets) memory whatever the size of the collection. Buckets with matching digests are skipped,
+    and only the records of the differing buckets are compared (see `bucket_records`).
+    """
+
+    def __init__(self, num_buckets: int = 4096) -> None:
+        self.num_buckets = num_buckets
+        self.bucket_digests = [0] * num_buckets
+        self.bucket_counts = [0] * num_buckets
+
+    def add(
+        self,
+        id: str,
+        document: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        embedding: Optional[Any] = None,
+    ) -> None:
+        self._add(id, _record_hash(id, document, metadata, embedding))
+
+    def _add(self, id: str, record_hash: int) -> None:
+        bucket = _bucket(id, self.num_buckets)
+        self.bucket_digests[bucket] ^= record_hash
+        self.bucket_counts[bucket] += 1
+
+    def add_result(self, result: GetResult) -> None:
+        for _id, record_hash in _records(result):
+            self._add(_id, record_hash)
+
+    def differing_buckets(self, other: "CollectionDigest") -> Set[int]:
+        """The buckets whose records differ in `other`."""
+        if self.num_buckets != other.num_buckets:
+            raise ValueError("Cannot compare digests with different number of buckets.")
+        return {
+            bucket
+            for bucket in range(self.num_buckets)
+            if self.bucket_digests[bucket] != other.bucket_digests[bucket]
+            or self.bucket_counts[bucket] != other.bucket_counts[bucket]
+        }
+
+
+def diff_records(
+    ours: Dict[str, int], theirs: Dict[str, int]
+) -> Tuple[List[str], List[str]]:
+    """Returns the ids missing or changed in `theirs` and the ids only present in `theirs`."""
+    changed = [_id for _id, h in ours.items() if theirs.get(_id) != h]
+    extra = [_id for _id in theirs.keys() if _id not in ours]
+    return changed, extra
+
+
+def _get_page(
+    collection: Collection, offset: int, limit: int, include: List[str]
+) -> GetResult:
+    return collection.get(offset=offset, limit=limit, include=include)  # type: ignore
+
+
+def _scan(
+    collection: Collection,
+    batch_size: int,
+    include: List[str],
+    max_threads: int,
+) -> Iterator[GetResult]:
+    """Reads the collection in parallel pages."""
+    count = collection.count()
+    offsets = list(range(0, count, batch_size))
+    with ThreadPoolExecutor(max_workers=max_threads) as executor:
+        yield from executor.map(
+            _get_page,
+            [collection] * len(offsets),
+            offsets,
+            [batch_size] * len(offsets),
+            [include] * len(offsets),
+        )
+
+
+def collection_digest(
+    collection: Collection,
+    num_buckets: int = 4096,
+    batch_size: int = 1000,
+    include: Optional[List[str]] = None,
+    max_threads: int = 2,
+) -> CollectionDigest:
+    """Scans the collection in parallel pages and builds its digest."""
+    _include = include if include is not None else ["documents", "metadatas"]
+    digest = CollectionDigest(num_buckets=num_buckets)
+    for result in _scan(collection, batch_size, _include, max_threads):
+        digest.add_result(result)
+    return digest
+
+
+def bucket_records(
+    collection: Collection,
+    buckets: Set[int],
+    num_buckets: int = 4096,
+    batch_size: int = 1000,
+    include: Optional[List[str]] = None,
+    max_threads: int = 2,
+) -> Dict[str, int]:
+    """Re-scans the collection and returns the ids and hashes of the records in the given buckets only."""
+    _include = include if include is not None else ["documents", "metadatas"]
+    records: Dict[str, int] = {}
+    for result in _scan(collection, batch_size, _include, max_threads):
+        for _id, record_hash in _records(result):
+            if _bucket(_id, num_buckets) in buckets:
+                records[_id] = record_hash
+    return records
+
+
+def _on_both_sides(
+    src_collection: Collection,
+    dst_collection: Collection,
+    function: Callable[..., Any],
+    *args: Any,
+) -> Tuple[Any, Any]:
+    """Runs the function on both collections concurrently."""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        src_future = executor.submit(function, src_collection, *args)
+        dst_future = executor.submit(function, dst_collection, *args)
+        return src_future.result(), dst_future.result()
+
+
+def chroma_sync(
+    src_uri: str,
+    dst_uri: str,
+    batch_size: int = 1000,
+    num_buckets: int = 4096,
+    compare_embeddings: bool = False,
+    delete: bool = True,
+    dry_run: bool = False,
+    create: bool = False,
+    read_threads: int = 2,
+    write_threads: int = 2,
+) -> Dict[str, int]:
+    """Syncs the destination collection with the source. Only missing or changed records are transferred."""
+    parsed_src_uri = CDPUri.from_uri(src_uri)
+    parsed_dst_uri = CDPUri.from_uri(dst_uri)
+    src_client = get_client_for_uri(parsed_src_uri)
+    dst_client = get_client_for_uri(parsed_dst_uri)
+    _batch_size = parsed_src_uri.batch_size or batch_size
+    _create = parsed_dst_uri.create_collection or create
+    src_collection = src_client.get_collection(parsed_src_uri.collection)
+    if _create:
+        dst_collection = dst_client.get_or_create_collection(
+            parsed_dst_uri.collection, metadata=src_collection.metadata
+        )
+    else:
+        dst_collection = dst_client.get_collection(parsed_dst_uri.collection)
+    include = ["documents", "metadatas"]
+    if compare_embeddings:
+        include.append("embeddings")
+    # both sides are scanned concurrently, first for their bucket digests, then again for the ids and hashes of the
+    # records in the differing buckets only
+    src_digest, dst_digest = _on_both_sides(
+        src_collection,
+        dst_collection,
+        collection_digest,
+        num_buckets,
+        _batch_size,
+        include,
+        read_threads,
+    )
+    buckets = src_digest.differing_buckets(dst_digest)
+    changed: List[str] = []
+    extra: List[str] = []
+    if buckets:
+        src_records, dst_records = _on_both_sides(
+            src_collection,
+            dst_collection,
+            bucket_records,
+            buckets,
+            num_buckets,
+            _batch_size,
+            include,
+            read_threads,
+        )
+        changed, extra = diff_records(src_records, dst_records)
+    differing_buckets = len(buckets)
+    stats = {
+        "buckets": num_buckets,
+        "differing_buckets": differing_buckets,
+        "changed": len(changed),
+        "extra": len(extra),
+        "upserted": 0,
+        "deleted": 0,
+    }
+    if dry_run:
+        return stats
+    if changed:
+        stats["upserted"] = copy_pages(
+            src_collection,
+            dst_collection,
+            [
+                {"ids": changed[i : i + _batch_size]}
+                for i in range(0, len(changed), _batch_size)
+            ],
+            read_threads=read_threads,
+            write_threads=write_threads,
+        )
+    if delete and extra:
+        for i in range(0, len(extra), _batch_size):
+            dst_collection.delete(ids=extra[i : i + _batch_size])
+        stats["deleted"] = len(extra)
+    return stats
+
+
+def chroma_sync_cli(
+    src_uri: Annotated[str, typer.Argument(help="The source Chroma endpoint.")],
+    dst_uri: Annotated[str, typer.Argument(help="The destination Chroma endpoint.")],
+    batch_size: Annotated[int, typer.Option(help="The batch size.")] = 1000,
+    buckets: Annotated[
+        int, typer.Option(help="The number of hash buckets of the digest.")
+    ] = 4096,
+    compare_embeddings: Annotated[
+        bool,
+        typer.Option(
+            help="Include embeddings in the record hashes. Slower, as embeddings must be fetched from both sides."
+        ),
+    ] = False,
+    delete: Annotated[
+        bool,
+        typer.Option(help="Delete records that are not present in the source."),
+    ] = True,
+    dry_run: Annotated[
+        bool, typer.Option(help="Only report the differences, do not sync.")
+    ] = False,
+    create: Annotated[
+        bool,
+        typer.Option(
+            help="Create the destination collection (with the source collection metadata) if it does not exist."
+        ),
+    ] = False,
+    read_threads: Annotated[
+        int,
+        typer.Option("--read-threads", "-r", help="The number of reader threads."),
+    ] = 2,
+    write_threads: Annotated[
+        int,
+        typer.Option("--write-threads", "-w", help="The number of writer threads."),
+    ] = 2,
+) -> None:
+    stats = chroma_sync(
+        src_uri=src_uri,
+        dst_uri=dst_uri,
+        batch_size=batch_size,
+        num_buckets=buckets,
+        compare_embeddings=compare_embeddings,
+        delete=delete,
+        dry_run=dry_run,
+        create=create,
+        read_threads=read_threads,
+        write_threads=write_threads,
+    )
+    typer.echo(json.dumps(stats))
@@ -13,6 +13,7 @@ from pydantic import BaseModel, Field
 
 from chroma_dp import ChromaDocumentSourceGenerator, EmbeddableTextResource
 from chroma_dp.huggingface.utils import _infer_hf_type, int_or_none, bool_or_false
+from chroma_dp.utils import smart_open
 from chroma_dp.utils.chroma import remap_features
 
 hf_commands = typer.Typer()
@@ -274,6 +275,9 @@ def hf_export(
         ),
     ],
     inf: typer.FileText = typer.Argument(sys.stdin),
+    file: Optional[str] = typer.Option(
+        None, "--in", help="The file to export instead of stdin."
+    ),
     split: Annotated[
         Optional[str], typer.Option(help="The HuggingFace dataset split")
     ] = "train",
@@ -323,49 +327,50 @@ def hf_export(
     )
     features.update()
     dataset = None
-    for line in inf:
-        doc = remap_features(
-            json.loads(line),
-            doc_feature,
-            embed_feature=embed_feature,
-            meta_features=meta_features,
-            id_feature=id_feature,
-        )
+    with smart_open(file, inf) as file_or_stdin:
+        for line in file_or_stdin:
+            doc = remap_features(
+                json.loads(line),
+                doc_feature,
+                embed_feature=embed_feature,
+                meta_features=meta_features,
+                id_feature=id_feature,
+            )
 
-        _batch["id"].append(doc.id)
-        _batch["document"].append(doc.text_chunk)
-        _batch["embedding"].append(doc.embedding)
-        if doc.metadata:
-            for key in doc.metadata.keys():
-                if f"metadata.{key}" not in features:
-                    features[f"metadata.{key}"] = _infer_hf_type(doc.metadata[key])
-                _batch[f"metadata.{key}"].append(doc.metadata[key])
-
-        if len(_batch["document"]) >= _batch_size:
-            if dataset is None:
-                dataset = Dataset.from_dict(
-                    _batch,
-                    features=features,
-                    info=datasets.DatasetInfo(
-                        description="Chroma Collection export.", features=features
-                    ),
-                    split=_split,
-                )
-            else:
-                new_dataset = Dataset.from_dict(
-                    _batch,
-                    features=features,
-                    info=datasets.DatasetInfo(
-                        description="Chroma Collection export.", features=features
-                    ),
-                    split=_split,
-                )
-                dataset = concatenate_datasets([dataset, new_dataset])
-            _batch: Dict[str, Any] = {
-                "id": [],
-                "document": [],
-                "embedding": [],
-            }
+            _batch["id"].append(doc.id)
+            _batch["document"].append(doc.text_chunk)
+            _batch["embedding"].append(doc.embedding)
+            if doc.metadata:
+                for key in doc.metadata.keys():
+                    if f"metadata.{key}" not in features:
+                        features[f"metadata.{key}"] = _infer_hf_type(doc.metadata[key])
+                    _batch[f"metadata.{key}"].append(doc.metadata[key])
+
+            if len(_batch["document"]) >= _batch_size:
+                if dataset is None:
+                    dataset = Dataset.from_dict(
+                        _batch,
+                        features=features,
+                        info=datasets.DatasetInfo(
+                            description="Chroma Collection export.", features=features
+                        ),
+                        split=_split,
+                    )
+                else:
+                    new_dataset = Dataset.from_dict(
+                        _batch,
+                        features=features,
+                        info=datasets.DatasetInfo(
+                            description="Chroma Collection export.", features=features
+                        ),
+                        split=_split,
+                    )
+                    dataset = concatenate_datasets([dataset, new_dataset])
+                _batch: Dict[str, Any] = {
+                    "id": [],
+                    "document": [],
+                    "embedding": [],
+                }
 
     if len(_batch["document"]) > 0:
         if dataset is None:
@@ -1,13 +1,19 @@
 import typer
 from dotenv import load_dotenv
+from chroma_dp.chroma.chroma_copy import chroma_copy_cli
 from chroma_dp.chroma.chroma_export import chroma_export_cli
 from chroma_dp.chroma.chroma_import import chroma_import
+from chroma_dp.chroma.chroma_sync import chroma_sync_cli
 from chroma_dp.processor.chunk import chunk_process
 from chroma_dp.processor.embed import filter_embed
+from chroma_dp.processor.embed_bench import embed_bench
+from chroma_dp.processor.embed_server import embed_server
 from chroma_dp.huggingface import hf_import, hf_export
 from chroma_dp.processor.id import id_process
 from chroma_dp.processor.metadata import meta_process
 from chroma_dp.processor.misc.emoji_clean import emoji_clean
+from chroma_dp.processor.misc.dedup import dedup
+from chroma_dp.processor.misc.quantize import quantize
 from chroma_dp.producer.file.csv import csv_import
 from chroma_dp.producer.file.pdf import pdf_import
 from chroma_dp.producer.file.text import txt_import
@@ -42,6 +48,15 @@ transform_commands.command(
     help="Cleans emojis from documents.",
     no_args_is_help=True,
 )(emoji_clean)
+transform_commands.command(
+    name="quantize",
+    help="Quantize or reduce the dimensionality of embeddings.",
+    no_args_is_help=True,
+)(quantize)
+transform_commands.command(
+    name="dedup",
+    help="Remove or tag duplicate documents.",
+)(dedup)
 
 app.add_typer(
     import_commands, name="imp", no_args_is_help=True, help="Import Commands."
@@ -67,6 +82,16 @@ app.command(
     no_args_is_help=True,
 )(filter_embed)
 
+app.command(
+    name="embed-server",
+    help="Serve embeddings over HTTP or a Unix socket, keeping the models loaded between invocations.",
+)(embed_server)
+
+app.command(
+    name="embed-bench",
+    help="Compare the throughput of ONNX runtime configurations of the default embedding function.",
+)(embed_bench)
+
 # Chroma commands
 app.command(
     name="export",
@@ -80,6 +105,18 @@ app.command(
     no_args_is_help=True,
 )(chroma_import)
 
+app.command(
+    name="copy",
+    help="Copy data between ChromaDB collections.",
+    no_args_is_help=True,
+)(chroma_copy_cli)
+
+app.command(
+    name="sync",
+    help="Sync a ChromaDB collection with another one.",
+    no_args_is_help=True,
+)(chroma_sync_cli)
+
 # Dataset commands
 
 
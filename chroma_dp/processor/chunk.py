@@ -1,37 +1,165 @@
+import itertools
+import os
 import orjson as json
 import sys
-from typing import Any, Iterable, Annotated, Optional
+import uuid
+from enum import Enum
+from typing import Any, Iterable, Annotated, Optional, Dict, List
 
 import typer
 
 from chroma_dp import EmbeddableTextResource, CdpProcessor
-from langchain.text_splitter import CharacterTextSplitter
-
-from chroma_dp.processor.langchain_utils import (
-    convert_chroma_emb_resource_to_lc_doc,
-    convert_lc_doc_to_chroma_resource,
+from chroma_dp.processor.chunkers import (
+    CODE_EXTENSIONS,
+    CharacterChunker,
+    Chunk,
+    Chunker,
+    CodeChunker,
+    HTMLChunker,
+    MarkdownChunker,
+    SemanticChunker,
+    TokenChunker,
+)
+from chroma_dp.processor.langchain_utils import normalize_metadata
+from chroma_dp.utils import smart_open
+from chroma_dp.utils.embedding import (
+    SupportedEmbeddingFunctions,
+    get_embedding_function_for_name,
 )
+from chroma_dp.utils.tokenizer import get_token_counter
+
+
+class ChunkType(str, Enum):
+    character = "character"
+    token = "token"
+    markdown = "markdown"
+    code = "code"
+    html = "html"
+    semantic = "semantic"
 
 
 class ChunkProcessor(CdpProcessor[EmbeddableTextResource]):
-    def __init__(self, type: Optional[str] = "character"):
+    def __init__(
+        self,
+        type: Optional[str] = ChunkType.character,
+        size: Optional[int] = None,
+        overlap: int = 0,
+        separator: Optional[str] = "\n",
+        add_start_index: bool = False,
+        tokenizer: Optional[str] = None,
+        batch_size: int = 64,
+        language: Optional[str] = None,
+        embedding_function: Optional[SupportedEmbeddingFunctions] = None,
+        embedding_model: Optional[str] = None,
+        sentence_window: int = 1,
+        breakpoint_percentile: float = 95.0,
+        pooled_embeddings: bool = False,
+    ):
         self.type = type
+        self.add_start_index = add_start_index
+        self.batch_size = batch_size
+        self.chunker = (
+            self._create_chunker(
+                type=type,
+                size=size,
+                overlap=overlap,
+                separator=separator,
+                tokenizer=tokenizer,
+                language=language,
+                embedding_function=embedding_function,
+                embedding_model=embedding_model,
+                sentence_window=sentence_window,
+                breakpoint_percentile=breakpoint_percentile,
+                pooled_embeddings=pooled_embeddings,
+            )
+            if size
+            else None
+        )
+        self.language = language
+        self._code_chunkers: Dict[Optional[str], Chunker] = {}
+
+    def _create_chunker(self, **kwargs: Any) -> Chunker:
+        _type = kwargs.get("type") or self.type
+        if _type == ChunkType.token:
+            return TokenChunker(
+                size=kwargs["size"],
+                overlap=kwargs.get("overlap") or 0,
+                token_counter=get_token_counter(kwargs.get("tokenizer")),
+            )
+        if _type == ChunkType.markdown:
+            return MarkdownChunker(size=kwargs["size"])
+        if _type == ChunkType.code:
+            return CodeChunker(size=kwargs["size"], language=kwargs.get("language"))
+        if _type == ChunkType.html:
+            return HTMLChunker(size=kwargs["size"])
+        if _type == ChunkType.semantic:
+            return SemanticChunker(
+                size=kwargs["size"],
+                embedding_function=get_embedding_function_for_name(
+                    kwargs.get("embedding_function")
+                    or SupportedEmbeddingFunctions.default,
+                    model=kwargs.get("embedding_model"),
+                ),
+                window=kwargs.get("sentence_window", 1),
+                percentile=kwargs.get("breakpoint_percentile", 95.0),
+                pooled_embeddings=kwargs.get("pooled_embeddings", False),
+            )
+        if _type == ChunkType.character:
+            return CharacterChunker(
+                size=kwargs["size"],
+                overlap=kwargs.get("overlap") or 0,
+                separator=kwargs.get("separator") if kwargs.get("separator") else "\n",
+            )
+        raise ValueError(f"Unsupported chunking type: {_type}")
+
+    def _code_chunker(self, doc: EmbeddableTextResource, size: int) -> Chunker:
+        """A code chunker for the language of the document's source file extension."""
+        source = str((doc.metadata or {}).get("source", ""))
+        language = CODE_EXTENSIONS.get(os.path.splitext(source)[1].lower())
+        if language not in self._code_chunkers:
+            self._code_chunkers[language] = CodeChunker(size=size, language=language)
+        return self._code_chunkers[language]
+
+    def _chunk_batch(
+        self,
+        chunker: Chunker,
+        batch: List[EmbeddableTextResource],
+        language: Optional[str],
+    ) -> List[List[Chunk]]:
+        if isinstance(chunker, CodeChunker) and language is None:
+            # the language is detected per document
+            return [
+                self._code_chunker(d, chunker.size).chunk(d.text_chunk) for d in batch
+            ]
+        return chunker.chunk_many([d.text_chunk for d in batch])
 
     def process(
         self, *, documents: Iterable[EmbeddableTextResource], **kwargs: Any
     ) -> Iterable[EmbeddableTextResource]:
-        text_splitter = CharacterTextSplitter(
-            separator=kwargs.get("separator") if kwargs.get("separator") else "\n",
-            chunk_size=kwargs.get("size"),
-            chunk_overlap=kwargs.get("overlap", 0),
-            add_start_index=kwargs.get("add_start_index", False),
-        )
-        for doc in documents:
-            split_docs = text_splitter.split_documents(
-                [convert_chroma_emb_resource_to_lc_doc(doc)]
-            )
-            for _, split_doc in enumerate(split_docs):
-                yield convert_lc_doc_to_chroma_resource(split_doc, doc.metadata)
+        # the chunker is configured once, unless the chunking options are passed per call
+        chunker = self._create_chunker(**kwargs) if kwargs.get("size") else self.chunker
+        if chunker is None:
+            raise ValueError("The chunk size is required.")
+        add_start_index = kwargs.get("add_start_index", self.add_start_index)
+        language = kwargs.get("language", self.language)
+        _documents = iter(documents)
+        while True:
+            # documents are chunked in batches, e.g. to tokenize them with a single call
+            batch = list(itertools.islice(_documents, self.batch_size))
+            if not batch:
+                return
+            for doc, chunks in zip(batch, self._chunk_batch(chunker, batch, language)):
+                metadata = normalize_metadata(doc.metadata)
+                for chunk in chunks:
+                    chunk_metadata = {**(chunk.metadata or {}), **metadata}
+                    if add_start_index and "start_index" not in metadata:
+                        chunk_metadata["start_index"] = chunk.start_index
+                    yield EmbeddableTextResource(
+                        text_chunk=chunk.text,
+                        embedding=chunk.embedding,
+                        metadata=chunk_metadata,
+                        id=str(uuid.uuid4()),
+                    )
 
 
 def chunk_process(
@@ -41,7 +169,7 @@ def chunk_process(
             ...,
             "--size",
             "-s",
-            help="The maximum size of each chunk.",
+            help="The maximum size of each chunk, in characters (tokens for --type token).",
         ),
     ],
     inf: typer.FileText = typer.Argument(sys.stdin),
@@ -74,34 +202,77 @@ def chunk_process(
         ),
     ] = False,
     type: Annotated[
-        Optional[str],
+        ChunkType,
         typer.Option(
             ...,
             "--type",
             "-t",
             help="The type of the chunking.",
         ),
-    ] = "character",
+    ] = ChunkType.character,
+    tokenizer: Optional[str] = typer.Option(
+        None,
+        "--tokenizer",
+        envvar="CDP_EMBED_TOKENIZER",
+        help="The tokenizer for --type token - a path to a tokenizer.json or a HuggingFace model name. "
+        "Defaults to a ~4 characters per token heuristic.",
+    ),
+    language: Optional[str] = typer.Option(
+        None,
+        "--language",
+        help="The programming language for --type code (python, javascript, typescript, go, rust, java, csharp or "
+        "generic). Defaults to detecting it from the extension of the source file.",
+    ),
+    embedding_function: Optional[SupportedEmbeddingFunctions] = typer.Option(
+        None,
+        "--ef",
+        help="The embedding function for --type semantic. Defaults to the default embedding function.",
+    ),
+    embedding_model: Optional[str] = typer.Option(
+        None,
+        "--model",
+        help="The embedding model to be used by the embedding function.",
+    ),
+    sentence_window: Annotated[
+        int,
+        typer.Option(
+            help="For --type semantic, the number of sentences on either side embedded with each sentence."
+        ),
+    ] = 1,
+    breakpoint_percentile: Annotated[
+        float,
+        typer.Option(
+            help="For --type semantic, a new chunk starts where the distance between adjacent sentences is above "
+            "this percentile of the document's distances."
+        ),
+    ] = 95.0,
+    pooled_embeddings: Annotated[
+        bool,
+        typer.Option(
+            help="For --type semantic, add the mean of the sentence embeddings as the chunk embedding."
+        ),
+    ] = False,
 ) -> None:
     """Chunk a document."""
-    processor = ChunkProcessor(type=type)
-
-    def process_docs(line: str) -> None:
-        doc = EmbeddableTextResource(**json.loads(line))
-        for doc in processor.process(
-            documents=[doc],
-            size=size,
-            overlap=overlap,
-            add_start_index=add_start_index,
-            type=type,
-            separator=separator,
-        ):
+    processor = ChunkProcessor(
+        type=type,
+        size=size,
+        overlap=overlap,
+        separator=separator,
+        add_start_index=add_start_index,
+        tokenizer=tokenizer,
+        language=language,
+        embedding_function=embedding_function,
+        embedding_model=embedding_model,
+        sentence_window=sentence_window,
+        breakpoint_percentile=breakpoint_percentile,
+        pooled_embeddings=pooled_embeddings,
+    )
+    with smart_open(file, inf) as file_or_stdin:
+        docs = (
+            EmbeddableTextResource(**json.loads(line))
+            for line in file_or_stdin
+            if line.strip()
+        )
+        for doc in processor.process(documents=docs):
             typer.echo(json.dumps(doc.model_dump()))
-
-    if file:
-        with open(file, "r") as inf:
-            for line in inf:
-                process_docs(line)
-    else:
-        for line in inf:
-            process_docs(line)
@@ -0,0 +1,673 @@
+import re
+from abc import ABC, abstractmethod
+from collections import deque
+from html import unescape
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction
+from overrides import EnforceOverrides, override
+
+from chroma_dp.utils.tokenizer import TokenCounter
+
+
+class Chunk(NamedTuple):
+    text: str
+    start_index: int
+    metadata: Optional[Dict[str, Any]] = None
+    embedding: Optional[List[float]] = None
+
+
+class Chunker(ABC, EnforceOverrides):
+    """Splits texts into chunks of at most `size` (characters, unless stated otherwise), consecutive chunks overlap
+    by up to `overlap`. Configured once and reused for every document."""
+
+    def __init__(self, size: int, overlap: int = 0) -> None:
+        if overlap > size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({overlap}) than chunk size ({size}), should be smaller."
+            )
+        self.size = size
+        self.overlap = overlap
+
+    @abstractmethod
+    def split_text(self, text: str) -> List[str]:
+        raise NotImplementedError()
+
+    def chunk(self, text: str) -> List[Chunk]:
+        """The chunks of the text with their start index."""
+        chunks = self.split_text(text)
+        return [
+            Chunk(chunk, start)
+            for chunk, start in zip(chunks, self.start_indices(text, chunks))
+        ]
+
+    def chunk_many(self, texts: Sequence[str]) -> List[List[Chunk]]:
+        return [self.chunk(text) for text in texts]
+
+    def start_indices(self, text: str, chunks: List[str]) -> List[int]:
+        """The start index of each chunk in the text. Each chunk is searched for from where the previous chunk ends
+        minus the overlap (as LangChain's `add_start_index` does)."""
+        indices = []
+        index = 0
+        previous_chunk_len = 0
+        for chunk in chunks:
+            index = text.find(chunk, max(0, index + previous_chunk_len - self.overlap))
+            indices.append(index)
+            previous_chunk_len = len(chunk)
+        return indices
+
+
+class CharacterChunker(Chunker):
+    """Splits the text at a separator and merges the pieces into chunks. The chunks are the same as those of
+    LangChain's `CharacterTextSplitter` (separator not kept, whitespace stripped), without the `Document` round-trip.
+    """
+
+    def __init__(self, size: int, overlap: int = 0, separator: str = "\n") -> None:
+        super().__init__(size, overlap)
+        self.separator = separator
+
+    def _splits(self, text: str) -> List[str]:
+        if not self.separator:
+            return list(text)
+        return [s for s in text.split(self.separator) if s != ""]
+
+    def _merge_splits(self, splits: List[str]) -> List[str]:
+        separator = self.separator
+        separator_len = len(separator)
+        chunks = []
+        current: Deque[str] = deque()
+        total = 0
+        for split in splits:
+            split_len = len(split)
+            if total + split_len + (separator_len if current else 0) > self.size:
+                if current:
+                    chunk = separator.join(current).strip()
+                    if chunk:
+                        chunks.append(chunk)
+                    # drop pieces from the front until the rest fits the overlap and the next piece fits the chunk
+                    while total > self.overlap or (
+                        total + split_len + (separator_len if current else 0)
+                        > self.size
+                        and total > 0
+                    ):
+                        total -= len(current[0]) + (
+                            separator_len if len(current) > 1 else 0
+                        )
+                        current.popleft()
+            current.append(split)
+            total += split_len + (separator_len if len(current) > 1 else 0)
+        chunk = separator.join(current).strip()
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @override
+    def split_text(self, text: str) -> List[str]:
+        return self._merge_splits(self._splits(text))
+
+
+class TokenChunker(Chunker):
+    """Chunks of at most `size` tokens of the `token_counter`'s tokenizer, overlapping by up to `overlap` tokens.
+    Texts are tokenized in batches and chunks are cut at token offsets, preferably at word boundaries, so chunks are
+    slices of the original text."""
+
+    def __init__(self, size: int, overlap: int, token_counter: TokenCounter) -> None:
+        super().__init__(size, overlap)
+        self.token_counter = token_counter
+
+    @staticmethod
+    def _is_word_start(text: str, offsets: Sequence[Tuple[int, int]], k: int) -> bool:
+        start = offsets[k][0]
+        return start > offsets[k - 1][1] or (start > 0 and text[start - 1].isspace())
+
+    def _chunk_offsets(
+        self, text: str, offsets: Sequence[Tuple[int, int]]
+    ) -> List[Chunk]:
+        n = len(offsets)
+        chunks: List[Chunk] = []
+        start = 0
+        while start < n:
+            end = min(start + self.size, n)
+            if end < n:
+                # end at the last word boundary in the second half of the chunk, if any
+                for k in range(end, start + self.size // 2, -1):
+                    if self._is_word_start(text, offsets, k):
+                        end = k
+                        break
+            chunks.append(
+                Chunk(text[offsets[start][0] : offsets[end - 1][1]], offsets[start][0])
+            )
+            if end >= n:
+                break
+            next_start = max(end - self.overlap, start + 1)
+            # the overlap starts at a word boundary too, if there is one
+            for k in range(next_start, end):
+                if self._is_word_start(text, offsets, k):
+                    next_start = k
+                    break
+            start = next_start
+        return chunks
+
+    @override
+    def chunk_many(self, texts: Sequence[str]) -> List[List[Chunk]]:
+        return [
+            self._chunk_offsets(text, offsets)
+            for text, offsets in zip(texts, self.token_counter.offsets_many(texts))
+        ]
+
+    @override
+    def chunk(self, text: str) -> List[Chunk]:
+        return self.chunk_many([text])[0]
+
+    @override
+    def split_text(self, text: str) -> List[str]:
+        return [c.text for c in self.chunk(text)]
+
+
+class Segment(NamedTuple):
+    """A run of lines (or a block) of a structured document, with the path of the headers (or definitions) it is in.
+    `boundary` is how good a place its start is to start a new chunk."""
+
+    text: str
+    start: int
+    path: Tuple[str, ...]
+    boundary: int
+
+
+# boundary priorities, a hard boundary always starts a new chunk
+NO_BOUNDARY = 0
+PARAGRAPH_BOUNDARY = 1
+NESTED_BOUNDARY = 2
+SECTION_BOUNDARY = 3
+HARD_BOUNDARY = 4
+
+
+class StructuredChunker(Chunker):
+    """Base of the structure-aware chunkers. The text is scanned once, with a single regular expression, into
+    segments that carry the path of the headers (or definitions) they are in. Segments are packed into chunks of up
+    to `size` characters. A full chunk is cut at its best boundary - e.g. before a top-level definition - and the
+    chunk metadata gets the `header_path` of its first segment. Overlap is not supported, chunks follow the document
+    structure instead.
+    """
+
+    def __init__(self, size: int) -> None:
+        super().__init__(size, 0)
+        self._line_splitter = CharacterChunker(size=size, separator="\n")
+        self._word_splitter = CharacterChunker(size=size, separator=" ")
+
+    @abstractmethod
+    def _segments(self, text: str) -> Iterator[Segment]:
+        raise NotImplementedError()
+
+    def _emit(self, segments: Sequence[Segment]) -> Iterator[Chunk]:
+        raw = "".join(s.text for s in segments)
+        text = raw.strip()
+        if not text:
+            return
+        start = segments[0].start + len(raw) - len(raw.lstrip())
+        path = segments[0].path
+        yield Chunk(text, start, {"header_path": " > ".join(path)} if path else None)
+
+    def _emit_long(self, segment: Segment) -> Iterator[Chunk]:
+        """A segment longer than the chunk size is split at new lines, long lines at spaces."""
+        for piece in self._line_splitter.chunk(segment.text):
+            pieces = (
+                self._word_splitter.chunk(piece.text)
+                if len(piece.text) > self.size
+                else [Chunk(piece.text, 0)]
+            )
+            for p in pieces:
+                yield from self._emit(
+                    [
+                        segment._replace(
+                            text=p.text,
+                            start=segment.start + piece.start_index + p.start_index,
+                        )
+                    ]
+                )
+
+    @override
+    def chunk(self, text: str) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        buffer: List[Segment] = []
+        total = 0
+        for segment in self._segments(text):
+            if buffer and (
+                segment.boundary == HARD_BOUNDARY
+                or total + len(segment.text) > self.size
+            ):
+                cut = len(buffer)
+                if segment.boundary < HARD_BOUNDARY:
+                    # the latest of the best boundaries in the buffer, or before this segment if it is as good
+                    best = segment.boundary
+                    for i in range(len(buffer) - 1, 0, -1):
+                        if buffer[i].boundary > best:
+                            best, cut = buffer[i].boundary, i
+                chunks.extend(self._emit(buffer[:cut]))
+                buffer = buffer[cut:]
+                total = sum(len(s.text) for s in buffer)
+                if buffer and total + len(segment.text) > self.size:
+                    chunks.extend(self._emit(buffer))
+                    buffer, total = [], 0
+            if len(segment.text) > self.size:
+                chunks.extend(self._emit_long(segment))
+                continue
+            buffer.append(segment)
+            total += len(segment.text)
+        if buffer:
+            chunks.extend(self._emit(buffer))
+        return chunks
+
+    @override
+    def split_text(self, text: str) -> List[str]:
+        return [c.text for c in self.chunk(text)]
+
+
+_MD_SCANNER = re.compile(
+    r"^(?P<blank>(?:[ \t\r]*\n)+)"
+    r"|^ {0,3}(?P<fence>`{3,}|~{3,})[^\n]*(?:\n|$)"
+    r"|^ {0,3}(?P<hashes>#{1,6})(?:[ \t]+(?P<title>[^\n]*?))??(?:[ \t]+#+)?[ \t\r]*(?:\n|$)",
+    re.MULTILINE,
+)
+
+
+class MarkdownChunker(StructuredChunker):
+    """Chunks Markdown by sections - every ATX header (`#` to `######`) starts a new chunk, long sections are cut
+    between paragraphs. Headers inside fenced code blocks are ignored. `header_path` is e.g. `Install > Linux`.
+    """
+
+    @override
+    def _segments(self, text: str) -> Iterator[Segment]:
+        headers: List[Tuple[int, str]] = []
+        path: Tuple[str, ...] = ()
+        fence: Optional[str] = None
+        boundary = NO_BOUNDARY
+        pos = 0
+        for m in _MD_SCANNER.finditer(text):
+            if m.start() > pos:
+                yield Segment(text[pos : m.start()], pos, path, boundary)
+                boundary = NO_BOUNDARY
+            pos = m.end()
+            if fence is not None:
+                # inside a code block only the closing fence counts
+                closing = m.group("fence")
+                if closing and closing[0] == fence[0] and len(closing) >= len(fence):
+                    fence = None
+                yield Segment(m.group(), m.start(), path, NO_BOUNDARY)
+            elif m.group("blank"):
+                yield Segment(m.group(), m.start(), path, NO_BOUNDARY)
+                boundary = PARAGRAPH_BOUNDARY
+            elif m.group("fence"):
+                fence = m.group("fence")
+                yield Segment(m.group(), m.start(), path, boundary)
+                boundary = NO_BOUNDARY
+            else:
+                level = len(m.group("hashes"))
+                while headers and headers[-1][0] >= level:
+                    headers.pop()
+                headers.append((level, (m.group("title") or "").strip()))
+                path = tuple(h for _, h in headers)
+                yield Segment(m.group(), m.start(), path, HARD_BOUNDARY)
+                boundary = NO_BOUNDARY
+        if pos < len(text):
+            yield Segment(text[pos:], pos, path, boundary)
+
+
+CODE_DEFINITIONS: Dict[str, str] = {
+    "python": r"(?:async[ \t]+)?(?:def|class)[ \t]+\w+",
+    "javascript": r"(?:export[ \t]+)?(?:default[ \t]+)?(?:async[ \t]+)?(?:function\*?|class)[ \t]+\w+"
+    r"|(?:export[ \t]+)?(?:const|let|var)[ \t]+\w+"
+    r"(?=[ \t]*=[ \t]*(?:async[ \t]*)?(?:function|\([^)\n]*\)[ \t]*=>|\w+[ \t]*=>))",
+    "go": r"func[ \t]+(?:\([^)\n]*\)[ \t]*)?\w+|type[ \t]+\w+",
+    "rust": r"(?:pub(?:\([^)\n]*\))?[ \t]+)?(?:async[ \t]+)?(?:fn|struct|enum|impl|trait|mod)[ \t]+[\w<>]+",
+    "java": r"(?:(?:public|private|protected|static|final|abstract|synchronized|override|async)[ \t]+)*"
+    r"(?:(?:class|interface|enum|record|struct)[ \t]+\w+"
+    r"|(?!(?:return|new|else|throw|await)\b)[\w<>\[\],]+[ \t]+\w+(?=[ \t]*\())",
+}
+CODE_DEFINITIONS["typescript"] = (
+    CODE_DEFINITIONS["javascript"]
+    + r"|(?:export[ \t]+)?(?:interface|type|enum)[ \t]+\w+"
+)
+CODE_DEFINITIONS["csharp"] = CODE_DEFINITIONS["java"]
+CODE_DEFINITIONS["generic"] = (
+    r"(?:(?:export|public|private|protected|static|pub|async)[ \t]+)*"
+    r"(?:def|class|function|func|fn|struct|interface|impl|trait|enum|module|type)[ \t]+\w+"
+)
+
+CODE_EXTENSIONS: Dict[str, str] = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".go": "go",
+    ".rs": "rust",
+    ".java": "java",
+    ".kt": "java",
+    ".cs": "csharp",
+}
+
+
+class CodeChunker(StructuredChunker):
+    """Chunks source code at definition boundaries (functions, classes, ...) of the `language`. Small definitions are
+    packed together, a full chunk is cut before the last top-level definition, else before a nested one.
+    `header_path` is the nesting of definitions, by indentation, e.g. `class Parser > def parse`.
+    """
+
+    def __init__(self, size: int, language: Optional[str] = None) -> None:
+        super().__init__(size)
+        self.language = language or "generic"
+        if self.language not in CODE_DEFINITIONS:
+            raise ValueError(
+                f"Unsupported language {self.language}, expected one of {', '.join(CODE_DEFINITIONS.keys())}."
+            )
+        # blank lines, definitions and decorators, and top-level lines (which end all definitions)
+        self._scanner = re.compile(
+            r"^(?P<blank>(?:[ \t\r]*\n)+)"
+            r"|^(?P<indent>[ \t]*)(?:(?P<decorator>@[\w.]+)"
+            rf"|(?P<definition>{CODE_DEFINITIONS[self.language]}))[^\n]*(?:\n|$)"
+            r"|^(?![ \t\r\n}\])]|#|//|/\*|\*|--)[^\n]+(?:\n|$)",
+            re.MULTILINE,
+        )
+
+    @override
+    def _segments(self, text: str) -> Iterator[Segment]:
+        definitions: List[Tuple[int, str]] = []
+        path: Tuple[str, ...] = ()
+        # decorators (and the lines up to their definition) get the path of the definition they belong to
+        pending: List[Segment] = []
+        after_blank = False
+        after_decorator = False
+        pos = 0
+        for m in self._scanner.finditer(text):
+            if m.start() > pos:
+                segment = Segment(
+                    text[pos : m.start()],
+                    pos,
+                    path,
+                    PARAGRAPH_BOUNDARY if after_blank else NO_BOUNDARY,
+                )
+                if pending:
+                    pending.append(segment)
+                else:
+                    yield segment
+                after_blank = after_decorator = False
+            pos = m.end()
+            if m.group("blank"):
+                segment = Segment(m.group(), m.start(), path, NO_BOUNDARY)
+                if pending:
+                    pending.append(segment)
+                else:
+                    yield segment
+                after_blank = True
+                continue
+            indent = len(m.group("indent") or "")
+            # leaving the body of the definitions at this indentation (or deeper)
+            while definitions and definitions[-1][0] >= indent:
+                definitions.pop()
+            boundary = PARAGRAPH_BOUNDARY if after_blank else NO_BOUNDARY
+            definition = m.group("definition")
+            if (definition or m.group("decorator")) and not after_decorator:
+                boundary = SECTION_BOUNDARY if indent == 0 else NESTED_BOUNDARY
+            if definition:
+                definitions.append((indent, " ".join(definition.split())))
+            after_decorator = bool(m.group("decorator"))
+            after_blank = False
+            path = tuple(d for _, d in definitions)
+            segment = Segment(m.group(), m.start(), path, boundary)
+            if after_decorator:
+                pending.append(segment)
+                continue
+            for s in pending:
+                yield s._replace(path=path)
+            pending.clear()
+            yield segment
+        for s in pending:
+            yield s._replace(path=path)
+        if pos < len(text):
+            yield Segment(
+                text[pos:],
+                pos,
+                path,
+                PARAGRAPH_BOUNDARY if after_blank else NO_BOUNDARY,
+            )
+
+
+_HTML_TOKEN = re.compile(r"<!--.*?-->|<(/?)([a-zA-Z][a-zA-Z0-9]*)\b[^>]*>", re.DOTALL)
+_HTML_HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_HTML_BLOCKS = {
+    "address",
+    "article",
+    "aside",
+    "blockquote",
+    "br",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "figcaption",
+    "footer",
+    "form",
+    "header",
+    "hr",
+    "li",
+    "main",
+    "nav",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "table",
+    "td",
+    "th",
+    "tr",
+    "ul",
+}
+_HTML_SKIPPED = {"script", "style", "noscript", "template", "head"}
+
+
+class HTMLChunker(StructuredChunker):
+    """Chunks HTML by sections - every heading (`h1` to `h6`) starts a new chunk, long sections are cut between block
+    elements. Chunks are the text of the document (scripts and styles are dropped), the start index is the offset in
+    the HTML of a chunk's first text. `header_path` is the path of the headings, e.g. `Install > Linux`.
+    """
+
+    @override
+    def _segments(self, text: str) -> Iterator[Segment]:
+        headings: List[Tuple[int, str]] = []
+        path: Tuple[str, ...] = ()
+        parts: List[str] = []
+        start = 0
+        heading: Optional[int] = None
+        pre = 0
+        pos = 0
+
+        def _text() -> str:
+            joined = unescape("".join(parts))
+            parts.clear()
+            return joined if pre else " ".join(joined.split())
+
+        while True:
+            m = _HTML_TOKEN.search(text, pos)
+            end = m.start() if m else len(text)
+            if end > pos:
+                if not parts:
+                    start = pos
+                parts.append(text[pos:end])
+            if m is None:
+                break
+            pos = m.end()
+            closing, tag = m.group(1), (m.group(2) or "").lower()
+            if tag in _HTML_SKIPPED and not closing:
+                # jump past the element, its content is not text
+                close = re.compile(rf"</{tag}\s*>", re.IGNORECASE).search(text, pos)
+                pos = close.end() if close else len(text)
+            elif tag in _HTML_HEADINGS:
+                if not closing:
+                    block = _text()
+                    if block.strip():
+                        yield Segment(block + "\n", start, path, PARAGRAPH_BOUNDARY)
+                    heading = int(tag[1])
+                elif heading is not None:
+                    title = " ".join(_text().split())
+                    if title:
+                        while headings and headings[-1][0] >= heading:
+                            headings.pop()
+                        headings.append((heading, title))
+                        path = tuple(h for _, h in headings)
+                        yield Segment(title + "\n", start, path, HARD_BOUNDARY)
+                    heading = None
+            elif tag in _HTML_BLOCKS and heading is None:
+                block = _text()
+                if block.strip():
+                    yield Segment(block + "\n", start, path, PARAGRAPH_BOUNDARY)
+                if tag == "pre":
+                    pre = max(0, pre - 1) if closing else pre + 1
+        block = _text()
+        if block.strip():
+            yield Segment(block + "\n", start, path, PARAGRAPH_BOUNDARY)
+
+
+_SENTENCE = re.compile(r"\S.*?(?:[.!?](?=\s|$)|(?=\n\s*\n)|$)", re.DOTALL)
+
+
+class SemanticChunker(Chunker):
+    """Chunks at semantic boundaries - the text is split into sentences, each sentence is embedded together with
+    `window` sentences on either side, and a new chunk starts where the cosine distance between adjacent sentences is
+    above the `percentile` of the document's distances (or the chunk would exceed `size` characters).
+
+    The sentence windows of a whole batch of documents are embedded with a single call. With `pooled_embeddings`
+    each chunk gets the normalized mean of the embeddings of its sentences as its embedding - with a `window` the bare
+    sentences are embedded too (in the same call), so that the text of neighbouring chunks is not pooled in.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        embedding_function: EmbeddingFunction[Documents],
+        window: int = 1,
+        percentile: float = 95.0,
+        pooled_embeddings: bool = False,
+    ) -> None:
+        super().__init__(size, 0)
+        if not 0 <= percentile <= 100:
+            raise ValueError("The breakpoint percentile must be between 0 and 100.")
+        self.embedding_function = embedding_function
+        self.window = window
+        self.percentile = percentile
+        self.pooled_embeddings = pooled_embeddings
+        self._word_splitter = CharacterChunker(size=size, separator=" ")
+
+    def _sentences(self, text: str) -> List[Tuple[int, int]]:
+        """The (start, end) offsets of the sentences, sentences longer than the chunk size are split at spaces."""
+        spans = []
+        for m in _SENTENCE.finditer(text):
+            start, end = m.start(), m.start() + len(m.group().rstrip())
+            if end - start <= self.size:
+                spans.append((start, end))
+                continue
+            for piece in self._word_splitter.chunk(text[start:end]):
+                spans.append(
+                    (
+                        start + piece.start_index,
+                        start + piece.start_index + len(piece.text),
+                    )
+                )
+        return spans
+
+    def _windows(self, text: str, spans: List[Tuple[int, int]]) -> List[str]:
+        return [
+            text[
+                spans[max(0, i - self.window)][0] : spans[
+                    min(len(spans) - 1, i + self.window)
+                ][1]
+            ]
+            for i in range(len(spans))
+        ]
+
+    def _chunk_sentences(
+        self,
+        text: str,
+        spans: List[Tuple[int, int]],
+        embeddings: np.ndarray,
+        sentence_embeddings: np.ndarray,
+    ) -> List[Chunk]:
+        breaks = np.zeros(len(spans), dtype=bool)
+        if len(spans) > 1:
+            # cosine distance of each sentence to the previous one, the embeddings are normalized
+            distances = 1 - np.einsum("ij,ij->i", embeddings[:-1], embeddings[1:])
+            breaks[1:] = distances > np.percentile(distances, self.percentile)
+        chunks: List[Chunk] = []
+        first = 0
+        for i in range(1, len(spans) + 1):
+            if (
+                i < len(spans)
+                and not breaks[i]
+                and spans[i][1] - spans[first][0] <= self.size
+            ):
+                continue
+            start, end = spans[first][0], spans[i - 1][1]
+            embedding = None
+            if self.pooled_embeddings:
+                mean = sentence_embeddings[first:i].mean(axis=0)
+                norm = np.linalg.norm(mean)
+                embedding = (mean / norm if norm > 0 else mean).tolist()
+            chunks.append(Chunk(text[start:end], start, embedding=embedding))
+            first = i
+        return chunks
+
+    @override
+    def chunk_many(self, texts: Sequence[str]) -> List[List[Chunk]]:
+        spans = [self._sentences(text) for text in texts]
+        windows = [w for text, s in zip(texts, spans) for w in self._windows(text, s)]
+        if not windows:
+            return [[] for _ in texts]
+        # without a window the sentences are the windows
+        pool_sentences = self.pooled_embeddings and self.window > 0
+        sentences = (
+            [text[start:end] for text, s in zip(texts, spans) for start, end in s]
+            if pool_sentences
+            else []
+        )
+        embeddings = np.asarray(
+            self.embedding_function(windows + sentences), dtype=np.float32
+        )
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms > 0, norms, 1)
+        window_embeddings = embeddings[: len(windows)]
+        sentence_embeddings = (
+            embeddings[len(windows) :] if pool_sentences else window_embeddings
+        )
+        chunks = []
+        offset = 0
+        for text, s in zip(texts, spans):
+            chunks.append(
+                self._chunk_sentences(
+                    text,
+                    s,
+                    window_embeddings[offset : offset + len(s)],
+                    sentence_embeddings[offset : offset + len(s)],
+                )
+            )
+            offset += len(s)
+        return chunks
+
+    @override
+    def chunk(self, text: str) -> List[Chunk]:
+        return self.chunk_many([text])[0]
+
+    @override
+    def split_text(self, text: str) -> List[str]:
+        return [c.text for c in self.chunk(text)]
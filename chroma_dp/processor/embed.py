@@ -1,20 +1,44 @@
 import orjson as json
 import sys
-from typing import Annotated, Optional, List, Dict, Any
+from collections import deque
+from typing import Annotated, Optional, List, Dict, Any, Iterable, Iterator, Deque
 
+import numpy as np
 import typer
 
 from chroma_dp import EmbeddableTextResource
+from chroma_dp.utils import smart_open
+from chroma_dp.utils.batch_planner import (
+    OverflowPolicy,
+    RequestPlanner,
+    get_provider_limits,
+)
 from chroma_dp.utils.embedding import (
+    REMOTE_EMBEDDING_FUNCTIONS,
     SupportedEmbeddingFunctions,
     get_embedding_function_for_name,
 )
+from chroma_dp.utils.embedding_cache import DedupEmbeddingFunction, get_cache_stats
+from chroma_dp.utils.embedding_executor import (
+    EmbeddingExecutor,
+    LengthBucketedEmbeddingFunction,
+)
 from chroma_dp.utils.chroma import remap_features
+from chroma_dp.utils.tokenizer import get_token_counter
 
 
 def filter_embed(
     inf: typer.FileText = typer.Argument(sys.stdin),
-    batch_size: Annotated[int, typer.Option(help="The batch size.")] = 100,
+    file: Optional[str] = typer.Option(
+        None, "--in", help="The file to embed instead of stdin."
+    ),
+    batch_size: Annotated[
+        Optional[int],
+        typer.Option(
+            help="The batch size. Defaults to 100, for remote embedding functions to the provider's maximum number "
+            "of inputs per request."
+        ),
+    ] = None,
     embedding_function: Optional[SupportedEmbeddingFunctions] = typer.Option(
         ..., "--ef", help="The embedding function."
     ),
@@ -33,60 +57,186 @@ def filter_embed(
     doc_feature: Annotated[
         str, typer.Option(help="The document feature.")
     ] = "text_chunk",
+    max_in_flight: Annotated[
+        int,
+        typer.Option(
+            help="The maximum number of batches embedded concurrently. Useful for remote embedding functions. "
+            "Output order is preserved."
+        ),
+    ] = 1,
+    max_tokens: Annotated[
+        Optional[int],
+        typer.Option(
+            help="The maximum number of tokens per request. Defaults to the provider's limit."
+        ),
+    ] = None,
+    max_input_tokens: Annotated[
+        Optional[int],
+        typer.Option(
+            help="The maximum number of tokens per input. Defaults to the provider's limit."
+        ),
+    ] = None,
+    tokenizer: Optional[str] = typer.Option(
+        None,
+        "--tokenizer",
+        envvar="CDP_EMBED_TOKENIZER",
+        help="Tokenizer used to count tokens - a path to a tokenizer.json or a HuggingFace model name. "
+        "Defaults to a ~4 characters per token heuristic.",
+    ),
+    overflow: Annotated[
+        OverflowPolicy,
+        typer.Option(
+            help="What to do with inputs longer than the maximum input tokens - truncate them, split them and pool "
+            "the embeddings of the pieces, or fail."
+        ),
+    ] = OverflowPolicy.truncate,
+    length_window: Annotated[
+        int,
+        typer.Option(
+            help="Buffer this many documents, sort them by length and embed them in batches (of --batch-size) of "
+            "similar length. Reduces padding for local embedding functions. Output order is preserved."
+        ),
+    ] = 0,
+    dedup_window: Annotated[
+        int,
+        typer.Option(
+            help="Embed identical texts only once. Duplicates within a batch and among the last N distinct texts "
+            "are reused instead of being embedded again."
+        ),
+    ] = 0,
+    embed_workers: Annotated[
+        int,
+        typer.Option(
+            help="Run local embedding functions (default, st) in this many processes, each with its own model and "
+            "an equal share of the CPU cores."
+        ),
+    ] = 0,
+    only_missing: Annotated[
+        bool,
+        typer.Option(
+            help="Only embed records without a valid embedding. Records that already have an embedding of the "
+            "expected dimension are passed through. Output order is preserved."
+        ),
+    ] = False,
+    dimension: Annotated[
+        Optional[int],
+        typer.Option(
+            help="The expected embedding dimension for --only-missing. Defaults to the dimension of the embedding "
+            "function."
+        ),
+    ] = None,
 ) -> None:
-    _batch: Dict[str, Any] = {
-        "documents": [],
-        "embeddings": [],
-        "metadatas": [],
-        "ids": [],
-    }
     _embedding_function = get_embedding_function_for_name(
-        embedding_function, model=embedding_model
+        embedding_function,
+        model=embedding_model,
+        tokenizer=tokenizer,
+        embed_workers=embed_workers,
     )
-    for line in inf:
-        doc = remap_features(
-            json.loads(line),
-            doc_feature,
-            embed_feature=embed_feature,
-            meta_features=meta_features,
-            id_feature=id_feature,
+    _planner = None
+    if (
+        embedding_function in REMOTE_EMBEDDING_FUNCTIONS
+        or max_tokens is not None
+        or max_input_tokens is not None
+    ):
+        # requests are packed by token budget, batch_size is then the maximum number of inputs per request
+        _planner = RequestPlanner(
+            get_provider_limits(
+                embedding_function.value if embedding_function else None,
+                max_inputs=batch_size,
+                max_tokens=max_tokens,
+                max_input_tokens=max_input_tokens,
+            ),
+            token_counter=get_token_counter(tokenizer),
+            overflow=overflow,
         )
-        _batch["documents"].append(doc.text_chunk)
-        _batch["metadatas"].append(doc.metadata)
-        _batch["ids"].append(doc.id)
-        if len(_batch["documents"]) >= batch_size:
-            _batch["embeddings"] = _embedding_function(_batch["documents"])
-            for d, m, i, e in zip(
-                _batch["documents"],
-                _batch["metadatas"],
-                _batch["ids"],
-                _batch["embeddings"],
-            ):
-                typer.echo(
-                    json.dumps(
-                        EmbeddableTextResource(
-                            text_chunk=d, metadata=m, id=i, embedding=e
-                        ).model_dump()
-                    )
-                )
-            _batch: Dict[str, Any] = {
-                "documents": [],
-                "embeddings": [],
-                "metadatas": [],
-                "ids": [],
-            }
-    if len(_batch["documents"]) > 0:
-        _batch["embeddings"] = _embedding_function(_batch["documents"])
-        for d, m, i, e in zip(
-            _batch["documents"],
-            _batch["metadatas"],
-            _batch["ids"],
-            _batch["embeddings"],
-        ):
-            typer.echo(
-                json.dumps(
-                    EmbeddableTextResource(
-                        text_chunk=d, metadata=m, id=i, embedding=e
-                    ).model_dump()
-                )
+        batch_size = _planner.limits.max_inputs
+    _batch_size = batch_size or 100
+    _read_size = _batch_size
+    _ef = _embedding_function
+    if length_window > 0:
+        if _planner is not None:
+            raise typer.BadParameter(
+                "--length-window cannot be combined with request packing (remote embedding functions, "
+                "--max-tokens or --max-input-tokens)."
             )
+        _ef = LengthBucketedEmbeddingFunction(_embedding_function, _batch_size)
+        _read_size = max(length_window, _batch_size)
+    _dedup = None
+    if dedup_window > 0:
+        _ef = _dedup = DedupEmbeddingFunction(_ef, window=dedup_window)
+    _executor = EmbeddingExecutor(_ef, max_in_flight=max_in_flight)
+
+    _expected_dimension = dimension
+    # records in input order, written once they (and all records before them) are embedded
+    _pending: Deque[List[Any]] = deque()
+    _max_pending = 10 * _read_size
+
+    def _write_ready() -> None:
+        while _pending and _pending[0][1]:
+            typer.echo(json.dumps(_pending.popleft()[0].model_dump()))
+
+    def _is_embedded(doc: EmbeddableTextResource) -> bool:
+        nonlocal _expected_dimension
+        e = doc.embedding
+        if not isinstance(e, np.ndarray) or e.ndim != 1 or e.size == 0:
+            return False
+        if not np.issubdtype(e.dtype, np.number) or not np.isfinite(e).all():
+            return False
+        if _expected_dimension is None:
+            # the dimension of the embedding function, probed once
+            _expected_dimension = len(_embedding_function(["dimension probe"])[0])
+        return bool(e.shape[0] == _expected_dimension)
+
+    def _read_batches(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        _batch: Dict[str, Any] = {"documents": [], "entries": []}
+        for line in lines:
+            doc = remap_features(
+                json.loads(line),
+                doc_feature,
+                embed_feature=embed_feature,
+                meta_features=meta_features,
+                id_feature=id_feature,
+            )
+            if only_missing and _is_embedded(doc):
+                _pending.append([doc, True])
+                _write_ready()
+                if len(_pending) < _max_pending or not _batch["documents"]:
+                    continue
+                # too many records wait for this batch, embed it now
+                yield {**_batch, "flush": True}
+                _batch = {"documents": [], "entries": []}
+                continue
+            entry = [doc, False]
+            _pending.append(entry)
+            _batch["documents"].append(doc.text_chunk)
+            _batch["entries"].append(entry)
+            if len(_batch["documents"]) >= _read_size:
+                yield _batch
+                _batch = {"documents": [], "entries": []}
+        if len(_batch["documents"]) > 0:
+            yield _batch
+
+    with smart_open(file, inf) as file_or_stdin:
+        _batches = _read_batches(file_or_stdin)
+        if _planner is not None:
+            _batches = _planner.plan(_batches)
+        for _batch in _executor.map(_batches):
+            for entry, e in zip(_batch["entries"], _batch["embeddings"]):
+                entry[0].embedding = e
+                entry[1] = True
+            _write_ready()
+    if _planner is not None:
+        typer.echo(f"Embedding requests: {_planner.requests}.", err=True)
+    if _dedup is not None:
+        _dedup_stats = _dedup.stats()
+        typer.echo(
+            f"Deduplication: embedded {_dedup_stats['embedded']} of {_dedup_stats['texts']} texts, "
+            f"{_dedup_stats['saved']} embeddings saved.",
+            err=True,
+        )
+    _cache_stats = get_cache_stats(_embedding_function)
+    if _cache_stats:
+        typer.echo(
+            f"Embedding cache: {_cache_stats['hits']} hits, {_cache_stats['misses']} misses.",
+            err=True,
+        )
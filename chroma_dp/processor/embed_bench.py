@@ -0,0 +1,146 @@
+import itertools
+import sys
+import time
+from typing import Annotated, Any, Callable, Dict, Iterable, List, Optional
+
+import orjson as json
+import typer
+from chromadb import EmbeddingFunction
+from rich.console import Console
+from rich.table import Table
+
+from chroma_dp.utils import smart_open
+from chroma_dp.utils.onnx import (
+    DynamicPaddingONNXMiniLM_L6_V2,
+    GRAPH_OPTIMIZATION_LEVELS,
+    SUPPORTS_TUNING,
+)
+
+
+def benchmark_configurations(
+    texts: List[str],
+    configurations: Iterable[Dict[str, Any]],
+    factory: Callable[..., EmbeddingFunction] = DynamicPaddingONNXMiniLM_L6_V2,  # type: ignore
+    warmup: int = 32,
+) -> List[Dict[str, Any]]:
+    """Embeds the texts with an embedding function created for every configuration (keyword arguments of the
+    factory) and returns the configurations with their throughput. Model loading and warm-up are not measured.
+    """
+    results = []
+    for config in configurations:
+        ef = factory(**config)
+        ef(texts[:warmup])
+        start = time.perf_counter()
+        ef(texts)
+        elapsed = time.perf_counter() - start
+        results.append(
+            {**config, "seconds": elapsed, "docs_per_second": len(texts) / elapsed}
+        )
+    return results
+
+
+def _sample_texts(count: int) -> List[str]:
+    from essential_generators import DocumentGenerator
+
+    generator = DocumentGenerator()
+    return [generator.paragraph() for _ in range(count)]
+
+
+def embed_bench(
+    inf: typer.FileText = typer.Argument(sys.stdin),
+    file: Optional[str] = typer.Option(
+        None,
+        "--in",
+        help="JSONL file with the documents to embed. Defaults to generated paragraphs.",
+    ),
+    doc_feature: Annotated[
+        str, typer.Option(help="The document feature.")
+    ] = "text_chunk",
+    limit: Annotated[
+        int, typer.Option(help="The number of documents to embed per configuration.")
+    ] = 1000,
+    intra_op_threads: Annotated[
+        Optional[List[int]],
+        typer.Option(
+            "--intra-op-threads", help="Intra-op threads to compare (repeatable)."
+        ),
+    ] = None,
+    inter_op_threads: Annotated[
+        Optional[List[int]],
+        typer.Option(
+            "--inter-op-threads", help="Inter-op threads to compare (repeatable)."
+        ),
+    ] = None,
+    optimization: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--optimization",
+            help=f"Graph optimization levels to compare (repeatable): {', '.join(GRAPH_OPTIMIZATION_LEVELS.keys())}.",
+        ),
+    ] = None,
+    batch_size: Annotated[
+        Optional[List[int]],
+        typer.Option("--batch-size", help="Batch sizes to compare (repeatable)."),
+    ] = None,
+    providers: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--provider",
+            help="Execution providers to compare (repeatable), e.g. CPUExecutionProvider.",
+        ),
+    ] = None,
+    int8: Annotated[
+        bool, typer.Option(help="Also compare the int8 quantized model.")
+    ] = False,
+) -> None:
+    """Compares the throughput of ONNX runtime configurations of the default embedding function."""
+    if not SUPPORTS_TUNING:
+        raise typer.BadParameter(
+            "The installed chromadb version does not support tuning the default embedding function, please upgrade it."
+        )
+    if file or not sys.stdin.isatty():
+        with smart_open(file, inf) as file_or_stdin:
+            texts = [
+                json.loads(line)[doc_feature]
+                for line in itertools.islice(
+                    (line for line in file_or_stdin if line.strip()), limit
+                )
+            ]
+    else:
+        texts = _sample_texts(limit)
+    if not texts:
+        raise typer.BadParameter("No documents to embed.")
+    grid = {
+        "intra_op_num_threads": intra_op_threads or [None],
+        "inter_op_num_threads": inter_op_threads or [None],
+        "graph_optimization_level": optimization or [None],
+        "batch_size": batch_size or [32],
+        "preferred_providers": [[p] for p in providers] if providers else [None],
+        "quantized": [False, True] if int8 else [False],
+    }
+    configurations = [
+        dict(zip(grid.keys(), values)) for values in itertools.product(*grid.values())
+    ]
+    results = benchmark_configurations(texts, configurations)
+    table = Table(title=f"Embedding {len(texts)} documents")
+    for column in [
+        "intra-op",
+        "inter-op",
+        "optimization",
+        "batch size",
+        "provider",
+        "model",
+        "docs/s",
+    ]:
+        table.add_column(column)
+    for r in sorted(results, key=lambda r: r["docs_per_second"], reverse=True):
+        table.add_row(
+            str(r["intra_op_num_threads"] or "default"),
+            str(r["inter_op_num_threads"] or "default"),
+            r["graph_optimization_level"] or "default",
+            str(r["batch_size"]),
+            r["preferred_providers"][0] if r["preferred_providers"] else "default",
+            "int8" if r["quantized"] else "fp32",
+            f"{r['docs_per_second']:.1f}",
+        )
+    Console().print(table)
@@ -0,0 +1,194 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Annotated, Any, Callable, Dict, List, Optional, Tuple
+
+import typer
+from chromadb import EmbeddingFunction, Embeddings
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from chroma_dp.utils.embedding import (
+    SupportedEmbeddingFunctions,
+    get_embedding_function_for_name,
+)
+
+
+class EmbedRequest(BaseModel):
+    input: List[str]
+    ef: Optional[SupportedEmbeddingFunctions] = None
+    model: Optional[str] = None
+
+
+class MicroBatcher:
+    """Collects the texts of concurrent requests for up to `max_wait` seconds (or `max_batch_size` texts) and embeds
+    them with a single call."""
+
+    def __init__(
+        self,
+        ef: EmbeddingFunction,  # type: ignore
+        max_batch_size: int = 256,
+        max_wait: float = 0.005,
+    ) -> None:
+        self._ef = ef
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.calls = 0
+        self._queue: "Queue[Tuple[List[str], Future[Embeddings]]]" = Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> "Future[Embeddings]":
+        future: "Future[Embeddings]" = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._embed(batch)
+
+    def _embed(self, batch: List[Tuple[List[str], "Future[Embeddings]"]]) -> None:
+        texts = [t for item in batch for t in item[0]]
+        try:
+            embeddings = self._ef(texts) if texts else []
+            self.calls += 1
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        start = 0
+        for item_texts, future in batch:
+            future.set_result(embeddings[start : start + len(item_texts)])
+            start += len(item_texts)
+
+
+class ResidentModels:
+    """Embedding functions kept loaded by the server, each behind its own micro-batcher. Loaded on first use."""
+
+    def __init__(
+        self,
+        default_ef: SupportedEmbeddingFunctions = SupportedEmbeddingFunctions.default,
+        default_model: Optional[str] = None,
+        max_batch_size: int = 256,
+        max_wait: float = 0.005,
+        factory: Callable[..., EmbeddingFunction] = get_embedding_function_for_name,  # type: ignore
+        **ef_kwargs: Any,
+    ) -> None:
+        self.default_ef = default_ef
+        self.default_model = default_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._factory = factory
+        self._ef_kwargs = ef_kwargs
+        self._models: Dict[Tuple[str, Optional[str]], MicroBatcher] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self, ef: Optional[SupportedEmbeddingFunctions], model: Optional[str]
+    ) -> MicroBatcher:
+        _ef = ef or self.default_ef
+        if _ef == SupportedEmbeddingFunctions.remote_local:
+            raise ValueError("The embedding server cannot embed with remote-local.")
+        _model = model or (self.default_model if _ef == self.default_ef else None)
+        key = (_ef.value, _model)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = MicroBatcher(
+                    self._factory(_ef, model=_model, **self._ef_kwargs),
+                    max_batch_size=self.max_batch_size,
+                    max_wait=self.max_wait,
+                )
+            return self._models[key]
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return [f"{ef}:{model or ''}" for ef, model in self._models.keys()]
+
+
+def create_app(models: ResidentModels) -> FastAPI:
+    app = FastAPI(title="CDP Embedding Server", default_response_class=ORJSONResponse)
+
+    @app.get("/api/v1/health")
+    def health() -> Dict[str, Any]:
+        return {"status": "ok", "models": models.loaded()}
+
+    # a sync endpoint, requests wait for their micro-batch in the threadpool
+    @app.post("/api/v1/embed")
+    def embed(request: EmbedRequest) -> Dict[str, Any]:
+        try:
+            batcher = models.get(request.ef, request.model)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            embeddings = batcher.submit(request.input).result()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=repr(e))
+        return {"embeddings": embeddings}
+
+    return app
+
+
+def embed_server(
+    embedding_function: SupportedEmbeddingFunctions = typer.Option(
+        SupportedEmbeddingFunctions.default,
+        "--ef",
+        help="The default embedding function, loaded at startup.",
+    ),
+    embedding_model: Optional[str] = typer.Option(
+        None,
+        "--model",
+        help="The embedding model to be used by the default embedding function.",
+    ),
+    host: Annotated[str, typer.Option(help="The host to listen on.")] = "127.0.0.1",
+    port: Annotated[int, typer.Option(help="The port to listen on.")] = 8765,
+    uds: Optional[str] = typer.Option(
+        None, "--uds", help="Listen on this Unix domain socket instead of TCP."
+    ),
+    max_batch_size: Annotated[
+        int,
+        typer.Option(help="The maximum number of texts in a micro-batch."),
+    ] = 256,
+    max_wait_ms: Annotated[
+        float,
+        typer.Option(
+            help="How long to wait for concurrent requests to fill a micro-batch."
+        ),
+    ] = 5,
+    embed_workers: Annotated[
+        int,
+        typer.Option(
+            help="Run local embedding functions (default, st) in this many processes."
+        ),
+    ] = 0,
+) -> None:
+    try:
+        import uvicorn
+    except ImportError:
+        raise ValueError(
+            "The uvicorn python package is not installed. Please install it with `pip install uvicorn`"
+        )
+    models = ResidentModels(
+        default_ef=embedding_function,
+        default_model=embedding_model,
+        max_batch_size=max_batch_size,
+        max_wait=max_wait_ms / 1000,
+        embed_workers=embed_workers,
+    )
+    # load the default model before accepting requests
+    models.get(None, None).submit(["warm up"]).result()
+    uvicorn.run(create_app(models), host=host, port=port, uds=uds, log_level="warning")
@@ -1,10 +1,12 @@
 import hashlib
+import itertools
 import orjson as json
 import os
 import sys
 import uuid
 from abc import ABC, abstractmethod
-from typing import Any, Iterable, Annotated, Optional
+from enum import Enum
+from typing import Any, Callable, Iterable, Annotated, List, Optional, Sequence
 
 import typer
 from jinja2 import Environment
@@ -13,6 +15,59 @@ from ulid import ULID
 
 from chroma_dp import EmbeddableTextResource, CdpProcessor
 from chroma_dp.utils import smart_open
+from chroma_dp.utils.templating import DocumentTemplate
+
+
+class HashAlgorithm(str, Enum):
+    sha256 = "sha256"
+    blake2b = "blake2b"
+    xxhash = "xxhash"
+
+
+def get_hasher(
+    algorithm: HashAlgorithm, digest_size: Optional[int] = None
+) -> Callable[[bytes], str]:
+    """Returns a function hashing bytes to a hex digest of `digest_size` bytes. Defaults to 32 bytes for sha256, 16
+    for blake2b and 8 for xxhash (xxh3, 8 or 16 bytes)."""
+    if algorithm == HashAlgorithm.sha256:
+        size = digest_size or 32
+        if not 1 <= size <= 32:
+            raise ValueError("The sha256 digest size must be between 1 and 32 bytes.")
+        if size == 32:
+            return lambda data: hashlib.sha256(data).hexdigest()
+        return lambda data: hashlib.sha256(data).digest()[:size].hex()
+    if algorithm == HashAlgorithm.blake2b:
+        size = digest_size or 16
+        if not 1 <= size <= 64:
+            raise ValueError("The blake2b digest size must be between 1 and 64 bytes.")
+        return lambda data: hashlib.blake2b(data, digest_size=size).hexdigest()
+    try:
+        import xxhash
+    except ImportError:
+        raise ValueError(
+            "The xxhash python package is not installed. Please install it with `pip install xxhash`"
+        )
+    size = digest_size or 8
+    if size == 8:
+        return xxhash.xxh3_64_hexdigest  # type: ignore
+    if size == 16:
+        return xxhash.xxh3_128_hexdigest  # type: ignore
+    raise ValueError("The xxhash digest size must be 8 or 16 bytes.")
+
+
+def _field_getter(field: str) -> Callable[[EmbeddableTextResource], Any]:
+    if field == "text":
+        return lambda doc: doc.text_chunk
+    if field == "id":
+        return lambda doc: doc.id
+    if field == "metadata":
+        return lambda doc: doc.metadata
+    if field.startswith("metadata.") and len(field) > len("metadata."):
+        key = field[len("metadata.") :]
+        return lambda doc: (doc.metadata or {}).get(key)
+    raise ValueError(
+        f"Unsupported hash field {field}, expected text, id, metadata or metadata.<key>."
+    )
 
 
 class IDStrategy(ABC, EnforceOverrides):
@@ -20,6 +75,9 @@ class IDStrategy(ABC, EnforceOverrides):
     def generate_id(self, doc: EmbeddableTextResource) -> str:
         pass
 
+    def generate_ids(self, docs: Sequence[EmbeddableTextResource]) -> List[str]:
+        return [self.generate_id(doc) for doc in docs]
+
 
 class UUIDStrategy(IDStrategy):
     @override
@@ -40,37 +98,76 @@ class ExprStrategy(IDStrategy):
     def __init__(self, expr: str) -> None:
         self._expr = expr
         self._ulid = ULID()
-        self._jinja_env = Environment()
+        # compiled once, the documents only provide the fields the expression uses
+        self._template = DocumentTemplate(
+            expr, env=Environment(), uuid=uuid.uuid4, ulid=self._ulid.generate
+        )
 
     @override
     def generate_id(self, doc: EmbeddableTextResource) -> str:
-        return str(
-            self._jinja_env.from_string(self._expr).render(
-                uuid=uuid.uuid4, ulid=self._ulid.generate, **doc.model_dump()
-            )
-        )
+        return self._template.render(doc)
 
 
-class DocHashStrategy(IDStrategy):
-    def __init__(self) -> None:
-        self._sha256_hash = hashlib.sha256()
+class ContentHashStrategy(IDStrategy):
+    """Content-addressed ids - each document is hashed independently over the selected fields (`text`, `id`,
+    `metadata` or `metadata.<key>`), so the same content always gets the same id. A single string field is hashed
+    as its utf-8 bytes, otherwise the field values are hashed as a JSON array (with sorted keys).
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str] = ("text",),
+        algorithm: HashAlgorithm = HashAlgorithm.sha256,
+        digest_size: Optional[int] = None,
+    ) -> None:
+        if not fields:
+            raise ValueError("At least one hash field is required.")
+        self.fields = list(fields)
+        self._getters = [_field_getter(f) for f in self.fields]
+        self._hash = get_hasher(algorithm, digest_size)
+
+    def _content(self, doc: EmbeddableTextResource) -> bytes:
+        values = [get(doc) for get in self._getters]
+        if all(v is None for v in values):
+            raise ValueError(
+                f"None of the hash fields {', '.join(self.fields)} are set for document {doc.id}"
+            )
+        if len(values) == 1 and isinstance(values[0], str):
+            return values[0].encode("utf-8")
+        return json.dumps(values, option=json.OPT_SORT_KEYS)
+
+    def _hash_text(self, docs: Sequence[EmbeddableTextResource]) -> List[str]:
+        """The fast path of the default text field."""
+        _hash = self._hash
+        try:
+            return [_hash(doc.text_chunk.encode("utf-8")) for doc in docs]  # type: ignore
+        except AttributeError:
+            # a document without text, fails with the error of the general path
+            return [_hash(self._content(doc)) for doc in docs]
 
     @override
     def generate_id(self, doc: EmbeddableTextResource) -> str:
-        if doc.text_chunk is None:
-            raise ValueError("Document text chunk is None")
-        self._sha256_hash.update(doc.text_chunk.encode("utf-8"))
-        return self._sha256_hash.hexdigest()
+        return self._hash(self._content(doc))
 
+    @override
+    def generate_ids(self, docs: Sequence[EmbeddableTextResource]) -> List[str]:
+        if self.fields == ["text"]:
+            return self._hash_text(docs)
+        _hash, _content = self._hash, self._content
+        return [_hash(_content(doc)) for doc in docs]
+
+
+class DocHashStrategy(ContentHashStrategy):
+    """The SHA256 of the text of each document."""
 
-class RandomHashStrategy(IDStrategy):
     def __init__(self) -> None:
-        self._sha256_hash = hashlib.sha256()
+        super().__init__(fields=("text",), algorithm=HashAlgorithm.sha256)
 
+
+class RandomHashStrategy(IDStrategy):
     @override
     def generate_id(self, doc: EmbeddableTextResource) -> str:
-        self._sha256_hash.update(os.urandom(32))
-        return self._sha256_hash.hexdigest()
+        return hashlib.sha256(os.urandom(32)).hexdigest()
 
 
 # --uuid --ulid --expr "{{ metadata.key }}" --doc-hash sha256
@@ -78,15 +175,22 @@ class IdStrategyGenerateProcessor(CdpProcessor[EmbeddableTextResource]):
     def __init__(
         self,
         strategy: IDStrategy = UUIDStrategy(),
+        batch_size: int = 1000,
     ):
         self._strategy = strategy
+        self.batch_size = batch_size
 
     def process(
         self, *, documents: Iterable[EmbeddableTextResource], **kwargs: Any
     ) -> Iterable[EmbeddableTextResource]:
-        for doc in documents:
-            doc.id = self._strategy.generate_id(doc)
-            yield doc
+        _documents = iter(documents)
+        while True:
+            batch = list(itertools.islice(_documents, self.batch_size))
+            if not batch:
+                return
+            for doc, _id in zip(batch, self._strategy.generate_ids(batch)):
+                doc.id = _id
+            yield from batch
 
 
 def id_process(
@@ -125,7 +229,31 @@ def id_process(
             ...,
             "--doc-hash",
             "-d",
-            help="Generate ID based on resources text chunk hash.",
+            help="Generate content-addressed IDs, hashing the --hash-field fields of each resource.",
+        ),
+    ] = None,
+    hash_fields: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            ...,
+            "--hash-field",
+            help="A field hashed by --doc-hash (text, id, metadata or metadata.<key>), repeatable. Defaults to text.",
+        ),
+    ] = None,
+    hash_algorithm: Annotated[
+        HashAlgorithm,
+        typer.Option(
+            ...,
+            "--hash-algorithm",
+            help="The hash algorithm of --doc-hash.",
+        ),
+    ] = HashAlgorithm.sha256,
+    digest_size: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            "--digest-size",
+            help="The digest size of --doc-hash in bytes (sha256 up to 32, blake2b up to 64, xxhash 8 or 16).",
         ),
     ] = None,
     random_hash: Annotated[
@@ -158,7 +286,11 @@ def id_process(
         strategy = ExprStrategy(expr)
 
     if doc_hash:
-        strategy = DocHashStrategy()
+        strategy = ContentHashStrategy(
+            fields=hash_fields or ("text",),
+            algorithm=hash_algorithm,
+            digest_size=digest_size,
+        )
 
     if random_hash:
         strategy = RandomHashStrategy()
@@ -169,13 +301,11 @@ def id_process(
         strategy=strategy,
     )
 
-    def process_docs(in_line: str) -> None:
-        doc = EmbeddableTextResource(**json.loads(in_line))
-        for doc in processor.process(
-            documents=[doc],
-        ):
-            typer.echo(json.dumps(doc.model_dump()))
-
     with smart_open(file, inf) as file_or_stdin:
-        for line in file_or_stdin:
-            process_docs(line)
+        docs = (
+            EmbeddableTextResource(**json.loads(line))
+            for line in file_or_stdin
+            if line.strip()
+        )
+        for doc in processor.process(documents=docs):
+            typer.echo(json.dumps(doc.model_dump()))
@@ -1,24 +1,29 @@
 import orjson as json
 import sys
-from typing import Any, Iterable, Annotated, Optional, List, Union, Dict
+from typing import Any, Iterable, Annotated, Optional, List, Union, Dict, Set
 
 import typer
-from jinja2 import Template
 
 from chroma_dp import EmbeddableTextResource, CdpProcessor, Metadata
 from chroma_dp.utils import smart_open
-from chroma_dp.utils.templating import get_jinja_env
+from chroma_dp.utils.expressions import Evaluator, compile_expression
+from chroma_dp.utils.templating import (
+    DocumentTemplate,
+    document_context,
+    get_jinja_env,
+)
 
 
 _jinja_env = get_jinja_env()
 
 
-def process_value(value: str) -> Union[bool, float, int, str, Template]:
-    """Parse the value as follows: bool>float>int>string"""
+def process_value(value: str) -> Union[bool, float, int, str, DocumentTemplate]:
+    """Parse the value as follows: template>bool>float>int>string"""
     if value.startswith("'") and value.endswith("'"):
         value = value[1:-1]
     if value.startswith("{{") and value.endswith("}}"):
-        return _jinja_env.from_string(value)
+        # the document fields the template references are found once, here
+        return DocumentTemplate(value, env=_jinja_env)
     if value.lower() == "true":
         return True
     elif value.lower() == "false":
@@ -36,7 +41,7 @@ def process_value(value: str) -> Union[bool, float, int, str, Template]:
     return value
 
 
-TemplateMetadata = Dict[str, Union[str, int, float, bool, Template]]
+TemplateMetadata = Dict[str, Union[str, int, float, bool, DocumentTemplate]]
 
 
 class MetadataProcessor(CdpProcessor[EmbeddableTextResource]):
@@ -45,10 +50,19 @@ class MetadataProcessor(CdpProcessor[EmbeddableTextResource]):
         metadata: Optional[TemplateMetadata] = None,
         remove_keys: Optional[List[str]] = None,
         overwrite: bool = False,
+        expressions: Optional[Dict[str, Evaluator]] = None,
     ):
         self._metadata = metadata
         self._remove_keys = remove_keys
         self._overwrite = overwrite
+        self._expressions = expressions
+        # the expressions whose evaluation failed, reported once each
+        self._failed: Set[str] = set()
+        templates = [
+            v for v in (metadata or {}).values() if isinstance(v, DocumentTemplate)
+        ]
+        # the fields of the shared render context of each document, e.g. without the embedding unless used
+        self._fields = sorted({f for t in templates for f in t.fields})
 
     def process(
         self, *, documents: Iterable[EmbeddableTextResource], **kwargs: Any
@@ -61,15 +75,46 @@ class MetadataProcessor(CdpProcessor[EmbeddableTextResource]):
             if self._metadata:
                 if not doc.metadata:
                     doc.metadata = {}
+                # built once per document and shared by the templates, metadata is the document's own dict so the
+                # templates see the values rendered before them
+                context = document_context(doc, self._fields)
                 for k, v in self._metadata.items():
-                    if isinstance(v, Template):
+                    if isinstance(v, DocumentTemplate):
                         # process rendered value
-                        doc.metadata[k] = process_value(v.render(**doc.model_dump()))
+                        doc.metadata[k] = process_value(v.render(doc, context))  # type: ignore
                     else:
                         if self._overwrite or k not in doc.metadata.keys():
                             doc.metadata[k] = v
+            if self._expressions:
+                self._evaluate(doc)
             yield doc
 
+    def _evaluate(self, doc: EmbeddableTextResource) -> None:
+        if not doc.metadata:
+            doc.metadata = {}
+        for k, expression in self._expressions.items():  # type: ignore
+            try:
+                value = expression(doc)
+            except (TypeError, ValueError, ArithmeticError) as e:
+                # a record with unexpected values does not stop the stream, like None its key is not set
+                if k not in self._failed:
+                    self._failed.add(k)
+                    typer.echo(
+                        f"Cannot evaluate {k} for document {doc.id}: {e}. The key is not set for the documents the "
+                        "expression fails on, further failures are not reported.",
+                        err=True,
+                    )
+                continue
+            if value is None:
+                # metadata values cannot be None, the key is left as is
+                continue
+            if not isinstance(value, (str, int, float, bool)):
+                raise ValueError(
+                    f"The expression of {k} returned a {type(value).__name__} for document {doc.id}, "
+                    "metadata values must be str, int, float or bool."
+                )
+            doc.metadata[k] = value
+
 
 def meta_process(
     inf: typer.FileText = typer.Argument(sys.stdin),
@@ -104,12 +149,22 @@ def meta_process(
             help="Indicates whether to overwrite the metadata if it already exists. Only applicable for --add.",
         ),
     ] = False,
+    expr: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            ...,
+            "--expr",
+            "-e",
+            help="A metadata key and an expression computing its value, e.g. length=len(text_chunk). "
+            "Evaluated after --attr, in order.",
+        ),
+    ] = None,
 ) -> None:
     """Add or remove metadata."""
     kv_pairs: Metadata = {}
-    if not meta and not remove_keys:
+    if not meta and not remove_keys and not expr:
         typer.echo(
-            "Please specify either --meta or --remove-key",
+            "Please specify either --meta, --expr or --remove-key",
             err=True,
             color=typer.colors.RED,
             file=sys.stderr,
@@ -128,17 +183,28 @@ def meta_process(
                     file=sys.stderr,
                 )
                 raise typer.Abort()
+    expressions: Dict[str, Evaluator] = {}
+    for opt in expr or []:
+        key, _, source = opt.partition("=")
+        try:
+            if not key.strip() or not source.strip():
+                raise ValueError(f"Invalid expression: {opt}")
+            expressions[key.strip()] = compile_expression(source)
+        except ValueError as e:
+            typer.echo(str(e), err=True, color=typer.colors.RED, file=sys.stderr)
+            raise typer.Abort()
     processor = MetadataProcessor(
-        metadata=kv_pairs, remove_keys=remove_keys, overwrite=overwrite
+        metadata=kv_pairs,
+        remove_keys=remove_keys,
+        overwrite=overwrite,
+        expressions=expressions,
     )
 
-    def process_docs(in_line: str) -> None:
-        doc = EmbeddableTextResource(**json.loads(in_line))
-        for _doc in processor.process(
-            documents=[doc],
-        ):
-            typer.echo(json.dumps(_doc.model_dump()))
-
     with smart_open(file, inf) as file_or_stdin:
-        for line in file_or_stdin:
-            process_docs(line)
+        docs = (
+            EmbeddableTextResource(**json.loads(line))
+            for line in file_or_stdin
+            if line.strip()
+        )
+        for doc in processor.process(documents=docs):
+            typer.echo(json.dumps(doc.model_dump()))
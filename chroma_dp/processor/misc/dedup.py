@@ -0,0 +1,629 @@
+import hashlib
+import itertools
+import os
+import sys
+from enum import Enum
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+import orjson as json
+import typer
+from jinja2 import Environment
+
+from chroma_dp import EmbeddableTextResource, CdpProcessor
+from chroma_dp.utils import smart_open
+from chroma_dp.utils.hash_embedding import splitmix64
+
+DUPLICATE_KEY = "duplicate"
+DUPLICATE_OF_KEY = "duplicate_of"
+SIMILARITY_KEY = "similarity"
+
+# the number of uint64 elements of a MinHash block (32MB)
+_MINHASH_BLOCK = 1 << 22
+_SHINGLE_PRIME = np.uint64(0x100000001B3)
+
+# the id of the document a duplicate matched (if known) and their estimated similarity
+Match = Optional[Tuple[Optional[str], float]]
+
+
+class DedupAction(str, Enum):
+    drop = "drop"
+    tag = "tag"
+
+
+class DedupKey(str, Enum):
+    text = "text"
+    id = "id"
+
+
+def fingerprints(keys: List[str]) -> npt.NDArray[np.uint64]:
+    """64-bit BLAKE2b fingerprints of the keys."""
+    digests = b"".join(
+        hashlib.blake2b(k.encode("utf-8"), digest_size=8).digest() for k in keys
+    )
+    return np.frombuffer(digests, dtype="<u8").astype(np.uint64)
+
+
+class FingerprintTable:
+    """Array-backed open-addressing hash table (linear probing) of 64-bit fingerprints, with an int64 value per
+    fingerprint. Lookups and inserts are vectorized over batches of fingerprints, which are expected to be hashes
+    (their low bits select the slot). The fingerprint 0 marks empty slots, it is stored as 1.
+
+    Without values the table is a compact set of fingerprints, 8 bytes per slot and at most half of the slots used.
+    """
+
+    def __init__(self, capacity: int = 1 << 15, with_values: bool = True) -> None:
+        size = 16
+        while size < capacity * 2:
+            size <<= 1
+        self.keys = np.zeros(size, dtype=np.uint64)
+        self.values: Optional[npt.NDArray[np.int64]] = (
+            np.zeros(size, dtype=np.int64) if with_values else None
+        )
+        self.count = 0
+
+    @classmethod
+    def from_arrays(
+        cls,
+        keys: npt.NDArray[np.uint64],
+        values: Optional[npt.NDArray[np.int64]] = None,
+    ) -> "FingerprintTable":
+        table = cls.__new__(cls)
+        table.keys = keys
+        table.values = values
+        table.count = int(np.count_nonzero(keys))
+        return table
+
+    @classmethod
+    def load(cls, path: str) -> "FingerprintTable":
+        with np.load(path) as data:
+            if "keys" not in data or "signatures" in data:
+                raise ValueError(f"{path} is not an exact duplicate index.")
+            return cls.from_arrays(data["keys"])
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, keys=self.keys)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @staticmethod
+    def _fingerprints(keys: npt.ArrayLike) -> npt.NDArray[np.uint64]:
+        keys = np.asarray(keys, dtype=np.uint64)
+        return np.where(keys == 0, np.uint64(1), keys)
+
+    def _find(self, keys: npt.NDArray[np.uint64]) -> npt.NDArray[np.intp]:
+        """The slot of each fingerprint, or the empty slot that ends its probe sequence."""
+        mask = len(self.keys) - 1
+        pos = (keys & np.uint64(mask)).astype(np.intp)
+        pending = np.arange(len(keys))
+        while pending.size:
+            slot_keys = self.keys[pos[pending]]
+            pending = pending[(slot_keys != keys[pending]) & (slot_keys != 0)]
+            pos[pending] = (pos[pending] + 1) & mask
+        return pos
+
+    def get_many(self, keys: npt.ArrayLike, default: int = -1) -> npt.NDArray[np.int64]:
+        """The values of the fingerprints, `default` for the missing ones."""
+        keys = self._fingerprints(keys)
+        pos = self._find(keys)
+        values = self.values[pos] if self.values is not None else 0
+        return np.where(self.keys[pos] == keys, values, default)
+
+    def put_many(self, keys: npt.ArrayLike, values: npt.ArrayLike) -> None:
+        """Inserts or updates the fingerprints, the last value wins for fingerprints repeated in the batch."""
+        keys = self._fingerprints(keys)
+        values = np.broadcast_to(np.asarray(values, dtype=np.int64), keys.shape)
+        keys, last = np.unique(keys[::-1], return_index=True)
+        values = values[::-1][last]
+        if (self.count + len(keys)) * 2 > len(self.keys):
+            self._resize(len(self.keys) * 2, self.count + len(keys))
+        pending = np.arange(len(keys))
+        while pending.size:
+            pos = self._find(keys[pending])
+            new = self.keys[pos] == 0
+            # one new fingerprint claims each empty slot, the others probe again
+            _, first = np.unique(pos[new], return_index=True)
+            done = ~new
+            done[np.flatnonzero(new)[first]] = True
+            self.keys[pos[done]] = keys[pending[done]]
+            if self.values is not None:
+                self.values[pos[done]] = values[pending[done]]
+            self.count += len(first)
+            pending = pending[~done]
+
+    def add_many(self, keys: npt.ArrayLike) -> npt.NDArray[np.bool_]:
+        """Adds the fingerprints, returns which of them were already present (or repeated earlier in the batch)."""
+        keys = self._fingerprints(keys)
+        present = self.get_many(keys) >= 0
+        _, first = np.unique(keys, return_index=True)
+        repeated = np.ones(len(keys), dtype=bool)
+        repeated[first] = False
+        present |= repeated
+        self.put_many(keys[~present], 0)
+        return present
+
+    def discard_below(self, min_value: int) -> None:
+        """Removes the fingerprints with a value below `min_value`."""
+        if self.values is None:
+            raise ValueError("The table has no values.")
+        keep = (self.keys != 0) & (self.values >= min_value)
+        keys, values = self.keys[keep], self.values[keep]
+        self.keys = np.zeros_like(self.keys)
+        self.values = np.zeros_like(self.values)
+        self.count = 0
+        self.put_many(keys, values)
+
+    def _resize(self, size: int, needed: int) -> None:
+        while size < needed * 2:
+            size <<= 1
+        occupied = self.keys != 0
+        keys = self.keys[occupied]
+        values = self.values[occupied] if self.values is not None else 0
+        self.keys = np.zeros(size, dtype=np.uint64)
+        if self.values is not None:
+            self.values = np.zeros(size, dtype=np.int64)
+        self.count = 0
+        self.put_many(keys, values)
+
+
+class BloomFilter:
+    """Bloom filter of 64-bit fingerprints, sized for `capacity` fingerprints at the `error_rate` false positive
+    probability (about 1.2 bytes per fingerprint at 1%, 1.8 at 0.1%). The bit positions of a fingerprint come from
+    double hashing, tests and inserts are vectorized over batches. Past the capacity the error rate grows.
+    """
+
+    def __init__(self, capacity: int = 10_000_000, error_rate: float = 0.001) -> None:
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError(
+                "The capacity must be positive and the error rate in (0, 1)."
+            )
+        bits = int(np.ceil(-capacity * np.log(error_rate) / np.log(2) ** 2))
+        self.words = np.zeros((bits + 63) // 64, dtype=np.uint64)
+        self.num_hashes = max(1, round(len(self.words) * 64 / capacity * np.log(2)))
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        with np.load(path) as data:
+            if "words" not in data:
+                raise ValueError(f"{path} is not a Bloom filter index.")
+            bloom = cls.__new__(cls)
+            bloom.words = data["words"]
+            bloom.num_hashes = int(data["num_hashes"])
+            return bloom
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, words=self.words, num_hashes=np.asarray(self.num_hashes))
+
+    def _bits(
+        self, keys: npt.NDArray[np.uint64]
+    ) -> Tuple[npt.NDArray[np.intp], npt.NDArray[np.uint64]]:
+        """The word and the bit mask of each of the `num_hashes` bits of each fingerprint."""
+        step = splitmix64(keys) | np.uint64(1)
+        i = np.arange(self.num_hashes, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            positions = (keys[:, None] + i * step[:, None]) % np.uint64(
+                len(self.words) * 64
+            )
+        words = (positions >> np.uint64(6)).astype(np.intp)
+        return words, np.uint64(1) << (positions & np.uint64(63))
+
+    def add_many(self, keys: npt.ArrayLike) -> npt.NDArray[np.bool_]:
+        """Adds the fingerprints, returns which of them were (probably) already present or repeated earlier in the
+        batch."""
+        keys = np.asarray(keys, dtype=np.uint64)
+        words, masks = self._bits(keys)
+        present = ((self.words[words] & masks) != 0).all(axis=1)
+        _, first = np.unique(keys, return_index=True)
+        repeated = np.ones(len(keys), dtype=bool)
+        repeated[first] = False
+        present |= repeated
+        np.bitwise_or.at(self.words, words[~present].ravel(), masks[~present].ravel())
+        return present
+
+
+class MinHasher:
+    """MinHash signatures of the byte shingles of texts (lowercased, whitespace collapsed). Shingles are hashed with a
+    polynomial hash over all the texts of a batch at once, and each of the `num_perm` permutations is a
+    multiply-shift hash of the shingle hashes."""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        if num_perm < 1 or shingle_size < 1:
+            raise ValueError(
+                "The number of permutations and the shingle size must be positive."
+            )
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        max_uint64 = np.iinfo(np.uint64).max
+        self._a = rng.integers(1, max_uint64, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, max_uint64, num_perm, dtype=np.uint64)
+
+    def shingles(
+        self, texts: List[str]
+    ) -> Tuple[npt.NDArray[np.uint64], npt.NDArray[np.intp]]:
+        """The shingle hashes of the texts and the index of the text of each. Texts shorter than the shingle size are
+        a single shingle, empty texts have none."""
+        k = self.shingle_size
+        encoded = [" ".join(t.lower().split()).encode("utf-8") for t in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.intp, count=len(encoded))
+        counts = np.where(lengths >= k, lengths - k + 1, np.minimum(lengths, 1))
+        owner = np.repeat(np.arange(len(texts)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        pos = np.repeat(np.cumsum(lengths) - lengths, counts) + offsets
+        buf = np.frombuffer(b"".join(encoded) + bytes(k), dtype=np.uint8)
+        # shifted by one, so that the padding of short texts differs from a 0 byte
+        shifted = buf.astype(np.uint64) + np.uint64(1)
+        own_lengths = lengths[owner]
+        hashes = np.zeros(len(pos), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for j in range(k):
+                byte = np.where(j < own_lengths, shifted[pos + j], np.uint64(0))
+                hashes = hashes * _SHINGLE_PRIME + byte
+        return splitmix64(hashes), owner
+
+    def signatures(self, texts: List[str]) -> npt.NDArray[np.uint32]:
+        """The (len(texts), num_perm) MinHash signatures of the texts."""
+        hashes, owner = self.shingles(texts)
+        sig = np.full(
+            (len(texts), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32
+        )
+        step = max(1, _MINHASH_BLOCK // self.num_perm)
+        values = np.empty((self.num_perm, min(step, len(hashes))), dtype=np.uint64)
+        for lo in range(0, len(hashes), step):
+            block, block_owner = hashes[lo : lo + step], owner[lo : lo + step]
+            # one permutation per row, so that the reduction runs over contiguous memory
+            out = values[:, : len(block)]
+            with np.errstate(over="ignore"):
+                np.multiply(self._a[:, None], block[None, :], out=out)
+                out += self._b[:, None]
+            starts = np.flatnonzero(np.r_[True, block_owner[1:] != block_owner[:-1]])
+            docs = block_owner[starts]
+            # the minimum of the high 32 bits is the high 32 bits of the minimum
+            mins = np.minimum.reduceat(out, starts, axis=1) >> np.uint64(32)
+            sig[docs] = np.minimum(sig[docs], mins.T.astype(np.uint32))
+        return sig
+
+
+def lsh_parameters(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """The number of bands and rows per band that minimize the sum of the false positive and false negative
+    probabilities of the LSH candidates around the Jaccard threshold."""
+    similarity = np.linspace(0, 1, 1001)
+    best: Tuple[float, int, int] = (np.inf, 1, num_perm)
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        candidate = 1 - (1 - similarity**rows) ** bands
+        error = np.where(similarity < threshold, candidate, 1 - candidate).mean()
+        if error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index of the documents seen so far. The bands of each signature are hashed into a single
+    fingerprint table, whose values point into a ring buffer of the signatures of the last `max_size` documents, so
+    the memory is bounded - older documents are evicted. Candidates are verified with the estimated Jaccard
+    similarity of their signatures."""
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        max_size: int = 1_000_000,
+        seed: int = 1,
+    ) -> None:
+        if not 0 < threshold <= 1:
+            raise ValueError("The similarity threshold must be in (0, 1].")
+        self.threshold = threshold
+        self.max_size = max_size
+        self.seed = seed
+        self.minhasher = MinHasher(num_perm, shingle_size, seed)
+        self.bands, self.rows = lsh_parameters(threshold, num_perm)
+        self.signatures = np.zeros((min(max_size, 1024), num_perm), dtype=np.uint32)
+        self.ids: List[Optional[str]] = []
+        self.seq = 0
+        self.table = FingerprintTable()
+
+    def _params(self) -> npt.NDArray[np.int64]:
+        return np.asarray(
+            [
+                self.minhasher.num_perm,
+                self.minhasher.shingle_size,
+                self.seed,
+                self.bands,
+                self.rows,
+                self.max_size,
+            ],
+            dtype=np.int64,
+        )
+
+    def band_keys(self, signatures: npt.NDArray[np.uint32]) -> npt.NDArray[np.uint64]:
+        """The (len(signatures), bands) fingerprints of the bands, distinct between the bands."""
+        x = signatures[:, : self.bands * self.rows].reshape(
+            len(signatures), self.bands, self.rows
+        )
+        seeds = splitmix64(np.arange(1, self.bands + 1, dtype=np.uint64))
+        keys = np.broadcast_to(seeds, (len(signatures), self.bands))
+        for j in range(self.rows):
+            keys = splitmix64(keys ^ x[:, :, j].astype(np.uint64))
+        return keys
+
+    def _add(
+        self,
+        signature: npt.NDArray[np.uint32],
+        keys: npt.NDArray[np.uint64],
+        id: Optional[str],
+    ) -> None:
+        slot = self.seq % self.max_size
+        if slot >= len(self.signatures):
+            grown = np.zeros(
+                (
+                    min(self.max_size, len(self.signatures) * 2),
+                    self.signatures.shape[1],
+                ),
+                dtype=np.uint32,
+            )
+            grown[: len(self.signatures)] = self.signatures
+            self.signatures = grown
+        self.signatures[slot] = signature
+        if slot < len(self.ids):
+            self.ids[slot] = id
+        else:
+            self.ids.append(id)
+        if self.seq > self.max_size and (self.table.count + len(keys)) * 2 > len(
+            self.table.keys
+        ):
+            # drop the buckets of evicted documents before growing the table
+            self.table.discard_below(self.seq - self.max_size)
+        self.table.put_many(keys, self.seq)
+        self.seq += 1
+
+    def query_insert(self, texts: List[str], ids: List[Optional[str]]) -> List[Match]:
+        """Matches each text against the index (including the texts before it in the batch), the texts without a
+        match are added to the index."""
+        signatures = self.minhasher.signatures(texts)
+        keys = self.band_keys(signatures)
+        matches: List[Match] = []
+        for signature, doc_keys, id in zip(signatures, keys, ids):
+            seqs = self.table.get_many(doc_keys)
+            live = seqs >= max(self.seq - self.max_size, 0)
+            match: Match = None
+            if live.any():
+                slots = np.unique(seqs[live]) % self.max_size
+                similarity = (self.signatures[slots] == signature).mean(axis=1)
+                best = int(similarity.argmax())
+                if similarity[best] >= self.threshold:
+                    match = (self.ids[slots[best]], float(similarity[best]))
+            if match is None:
+                # the bands already in the index keep pointing to the first document
+                self._add(signature, doc_keys[~live], id)
+            matches.append(match)
+        return matches
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                params=self._params(),
+                seq=np.asarray(self.seq),
+                signatures=self.signatures[: len(self.ids)],
+                ids=np.asarray([i or "" for i in self.ids], dtype=np.str_),
+                keys=self.table.keys,
+                values=self.table.values,
+            )
+
+    def load(self, path: str) -> None:
+        with np.load(path) as data:
+            if "signatures" not in data:
+                raise ValueError(f"{path} is not a near-duplicate index.")
+            if not np.array_equal(data["params"], self._params()):
+                raise ValueError(
+                    f"The index {path} was built with different parameters "
+                    "(number of permutations, shingle size, threshold or maximum size)."
+                )
+            self.seq = int(data["seq"])
+            self.ids = [i or None for i in data["ids"].tolist()]
+            self.signatures = np.zeros(
+                (max(len(self.ids), len(self.signatures)), self.minhasher.num_perm),
+                dtype=np.uint32,
+            )
+            self.signatures[: len(self.ids)] = data["signatures"]
+            self.table = FingerprintTable.from_arrays(data["keys"], data["values"])
+
+
+class DedupProcessor(CdpProcessor[EmbeddableTextResource]):
+    def __init__(
+        self,
+        key: DedupKey = DedupKey.text,
+        expr: Optional[str] = None,
+        near: bool = False,
+        bloom: bool = False,
+        action: DedupAction = DedupAction.drop,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        max_index_size: int = 1_000_000,
+        capacity: int = 10_000_000,
+        error_rate: float = 0.001,
+        index_file: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> None:
+        if near and bloom:
+            raise ValueError("--near and --bloom cannot be combined.")
+        self.key = key
+        # compiled once, rendered with the document fields
+        self._template = Environment().from_string(expr) if expr else None
+        self.near = near
+        self.action = action
+        self.batch_size = batch_size
+        self.index_file = index_file
+        exists = bool(index_file) and os.path.exists(index_file)  # type: ignore
+        self._index: Union[NearDuplicateIndex, FingerprintTable, BloomFilter]
+        if near:
+            self._index = NearDuplicateIndex(
+                threshold=threshold,
+                num_perm=num_perm,
+                shingle_size=shingle_size,
+                max_size=max_index_size,
+            )
+            if exists:
+                self._index.load(index_file)  # type: ignore
+        elif bloom:
+            self._index = (
+                BloomFilter.load(index_file)  # type: ignore
+                if exists
+                else BloomFilter(capacity=capacity, error_rate=error_rate)
+            )
+        else:
+            self._index = (
+                FingerprintTable.load(index_file)  # type: ignore
+                if exists
+                else FingerprintTable(with_values=False)
+            )
+
+    def _key(self, doc: EmbeddableTextResource) -> Optional[str]:
+        if self._template is not None:
+            return self._template.render(
+                id=doc.id, text_chunk=doc.text_chunk, metadata=doc.metadata or {}
+            )
+        if self.key == DedupKey.id:
+            return doc.id
+        return doc.text_chunk
+
+    def _matches(self, docs: List[EmbeddableTextResource]) -> List[Match]:
+        keys = [self._key(d) for d in docs]
+        # documents without a key are never duplicates
+        indices = [i for i, k in enumerate(keys) if k and k.strip()]
+        matches: List[Match] = [None] * len(docs)
+        if not indices:
+            return matches
+        _keys: List[str] = [keys[i] for i in indices]  # type: ignore
+        if isinstance(self._index, NearDuplicateIndex):
+            found = self._index.query_insert(_keys, [docs[i].id for i in indices])
+        else:
+            present = self._index.add_many(fingerprints(_keys))
+            found = [(None, 1.0) if p else None for p in present.tolist()]
+        for i, match in zip(indices, found):
+            matches[i] = match
+        return matches
+
+    def process(
+        self, *, documents: Iterable[EmbeddableTextResource], **kwargs: Any
+    ) -> Iterable[EmbeddableTextResource]:
+        _documents = iter(documents)
+        while True:
+            batch = list(itertools.islice(_documents, self.batch_size))
+            if not batch:
+                break
+            for doc, match in zip(batch, self._matches(batch)):
+                if match is None:
+                    yield doc
+                elif self.action == DedupAction.tag:
+                    duplicate_of, similarity = match
+                    tags: dict = {DUPLICATE_KEY: True}
+                    if self.near:
+                        tags[SIMILARITY_KEY] = similarity
+                        if duplicate_of is not None:
+                            tags[DUPLICATE_OF_KEY] = duplicate_of
+                    doc.metadata = {**(doc.metadata or {}), **tags}
+                    yield doc
+        if self.index_file:
+            self._index.save(self.index_file)
+
+
+def dedup(
+    inf: typer.FileText = typer.Argument(sys.stdin),
+    file: Optional[str] = typer.Option(
+        None, "--in", help="The file to process instead of stdin."
+    ),
+    key: DedupKey = typer.Option(
+        DedupKey.text, "--key", "-k", help="The document field to dedup on."
+    ),
+    expr: Optional[str] = typer.Option(
+        None,
+        "--expr",
+        "-e",
+        help="Dedup on a Jinja expression over the document fields instead, e.g. `{{ metadata.url }}`.",
+    ),
+    near: bool = typer.Option(
+        False,
+        "--near",
+        help="Detect near-duplicates with MinHash LSH instead of exact duplicates.",
+    ),
+    bloom: bool = typer.Option(
+        False,
+        "--bloom",
+        help="Detect exact duplicates with a Bloom filter, which uses less memory but has false positives.",
+    ),
+    action: DedupAction = typer.Option(
+        DedupAction.drop,
+        "--action",
+        "-a",
+        help="drop - remove the duplicates, tag - keep them with `duplicate` (and for --near `duplicate_of` and "
+        "`similarity`) in the metadata.",
+    ),
+    threshold: float = typer.Option(
+        0.8,
+        "--threshold",
+        help="The estimated Jaccard similarity above which documents are near-duplicates.",
+    ),
+    num_perm: int = typer.Option(
+        128, "--num-perm", help="The number of MinHash permutations."
+    ),
+    shingle_size: int = typer.Option(
+        5, "--shingle-size", help="The size of the shingles in bytes."
+    ),
+    max_index_size: int = typer.Option(
+        1_000_000,
+        "--max-index-size",
+        help="The number of documents kept in the near-duplicate index, the oldest are evicted.",
+    ),
+    capacity: int = typer.Option(
+        10_000_000,
+        "--capacity",
+        help="The number of unique keys the Bloom filter is sized for.",
+    ),
+    error_rate: float = typer.Option(
+        0.001,
+        "--error-rate",
+        help="The false positive probability of the Bloom filter at its capacity.",
+    ),
+    index_file: Optional[str] = typer.Option(
+        None,
+        "--index-file",
+        help="The index file (.npz). Loaded if it exists and saved at the end, to dedup across runs.",
+    ),
+    batch_size: int = typer.Option(
+        1000, "--batch-size", help="The number of records hashed at once."
+    ),
+) -> None:
+    """Remove or tag duplicate documents."""
+    processor = DedupProcessor(
+        key=key,
+        expr=expr,
+        near=near,
+        bloom=bloom,
+        action=action,
+        threshold=threshold,
+        num_perm=num_perm,
+        shingle_size=shingle_size,
+        max_index_size=max_index_size,
+        capacity=capacity,
+        error_rate=error_rate,
+        index_file=index_file,
+        batch_size=batch_size,
+    )
+    with smart_open(file, inf) as file_or_stdin:
+        docs = (
+            EmbeddableTextResource(**json.loads(line))
+            for line in file_or_stdin
+            if line.strip()
+        )
+        for doc in processor.process(documents=docs):
+            typer.echo(json.dumps(doc.model_dump()))
@@ -6,6 +6,7 @@ from typing import Optional, Iterable, Any
 import typer
 
 from chroma_dp import EmbeddableTextResource, CdpProcessor
+from chroma_dp.utils import smart_open
 
 
 def remove_emojis(text: str) -> str:
@@ -56,10 +57,6 @@ def emoji_clean(
         ):
             typer.echo(json.dumps(doc.model_dump()))
 
-    if file:
-        with open(file, "r") as inf:
-            for line in inf:
-                process_docs(line)
-    else:
-        for line in inf:
+    with smart_open(file, inf) as file_or_stdin:
+        for line in file_or_stdin:
             process_docs(line)
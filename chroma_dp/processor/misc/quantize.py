@@ -0,0 +1,213 @@
+import itertools
+import os
+import sys
+from enum import Enum
+from typing import Optional, Iterable, Any, List, Tuple, Iterator
+
+import numpy as np
+import orjson as json
+import typer
+
+from chroma_dp import EmbeddableTextResource, CdpProcessor
+from chroma_dp.utils import smart_open
+
+SCALE_KEY = "quantization_scale"
+OFFSET_KEY = "quantization_offset"
+
+
+class QuantizationType(str, Enum):
+    float16 = "float16"
+    int8 = "int8"
+    dequantize = "dequantize"
+    truncate = "truncate"
+    pca = "pca"
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return x / norms
+
+
+def quantize_int8(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-vector scalar quantization. Returns the codes and the scale and offset of each vector, such that
+    `x ~= (codes + 128) * scale + offset`."""
+    offset = x.min(axis=1)
+    scale = (x.max(axis=1) - offset) / 255
+    scale[scale == 0] = 1
+    codes = np.rint((x - offset[:, None]) / scale[:, None]) - 128
+    return np.clip(codes, -128, 127).astype(np.int8), scale, offset
+
+
+def dequantize_int8(
+    codes: np.ndarray, scale: np.ndarray, offset: np.ndarray
+) -> np.ndarray:
+    return (codes.astype(np.float32) + 128) * scale[:, None] + offset[:, None]
+
+
+class PCA:
+    """PCA fitted with an SVD of a sample of embeddings. Persisted as .npz (mean and components)."""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray) -> None:
+        self.mean = mean
+        self.components = components
+
+    @classmethod
+    def fit(cls, sample: np.ndarray, dim: int) -> "PCA":
+        if dim > min(sample.shape):
+            raise ValueError(
+                f"Cannot fit {dim} components on a sample of shape {sample.shape}."
+            )
+        mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+        return cls(mean.astype(np.float32), vt[:dim].astype(np.float32))
+
+    @classmethod
+    def load(cls, path: str) -> "PCA":
+        with np.load(path) as data:
+            return cls(data["mean"], data["components"])
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components)
+
+    def transform(self, x: np.ndarray) -> np.ndarray:
+        return (x - self.mean) @ self.components.T
+
+
+class QuantizeProcessor(CdpProcessor[EmbeddableTextResource]):
+    def __init__(
+        self,
+        type: QuantizationType,
+        dim: Optional[int] = None,
+        normalize: bool = True,
+        batch_size: int = 1000,
+        pca_file: Optional[str] = None,
+        sample_size: int = 10000,
+    ) -> None:
+        self.type = type
+        self.dim = dim
+        self.normalize = normalize
+        self.batch_size = batch_size
+        self.pca_file = pca_file
+        self.sample_size = sample_size
+        self.pca: Optional[PCA] = None
+        if type == QuantizationType.pca and pca_file and os.path.exists(pca_file):
+            self.pca = PCA.load(pca_file)
+        if not dim and (
+            type == QuantizationType.truncate
+            or (type == QuantizationType.pca and self.pca is None)
+        ):
+            raise ValueError(f"The target dimension is required for {type.value}.")
+
+    def _transform(self, docs: List[EmbeddableTextResource]) -> None:
+        """Transforms the embeddings of the documents in place, with a single vectorized operation per batch."""
+        embedded = [d for d in docs if d.embedding is not None]
+        if not embedded:
+            return
+        if self.type == QuantizationType.dequantize:
+            embedded = [d for d in embedded if d.metadata and SCALE_KEY in d.metadata]
+            if not embedded:
+                return
+            codes = np.asarray([d.embedding for d in embedded], dtype=np.float32)
+            scale = np.asarray([d.metadata[SCALE_KEY] for d in embedded])  # type: ignore
+            offset = np.asarray([d.metadata.get(OFFSET_KEY, 0.0) for d in embedded])  # type: ignore
+            x = dequantize_int8(codes, scale, offset).astype(np.float32)
+            for d in embedded:
+                d.metadata.pop(SCALE_KEY)  # type: ignore
+                d.metadata.pop(OFFSET_KEY, None)  # type: ignore
+        else:
+            x = np.asarray([d.embedding for d in embedded], dtype=np.float32)
+            if self.type == QuantizationType.float16:
+                x = x.astype(np.float16)
+            elif self.type == QuantizationType.int8:
+                x, scale, offset = quantize_int8(x)
+                for d, s, o in zip(embedded, scale.tolist(), offset.tolist()):
+                    d.metadata = {**(d.metadata or {}), SCALE_KEY: s, OFFSET_KEY: o}
+            elif self.type == QuantizationType.truncate:
+                x = x[:, : self.dim]
+                if self.normalize:
+                    x = _normalize(x)
+            elif self.type == QuantizationType.pca:
+                x = self.pca.transform(x)  # type: ignore
+                if self.normalize:
+                    x = _normalize(x)
+        # rows of a contiguous array, for numpy serialization
+        for d, row in zip(embedded, np.ascontiguousarray(x)):
+            d.embedding = row
+
+    def _fit_pca(self, sample: List[EmbeddableTextResource]) -> None:
+        x = np.asarray(
+            [d.embedding for d in sample if d.embedding is not None], dtype=np.float32
+        )
+        self.pca = PCA.fit(x, self.dim)  # type: ignore
+        if self.pca_file:
+            self.pca.save(self.pca_file)
+
+    def process(
+        self, *, documents: Iterable[EmbeddableTextResource], **kwargs: Any
+    ) -> Iterable[EmbeddableTextResource]:
+        _documents: Iterator[EmbeddableTextResource] = iter(documents)
+        if self.type == QuantizationType.pca and self.pca is None:
+            # fit on the first records, then transform them along with the rest
+            sample = list(itertools.islice(_documents, self.sample_size))
+            self._fit_pca(sample)
+            _documents = itertools.chain(sample, _documents)
+        while True:
+            batch = list(itertools.islice(_documents, self.batch_size))
+            if not batch:
+                return
+            self._transform(batch)
+            yield from batch
+
+
+def quantize(
+    inf: typer.FileText = typer.Argument(sys.stdin),
+    file: Optional[str] = typer.Option(
+        None, "--in", help="The file to process instead of stdin."
+    ),
+    type: QuantizationType = typer.Option(
+        ...,
+        "--type",
+        "-t",
+        help="float16 - cast, int8 - scalar quantization (scale and offset are stored in the metadata), "
+        "dequantize - restore int8 embeddings, truncate - Matryoshka truncation, pca - PCA projection.",
+    ),
+    dim: Optional[int] = typer.Option(
+        None, "--dim", "-d", help="The target dimension for truncate and pca."
+    ),
+    normalize: bool = typer.Option(
+        True, help="L2 normalize the embeddings after truncate and pca."
+    ),
+    pca_file: Optional[str] = typer.Option(
+        None,
+        "--pca-file",
+        help="The PCA model file (.npz). Loaded if it exists, otherwise the PCA fitted on the sample is saved to it.",
+    ),
+    sample_size: Optional[int] = typer.Option(
+        10000, "--sample-size", help="The number of records to fit the PCA on."
+    ),
+    batch_size: Optional[int] = typer.Option(
+        1000, "--batch-size", help="The number of records transformed at once."
+    ),
+) -> None:
+    """Quantize or reduce the dimensionality of embeddings."""
+    processor = QuantizeProcessor(
+        type=type,
+        dim=dim,
+        normalize=normalize,
+        batch_size=batch_size,
+        pca_file=pca_file,
+        sample_size=sample_size,
+    )
+    with smart_open(file, inf) as file_or_stdin:
+        docs = (
+            EmbeddableTextResource(**json.loads(line))
+            for line in file_or_stdin
+            if line.strip()
+        )
+        for doc in processor.process(documents=docs):
+            data = doc.model_dump(exclude={"embedding"})
+            # numpy rows keep their dtype, so that float16 and int8 are serialized compactly
+            data["embedding"] = doc.embedding
+            typer.echo(json.dumps(data, option=json.OPT_SERIALIZE_NUMPY))
@@ -2,6 +2,8 @@ import sys
 from contextlib import contextmanager
 from typing import Generator, Optional, TextIO, Union, IO, Any
 
+from chroma_dp.utils.compression import get_compression_for_filename, open_compressed
+
 
 @contextmanager
 def smart_open(
@@ -9,11 +11,15 @@ def smart_open(
     stdin: TextIO = sys.stdin,
     mode: str = "r",
 ) -> Generator[Union[IO[Any], TextIO], None, None]:
+    """Opens the file or falls back to stdin. Compressed files (.gz, .zst, .lz4) are transparently (de)compressed."""
     fh: Union[IO[Any], TextIO] = stdin
     if filename:
-        fh = open(filename, mode)
+        if get_compression_for_filename(filename) is not None:
+            fh = open_compressed(filename, mode)
+        else:
+            fh = open(filename, mode)
     try:
         yield fh
     finally:
-        if filename and isinstance(fh, IO):
+        if filename:
             fh.close()
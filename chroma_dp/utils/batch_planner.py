@@ -0,0 +1,150 @@
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from chromadb import Embeddings
+from pydantic import BaseModel
+
+from chroma_dp.utils.tokenizer import TokenCounter
+
+
+class OverflowPolicy(str, Enum):
+    truncate = "truncate"
+    split = "split"
+    error = "error"
+
+
+class RequestLimits(BaseModel):
+    max_inputs: int = 100
+    max_tokens: Optional[int] = None
+    max_input_tokens: Optional[int] = None
+
+
+# documented per-request limits of the providers, keyed by embedding function name
+PROVIDER_LIMITS: Dict[str, RequestLimits] = {
+    "openai": RequestLimits(max_inputs=2048, max_tokens=300_000, max_input_tokens=8191),
+    "cohere": RequestLimits(max_inputs=96, max_input_tokens=512),
+    "gemini": RequestLimits(max_inputs=100, max_input_tokens=2048),
+    "hf": RequestLimits(max_inputs=100),
+    "ollama": RequestLimits(max_inputs=100),
+}
+
+
+def get_provider_limits(
+    name: Optional[str],
+    max_inputs: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    max_input_tokens: Optional[int] = None,
+) -> RequestLimits:
+    """The provider's limits (or the defaults for unknown providers) with the given overrides applied."""
+    limits = PROVIDER_LIMITS.get(name or "", RequestLimits())
+    return RequestLimits(
+        max_inputs=max_inputs or limits.max_inputs,
+        max_tokens=max_tokens or limits.max_tokens,
+        max_input_tokens=max_input_tokens or limits.max_input_tokens,
+    )
+
+
+class RequestPlanner:
+    """Re-packs batches of records into requests that fill, but never exceed, the per-request limits.
+
+    Records keep their order. Inputs longer than `max_input_tokens` are handled according to the overflow policy:
+    `truncate` embeds only the first `max_input_tokens` tokens, `split` embeds all pieces and pools them into one
+    embedding (token-weighted mean, L2 normalized) and `error` raises.
+    """
+
+    def __init__(
+        self,
+        limits: RequestLimits,
+        token_counter: TokenCounter,
+        overflow: OverflowPolicy = OverflowPolicy.truncate,
+    ) -> None:
+        self.limits = limits
+        self.token_counter = token_counter
+        self.overflow = overflow
+        self.requests = 0
+
+    def _inputs_for(self, text: str, tokens: int) -> Tuple[List[str], List[int]]:
+        max_input_tokens = self.limits.max_input_tokens
+        if max_input_tokens is None or tokens <= max_input_tokens:
+            return [text], [tokens]
+        if self.overflow == OverflowPolicy.error:
+            raise ValueError(
+                f"Input of {tokens} tokens exceeds the limit of {max_input_tokens} tokens: {text[:50]}..."
+            )
+        pieces = self.token_counter.split(text, max_input_tokens)
+        if self.overflow == OverflowPolicy.truncate:
+            pieces = pieces[:1]
+        return pieces, self.token_counter.count_many(pieces)
+
+    def _new_request(self, keys: Sequence[str]) -> Dict[str, Any]:
+        request: Dict[str, Any] = {k: [] for k in keys}
+        request.update({"inputs": [], "spans": [], "weights": [], "tokens": 0})
+        return request
+
+    def _finish(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self.requests += 1
+        del request["tokens"]
+        return request
+
+    def plan(self, batches: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Takes batches of parallel lists (`documents`, `ids`, ...) and yields requests with the same lists plus the
+        `inputs` to embed and the `spans` of inputs that make up each record. A batch with `flush` set ends the
+        current request, even if it is not full."""
+        max_tokens = self.limits.max_tokens
+        request: Optional[Dict[str, Any]] = None
+        for batch in batches:
+            keys = [k for k in batch.keys() if k != "flush"]
+            documents = batch["documents"]
+            if request is None:
+                request = self._new_request(keys)
+            for idx, tokens in enumerate(self.token_counter.count_many(documents)):
+                pieces, piece_tokens = self._inputs_for(documents[idx], tokens)
+                record_tokens = sum(piece_tokens)
+                if len(pieces) > self.limits.max_inputs or (
+                    max_tokens is not None and record_tokens > max_tokens
+                ):
+                    raise ValueError(
+                        f"Input of {record_tokens} tokens does not fit a single request: {documents[idx][:50]}..."
+                    )
+                if len(request["inputs"]) > 0 and (
+                    len(request["inputs"]) + len(pieces) > self.limits.max_inputs
+                    or (
+                        max_tokens is not None
+                        and request["tokens"] + record_tokens > max_tokens
+                    )
+                ):
+                    yield self._finish(request)
+                    request = self._new_request(keys)
+                for k in keys:
+                    request[k].append(batch[k][idx])
+                start = len(request["inputs"])
+                request["inputs"].extend(pieces)
+                request["spans"].append((start, start + len(pieces)))
+                request["weights"].extend(piece_tokens)
+                request["tokens"] += record_tokens
+            if batch.get("flush") and len(request["inputs"]) > 0:
+                yield self._finish(request)
+                request = None
+        if request is not None and len(request["inputs"]) > 0:
+            yield self._finish(request)
+
+
+def pool_embeddings(
+    embeddings: Embeddings,
+    spans: Sequence[Tuple[int, int]],
+    weights: Sequence[int],
+) -> Embeddings:
+    """One embedding per span. Spans of a single input are passed through, split inputs are pooled."""
+    if all(end - start == 1 for start, end in spans):
+        return [embeddings[start] for start, _ in spans]
+    pooled: Embeddings = []
+    for start, end in spans:
+        if end - start == 1:
+            pooled.append(embeddings[start])
+            continue
+        vectors = np.asarray(embeddings[start:end], dtype=np.float32)
+        mean = np.average(vectors, axis=0, weights=weights[start:end])
+        norm = np.linalg.norm(mean)
+        pooled.append((mean / norm if norm > 0 else mean).tolist())
+    return pooled
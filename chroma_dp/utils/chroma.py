@@ -48,6 +48,12 @@ class DistanceFunction(str, Enum):
     cosine = "cosine"
 
 
+class IncludeFeature(str, Enum):
+    embeddings = "embeddings"
+    documents = "documents"
+    metadatas = "metadatas"
+
+
 class CDPUri(BaseModel):
     auth: Optional[Dict[str, str]] = None
     host_or_path: Optional[str] = None
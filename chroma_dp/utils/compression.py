@@ -0,0 +1,203 @@
+import gzip
+import io
+import os
+import threading
+from enum import Enum
+from queue import Queue, Empty
+from typing import Optional, BinaryIO, Union, Any
+
+_CHUNK_SIZE = 1024 * 1024
+_MAX_PENDING_CHUNKS = 16
+
+
+class Compression(str, Enum):
+    gzip = "gzip"
+    zstd = "zstd"
+    lz4 = "lz4"
+
+
+_EXTENSIONS = {
+    ".gz": Compression.gzip,
+    ".gzip": Compression.gzip,
+    ".zst": Compression.zstd,
+    ".zstd": Compression.zstd,
+    ".lz4": Compression.lz4,
+}
+
+
+def get_compression_for_filename(filename: str) -> Optional[Compression]:
+    """Returns the compression inferred from the file extension or None for plain files."""
+    _, ext = os.path.splitext(filename)
+    return _EXTENSIONS.get(ext.lower())
+
+
+def _open_binary(filename: str, mode: str, compression: Compression) -> BinaryIO:
+    """Opens a binary (de)compressing stream. Mode is one of `rb`, `wb` or `ab`."""
+    if compression == Compression.gzip:
+        # zlib's default level, gzip.open defaults to the much slower level 9
+        return gzip.open(filename, mode, compresslevel=6)  # type: ignore
+    if compression == Compression.zstd:
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError(
+                "The zstandard python package is not installed. "
+                "Please install it with `pip install zstandard`"
+            )
+        if mode == "rb":
+            # appended exports contain multiple frames
+            return zstandard.ZstdDecompressor().stream_reader(  # type: ignore
+                open(filename, mode), read_across_frames=True, closefd=True
+            )
+        return zstandard.ZstdCompressor().stream_writer(  # type: ignore
+            open(filename, mode), closefd=True
+        )
+    if compression == Compression.lz4:
+        try:
+            import lz4.frame
+        except ImportError:
+            raise ValueError(
+                "The lz4 python package is not installed. "
+                "Please install it with `pip install lz4`"
+            )
+        return lz4.frame.open(filename, mode)  # type: ignore
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+class BackgroundWriter(io.RawIOBase):
+    """Raw writer that hands written chunks to a background thread, which compresses and writes them to `fh`."""
+
+    def __init__(self, fh: BinaryIO, max_pending: int = _MAX_PENDING_CHUNKS) -> None:
+        super().__init__()
+        self._fh = fh
+        self._queue: "Queue[Optional[bytes]]" = Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                chunk = self._queue.get()
+                if chunk is None:
+                    break
+                self._fh.write(chunk)
+        except BaseException as e:
+            self._error = e
+            # keep draining so that writers never block on a dead thread
+            while self._queue.get() is not None:
+                pass
+        finally:
+            try:
+                self._fh.close()
+            except BaseException as e:
+                self._error = self._error or e
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Any) -> int:
+        if self._error is not None:
+            raise IOError("Background writer failed") from self._error
+        chunk = bytes(b)
+        self._queue.put(chunk)
+        return len(chunk)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        super().close()
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise IOError("Background writer failed") from self._error
+
+
+class BackgroundReader(io.RawIOBase):
+    """Raw reader that reads and decompresses `fh` in a background thread ahead of the consumer."""
+
+    def __init__(
+        self,
+        fh: BinaryIO,
+        chunk_size: int = _CHUNK_SIZE,
+        max_pending: int = _MAX_PENDING_CHUNKS,
+    ) -> None:
+        super().__init__()
+        self._fh = fh
+        self._chunk_size = chunk_size
+        self._queue: "Queue[Union[bytes, BaseException, None]]" = Queue(
+            maxsize=max_pending
+        )
+        self._stop = threading.Event()
+        self._buffer = b""
+        self._pos = 0
+        self._eof = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                chunk = self._fh.read(self._chunk_size)
+                if not chunk:
+                    break
+                self._queue.put(chunk)
+            self._queue.put(None)
+        except BaseException as e:
+            self._queue.put(e)
+        finally:
+            self._fh.close()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        while self._pos >= len(self._buffer):
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise IOError("Background reader failed") from item
+            self._buffer = item
+            self._pos = 0
+        n = min(len(b), len(self._buffer) - self._pos)
+        b[:n] = self._buffer[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        super().close()
+        self._stop.set()
+        # unblock the reader thread if the consumer stopped early
+        while self._thread.is_alive():
+            try:
+                self._queue.get_nowait()
+            except Empty:
+                self._thread.join(0.01)
+
+
+def open_compressed(
+    filename: str, mode: str = "r", compression: Optional[Compression] = None
+) -> io.TextIOWrapper:
+    """Opens a compressed text file. (De)compression runs in a background thread to overlap with the pipeline."""
+    _compression = compression or get_compression_for_filename(filename)
+    if _compression is None:
+        raise ValueError(f"Cannot infer compression for file: {filename}")
+    _mode = mode.replace("t", "").replace("b", "")
+    if _mode == "r":
+        reader = BackgroundReader(_open_binary(filename, "rb", _compression))
+        return io.TextIOWrapper(
+            io.BufferedReader(reader, buffer_size=_CHUNK_SIZE), encoding="utf-8"
+        )
+    if _mode in ("w", "a"):
+        writer = BackgroundWriter(_open_binary(filename, f"{_mode}b", _compression))
+        return io.TextIOWrapper(
+            io.BufferedWriter(writer, buffer_size=_CHUNK_SIZE), encoding="utf-8"
+        )
+    raise ValueError(f"Unsupported mode for compressed file: {mode}")
@@ -1,6 +1,7 @@
 import os
 from enum import Enum
-from typing import Any, Optional
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from chromadb import EmbeddingFunction
 from chromadb.utils.embedding_functions import (
@@ -15,6 +16,20 @@ from chromadb.utils.embedding_functions.ollama_embedding_function import (
     OllamaEmbeddingFunction,
 )
 
+from chroma_dp.utils.embedding_cache import EmbeddingCache, CachedEmbeddingFunction
+from chroma_dp.utils.embedding_executor import RateLimitedEmbeddingFunction
+from chroma_dp.utils.embedding_server import (
+    DEFAULT_EMBED_SERVER_URL,
+    EmbedServerEmbeddingFunction,
+)
+from chroma_dp.utils.embedding_workers import MultiProcessEmbeddingFunction
+from chroma_dp.utils.hash_embedding import (
+    DEFAULT_HASH_EMBEDDING_DIM,
+    HashEmbeddingFunction,
+)
+from chroma_dp.utils.onnx import SUPPORTS_TUNING, default_embedding_function
+from chroma_dp.utils.tokenizer import get_token_counter
+
 
 class SupportedEmbeddingFunctions(str, Enum):
     default = "default"
@@ -24,21 +39,69 @@ class SupportedEmbeddingFunctions(str, Enum):
     st = "st"
     gemini = "gemini"
     ollama = "ollama"
+    remote_local = "remote-local"
+    hash = "hash"
 
 
-def get_embedding_function_for_name(
+LOCAL_EMBEDDING_FUNCTIONS = {
+    SupportedEmbeddingFunctions.default,
+    SupportedEmbeddingFunctions.st,
+}
+
+REMOTE_EMBEDDING_FUNCTIONS = {
+    SupportedEmbeddingFunctions.openai,
+    SupportedEmbeddingFunctions.cohere,
+    SupportedEmbeddingFunctions.hf,
+    SupportedEmbeddingFunctions.gemini,
+    SupportedEmbeddingFunctions.ollama,
+}
+
+
+def _get_float_option(
+    options: Dict[str, Any], name: str, env_var: str
+) -> Optional[float]:
+    value = options.get(name) or os.environ.get(env_var)
+    return float(value) if value else None
+
+
+def _get_int_env(env_var: str) -> Optional[int]:
+    value = os.environ.get(env_var)
+    return int(value) if value else None
+
+
+def _resolve_embedding_function(
     name: Optional[SupportedEmbeddingFunctions], **kwargs: Any
-) -> EmbeddingFunction:
+) -> Tuple[Callable[[], EmbeddingFunction], str, Optional[str]]:
+    """Returns a factory of the embedding function, the model and the task type."""
+    task_type: Optional[str] = None
     if name == SupportedEmbeddingFunctions.default:
-        return ONNXMiniLM_L6_V2()
+        # the int8 model is only available with the tuned embedding function
+        quantized = (
+            SUPPORTS_TUNING and os.environ.get("ONNX_QUANTIZED", "False") == "True"
+        )
+        # the int8 model has its own embeddings, e.g. in the embedding cache
+        model = ONNXMiniLM_L6_V2.MODEL_NAME + ("-int8" if quantized else "")
+        providers = os.environ.get("ONNX_PROVIDERS")
+        factory: Callable[[], EmbeddingFunction] = partial(
+            default_embedding_function,
+            preferred_providers=providers.split(",") if providers else None,
+            intra_op_num_threads=kwargs.get("intra_op_num_threads")
+            or _get_int_env("ONNX_INTRA_OP_THREADS"),
+            inter_op_num_threads=_get_int_env("ONNX_INTER_OP_THREADS"),
+            graph_optimization_level=os.environ.get("ONNX_GRAPH_OPTIMIZATION"),
+            batch_size=_get_int_env("ONNX_BATCH_SIZE") or 32,
+            quantized=quantized,
+        )
     elif name == SupportedEmbeddingFunctions.openai:
         model = (
             kwargs.get("model")
             if kwargs.get("model")
             else os.environ.get("OPENAI_MODEL_NAME", "text-embedding-ada-002")
         )
-        return OpenAIEmbeddingFunction(
-            api_key=os.environ.get("OPENAI_API_KEY"), model_name=model
+        factory = partial(
+            OpenAIEmbeddingFunction,
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            model_name=model,
         )
     elif name == SupportedEmbeddingFunctions.cohere:
         model = (
@@ -46,8 +109,10 @@ def get_embedding_function_for_name(
             if kwargs.get("model")
             else os.environ.get("COHERE_MODEL_NAME", "embed-english-v3.0")
         )
-        return CohereEmbeddingFunction(
-            api_key=os.environ.get("COHERE_API_KEY"), model_name=model
+        factory = partial(
+            CohereEmbeddingFunction,
+            api_key=os.environ.get("COHERE_API_KEY"),
+            model_name=model,
         )
     elif name == SupportedEmbeddingFunctions.hf:
         model = (
@@ -57,8 +122,10 @@ def get_embedding_function_for_name(
                 "HF_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"
             )
         )
-        return HuggingFaceEmbeddingFunction(
-            api_key=os.environ.get("HF_TOKEN"), model_name=model
+        factory = partial(
+            HuggingFaceEmbeddingFunction,
+            api_key=os.environ.get("HF_TOKEN"),
+            model_name=model,
         )
     elif name == SupportedEmbeddingFunctions.st:
         model = (
@@ -66,11 +133,15 @@ def get_embedding_function_for_name(
             if kwargs.get("model")
             else os.environ.get("ST_MODEL_NAME", "all-MiniLM-L6-v2")
         )
-        return SentenceTransformerEmbeddingFunction(
+        normalize = os.environ.get("ST_NORMALIZE", "True") == "True"
+        factory = partial(
+            SentenceTransformerEmbeddingFunction,
             model_name=model,
             device=os.environ.get("ST_DEVICE", "cpu"),
-            normalize_embeddings=os.environ.get("ST_NORMALIZE", "True") == "True",
+            normalize_embeddings=normalize,
         )
+        # normalized and raw embeddings differ, e.g. in the embedding cache
+        model += "-normalized" if normalize else "-raw"
     elif name == SupportedEmbeddingFunctions.gemini:
         model = (
             kwargs.get("model")
@@ -82,7 +153,8 @@ def get_embedding_function_for_name(
             if kwargs.get("task_type")
             else os.environ.get("GEMINI_TASK_TYPE", "RETRIEVAL_DOCUMENT")
         )
-        return GoogleGenerativeAiEmbeddingFunction(
+        factory = partial(
+            GoogleGenerativeAiEmbeddingFunction,
             api_key=os.environ.get("GEMINI_API_KEY"),
             model_name=model,
             task_type=task_type,
@@ -96,9 +168,94 @@ def get_embedding_function_for_name(
         url = os.environ.get(
             "OLLAMA_EMBED_URL", "http://localhost:11434/api/embeddings"
         )
-        return OllamaEmbeddingFunction(
+        factory = partial(
+            OllamaEmbeddingFunction,
             model_name=model,
             url=url,
         )
+    elif name == SupportedEmbeddingFunctions.remote_local:
+        server_model = kwargs.get("model") or os.environ.get("CDP_EMBED_SERVER_MODEL")
+        server_ef = os.environ.get("CDP_EMBED_SERVER_EF")
+        url = os.environ.get("CDP_EMBED_SERVER_URL", DEFAULT_EMBED_SERVER_URL)
+        factory = partial(
+            EmbedServerEmbeddingFunction,
+            url=url,
+            ef=server_ef,
+            model=server_model,
+        )
+        # the embeddings depend on the server's embedding function and model, e.g. in the embedding cache. The
+        # defaults are chosen by the server, so they are told apart by its URL
+        model = f"{server_ef or 'server-default'}/{server_model or 'server-default'}"
+        if not (server_ef and server_model):
+            model += f"@{url}"
+    elif name == SupportedEmbeddingFunctions.hash:
+        dimension = int(
+            kwargs.get("dimension")
+            or os.environ.get("CDP_HASH_EMBEDDING_DIM", DEFAULT_HASH_EMBEDDING_DIM)
+        )
+        model = f"hash-{dimension}"
+        factory = partial(HashEmbeddingFunction, dimension=dimension)
     else:
         raise ValueError("Please provide a valid embedding function.")
+    return factory, model, task_type
+
+
+def create_worker_embedding_function(
+    name: SupportedEmbeddingFunctions, model: Optional[str], threads: int
+) -> EmbeddingFunction:
+    """Creates a local embedding function limited to `threads` threads, used by embedding worker processes."""
+    factory, _, _ = _resolve_embedding_function(
+        name, model=model, intra_op_num_threads=threads
+    )
+    return factory()
+
+
+def get_embedding_function_for_name(
+    name: Optional[SupportedEmbeddingFunctions], **kwargs: Any
+) -> EmbeddingFunction:
+    """Creates the embedding function. If `CDP_EMBEDDING_CACHE` is set (or `cache_path` is passed) embeddings are
+    cached on disk keyed by the embedding function, model and text. Remote embedding functions are rate limited
+    (`CDP_EMBED_REQUESTS_PER_MINUTE`, `CDP_EMBED_TOKENS_PER_MINUTE`) and retried (`CDP_EMBED_MAX_RETRIES`). Tokens
+    are counted with the `tokenizer` (or `CDP_EMBED_TOKENIZER`), by default with a heuristic. Local embedding
+    functions run in `embed_workers` processes if set.
+    """
+    factory, model, task_type = _resolve_embedding_function(name, **kwargs)
+    embed_workers = kwargs.get("embed_workers") or 0
+    if embed_workers > 0 and name in LOCAL_EMBEDDING_FUNCTIONS:
+        ef = MultiProcessEmbeddingFunction(
+            # the requested model, the resolved one identifies the embeddings (e.g. `-int8`)
+            partial(create_worker_embedding_function, name, kwargs.get("model")),
+            workers=embed_workers,
+        )
+    else:
+        ef = factory()
+    if name in REMOTE_EMBEDDING_FUNCTIONS:
+        max_retries = kwargs.get("max_retries")
+        ef = RateLimitedEmbeddingFunction(
+            ef,
+            requests_per_minute=_get_float_option(
+                kwargs, "requests_per_minute", "CDP_EMBED_REQUESTS_PER_MINUTE"
+            ),
+            tokens_per_minute=_get_float_option(
+                kwargs, "tokens_per_minute", "CDP_EMBED_TOKENS_PER_MINUTE"
+            ),
+            max_retries=(
+                max_retries
+                if max_retries is not None
+                else int(os.environ.get("CDP_EMBED_MAX_RETRIES", "5"))
+            ),
+            token_counter=get_token_counter(
+                kwargs.get("tokenizer") or os.environ.get("CDP_EMBED_TOKENIZER")
+            ),
+        )
+    cache_path = kwargs.get("cache_path") or os.environ.get("CDP_EMBEDDING_CACHE")
+    if cache_path:
+        max_entries = kwargs.get("cache_max_entries") or int(
+            os.environ.get("CDP_EMBEDDING_CACHE_MAX_ENTRIES", "1000000")
+        )
+        return CachedEmbeddingFunction(
+            ef,
+            cache=EmbeddingCache(cache_path, max_entries=max_entries),
+            namespace=f"{name.value}:{model}:{task_type or ''}",
+        )
+    return ef
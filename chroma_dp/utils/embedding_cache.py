@@ -0,0 +1,212 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes the text before hashing, so that equivalent unicode strings share a cache entry."""
+    return unicodedata.normalize("NFC", text)
+
+
+def cache_key(namespace: str, text: str) -> bytes:
+    """Cache key for a text embedded by the embedding function/model identified by `namespace`."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(namespace.encode("utf-8"))
+    h.update(b"\0")
+    h.update(normalize_text(text).encode("utf-8"))
+    return h.digest()
+
+
+class EmbeddingCache:
+    """SQLite backed embedding cache with size-bounded LRU eviction. Safe to share between threads and processes."""
+
+    def __init__(self, path: str, max_entries: int = 1_000_000) -> None:
+        _dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(_dir, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key BLOB PRIMARY KEY, embedding BLOB NOT NULL, last_access INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+        # upper bound of the number of entries, avoids counting the table on every write
+        self._approx_count = len(self)
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """Returns the cached embeddings for the keys that are present in the cache."""
+        if len(keys) == 0:
+            return {}
+        found: Dict[bytes, np.ndarray] = {}
+        _keys = list(set(keys))
+        with self._lock:
+            # stay below SQLite's host parameter limit
+            for i in range(0, len(_keys), 500):
+                chunk = _keys[i : i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, embedding in rows:
+                    found[key] = np.frombuffer(embedding, dtype=np.float32)
+            if found:
+                now = time.time_ns()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, k) for k in found.keys()],
+                )
+                self._conn.commit()
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, items: Dict[bytes, np.ndarray]) -> None:
+        if len(items) == 0:
+            return
+        now = time.time_ns()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, last_access) VALUES (?, ?, ?)",
+                [
+                    (k, np.asarray(v, dtype=np.float32).tobytes(), now)
+                    for k, v in items.items()
+                ],
+            )
+            self._approx_count += len(items)
+            if self._approx_count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Evicts the least recently used entries down to 90% of `max_entries` to amortize evictions."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > self.max_entries:
+            target = int(self.max_entries * 0.9)
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                (count - target,),
+            )
+            count = target
+        self._approx_count = count
+
+    def __len__(self) -> int:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return int(count)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Wraps an embedding function and only embeds the texts that are not in the cache."""
+
+    def __init__(
+        self,
+        ef: EmbeddingFunction[Documents],
+        cache: EmbeddingCache,
+        namespace: str,
+    ) -> None:
+        self._ef = ef
+        self.cache = cache
+        self.namespace = namespace
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [cache_key(self.namespace, text) for text in input]
+        cached = self.cache.get_many(keys)
+        missing: List[int] = []
+        seen = set()
+        for idx, key in enumerate(keys):
+            # embed duplicates of a missing text only once
+            if key not in cached and key not in seen:
+                seen.add(key)
+                missing.append(idx)
+        if missing:
+            embeddings = self._ef([input[i] for i in missing])
+            computed = {
+                keys[i]: np.asarray(e, dtype=np.float32)
+                for i, e in zip(missing, embeddings)
+            }
+            self.cache.put_many(computed)
+            cached.update(computed)
+        return [cached[key].tolist() for key in keys]
+
+    def stats(self) -> Dict[str, int]:
+        return self.cache.stats()
+
+
+class DedupEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Embeds each distinct text only once. Identical texts within a call are collapsed and the embeddings of the
+    `window` most recently seen texts are kept in memory (LRU), so that repeats across calls are not embedded again.
+    """
+
+    def __init__(self, ef: EmbeddingFunction[Documents], window: int = 10_000) -> None:
+        self._ef = ef
+        self.window = window
+        self.texts = 0
+        self.embedded = 0
+        self._recent: "OrderedDict[bytes, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [
+            hashlib.blake2b(t.encode("utf-8"), digest_size=16).digest() for t in input
+        ]
+        found: Dict[bytes, Any] = {}
+        missing: List[int] = []
+        with self._lock:
+            for idx, key in enumerate(keys):
+                if key in found:
+                    continue
+                if key in self._recent:
+                    self._recent.move_to_end(key)
+                    found[key] = self._recent[key]
+                else:
+                    # placeholder, duplicates of a missing text are embedded only once
+                    found[key] = None
+                    missing.append(idx)
+        if missing:
+            embeddings = self._ef([input[i] for i in missing])
+            with self._lock:
+                for i, embedding in zip(missing, embeddings):
+                    found[keys[i]] = embedding
+                    self._recent[keys[i]] = embedding
+                    self._recent.move_to_end(keys[i])
+                while len(self._recent) > self.window:
+                    self._recent.popitem(last=False)
+        with self._lock:
+            self.texts += len(input)
+            self.embedded += len(missing)
+        return [found[key] for key in keys]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "texts": self.texts,
+            "embedded": self.embedded,
+            "saved": self.texts - self.embedded,
+        }
+
+
+def get_cache_stats(
+    ef: Optional[EmbeddingFunction[Documents]],
+) -> Optional[Dict[str, int]]:
+    """Returns the cache statistics if the embedding function is cached, otherwise None."""
+    if isinstance(ef, CachedEmbeddingFunction):
+        return ef.stats()
+    return None
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+from tenacity import (
+    Retrying,
+    stop_after_attempt,
+    wait_exponential,
+    wait_random,
+)
+
+from chroma_dp.utils.batch_planner import pool_embeddings
+from chroma_dp.utils.tokenizer import TokenCounter, HeuristicTokenCounter
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Refills continuously at `rate_per_minute` up to `capacity` tokens."""
+
+    def __init__(
+        self, rate_per_minute: float, capacity: Optional[float] = None
+    ) -> None:
+        if rate_per_minute <= 0:
+            raise ValueError("Rate must be positive.")
+        self._rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> None:
+        """Blocks until `amount` tokens are available and takes them."""
+        # a request larger than the bucket would otherwise wait forever
+        _amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._last) * self._rate
+                )
+                self._last = now
+                if self._tokens >= _amount:
+                    self._tokens -= _amount
+                    return
+                wait = (_amount - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+class RateLimitedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Wraps a remote embedding function with requests/min and tokens/min limits and retries with exponential
+    backoff. Every call is one request to the provider."""
+
+    def __init__(
+        self,
+        ef: EmbeddingFunction[Documents],
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 5,
+        retry_min_wait: float = 1.0,
+        retry_max_wait: float = 60.0,
+        token_counter: Optional[TokenCounter] = None,
+    ) -> None:
+        self._ef = ef
+        self._token_counter = token_counter or HeuristicTokenCounter()
+        self._requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._retrying = Retrying(
+            stop=stop_after_attempt(max_retries + 1),
+            wait=wait_exponential(min=retry_min_wait, max=retry_max_wait)
+            + wait_random(0, retry_min_wait),
+            reraise=True,
+        )
+
+    def _embed(self, input: Documents) -> Embeddings:
+        if self._requests is not None:
+            self._requests.acquire()
+        if self._tokens is not None:
+            self._tokens.acquire(sum(self._token_counter.count_many(input)))
+        embeddings = self._ef(input)
+        if len(embeddings) != len(input):
+            # some providers silently drop failed inputs (e.g. Ollama on a non-200 response)
+            raise ValueError(
+                f"Expected {len(input)} embeddings, but got {len(embeddings)}."
+            )
+        return embeddings
+
+    def __call__(self, input: Documents) -> Embeddings:
+        # a copy per call, the retry state must not be shared between threads
+        return self._retrying.copy()(self._embed, input)
+
+
+class LengthBucketedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Sorts the input by length and embeds it in batches of `batch_size`, so that each batch holds inputs of similar
+    length and little compute is wasted on padding. The embeddings are returned in input order.
+    """
+
+    def __init__(self, ef: EmbeddingFunction[Documents], batch_size: int = 32) -> None:
+        self._ef = ef
+        self.batch_size = batch_size
+
+    def __call__(self, input: Documents) -> Embeddings:
+        order = np.argsort([len(t) for t in input], kind="stable")
+        embeddings: List[Any] = [None] * len(input)
+        for i in range(0, len(order), self.batch_size):
+            bucket = order[i : i + self.batch_size]
+            for idx, embedding in zip(bucket, self._ef([input[j] for j in bucket])):
+                embeddings[idx] = embedding
+        return embeddings
+
+
+class EmbeddingExecutor:
+    """Embeds batches with up to `max_in_flight` concurrent calls to the embedding function while preserving the
+    input order of the batches."""
+
+    def __init__(
+        self, ef: EmbeddingFunction[Documents], max_in_flight: int = 1
+    ) -> None:
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1.")
+        self._ef = ef
+        self.max_in_flight = max_in_flight
+
+    def _embed_batch(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        if "inputs" in batch:
+            # a request planned by the RequestPlanner
+            batch["embeddings"] = pool_embeddings(
+                self._ef(batch["inputs"]), batch["spans"], batch["weights"]
+            )
+        else:
+            batch["embeddings"] = self._ef(batch["documents"])
+        return batch
+
+    def map(self, batches: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Sets the `embeddings` of each batch (a dict with `documents`) and yields the batches in input order.
+        At most `max_in_flight` batches are buffered, so the input is consumed lazily.
+        """
+        pending: Deque["Future[Dict[str, Any]]"] = deque()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            try:
+                for batch in batches:
+                    pending.append(executor.submit(self._embed_batch, batch))
+                    if len(pending) >= self.max_in_flight:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,71 @@
+import os
+from typing import Optional, TYPE_CHECKING
+
+import orjson as json
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_EMBED_SERVER_URL = "http://127.0.0.1:8765"
+
+
+def _import_httpx():  # type: ignore
+    # imported on first use, only the embedding server client needs it
+    try:
+        import httpx
+    except ImportError:
+        raise ValueError(
+            "The httpx python package is not installed. Please install it with `pip install httpx`"
+        )
+    return httpx
+
+
+def create_embed_server_client(url: str, timeout: float = 300) -> "httpx.Client":
+    """HTTP client for the embedding server. `unix:///path/to/socket` URLs connect over a Unix domain socket."""
+    httpx = _import_httpx()
+    if url.startswith("unix://"):
+        return httpx.Client(
+            transport=httpx.HTTPTransport(uds=url[len("unix://") :]),
+            base_url="http://localhost",
+            timeout=timeout,
+        )
+    return httpx.Client(base_url=url, timeout=timeout)
+
+
+class EmbedServerEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Embeds with a `cdp embed-server`, which keeps the models loaded between CLI invocations."""
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        ef: Optional[str] = None,
+        model: Optional[str] = None,
+        client: Optional["httpx.Client"] = None,
+    ) -> None:
+        self._url = url or os.environ.get(
+            "CDP_EMBED_SERVER_URL", DEFAULT_EMBED_SERVER_URL
+        )
+        self._ef = ef
+        self._model = model
+        self._client = client or create_embed_server_client(self._url)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        httpx = _import_httpx()
+        try:
+            resp = self._client.post(
+                "/api/v1/embed",
+                content=json.dumps(
+                    {"input": list(input), "ef": self._ef, "model": self._model}
+                ),
+                headers={"Content-Type": "application/json"},
+            )
+        except httpx.TransportError as e:
+            raise ValueError(
+                f"Cannot connect to the embedding server at {self._url}. Start it with `cdp embed-server`."
+            ) from e
+        if resp.status_code != 200:
+            raise ValueError(
+                f"Embedding server error ({resp.status_code}): {resp.text}"
+            )
+        return json.loads(resp.content)["embeddings"]  # type: ignore
@@ -0,0 +1,245 @@
+import multiprocessing
+import os
+import threading
+import weakref
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+_INITIAL_INPUT_BUFFER = 1 << 20
+_INITIAL_OUTPUT_BUFFER = 4 << 20
+
+
+def _texts_size(encoded: Sequence[bytes]) -> int:
+    return 8 * (len(encoded) + 2) + sum(len(e) for e in encoded)
+
+
+def _write_texts(buf: Any, encoded: Sequence[bytes]) -> None:
+    """Layout: number of texts (int64), offsets (int64, n + 1), utf-8 bytes."""
+    n = len(encoded)
+    header = np.ndarray((n + 2,), dtype=np.int64, buffer=buf)
+    header[0] = n
+    header[1] = 0
+    np.cumsum([len(e) for e in encoded], out=header[2:])
+    base = 8 * (n + 2)
+    buf[base : base + int(header[-1])] = b"".join(encoded)
+    del header
+
+
+def _read_texts(buf: Any) -> List[str]:
+    n = int(np.ndarray((1,), dtype=np.int64, buffer=buf)[0])
+    offsets = np.ndarray((n + 1,), dtype=np.int64, buffer=buf, offset=8).tolist()
+    base = 8 * (n + 2)
+    data = bytes(buf[base : base + offsets[-1]])
+    return [data[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(n)]
+
+
+class _Attachments:
+    """Shared memory buffers of the parent, attached by the worker. The parent owns and unlinks them."""
+
+    def __init__(self) -> None:
+        self._buffers: dict = {}
+
+    def get(self, role: str, name: str) -> SharedMemory:
+        current = self._buffers.get(role)
+        if current is None or current.name != name:
+            if current is not None:
+                current.close()
+            current = self._buffers[role] = SharedMemory(name=name)
+        return current
+
+    def close(self) -> None:
+        for shm in self._buffers.values():
+            shm.close()
+
+
+def _worker_main(
+    conn: Connection,
+    factory: Callable[[int], EmbeddingFunction],  # type: ignore
+    threads: int,
+) -> None:
+    """Embedding worker process. Texts are read from and embeddings written to shared memory, only buffer names and
+    shapes go through the pipe."""
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    ef = None
+    init_error: Optional[str] = None
+    try:
+        ef = factory(threads)
+    except Exception as e:
+        init_error = f"Failed to create the embedding function: {e!r}"
+    buffers = _Attachments()
+    try:
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                return
+            if ef is None:
+                conn.send(("error", init_error))
+                continue
+            in_name, out_name = msg
+            try:
+                texts = _read_texts(buffers.get("in", in_name).buf)
+                embeddings = np.asarray(ef(texts), dtype=np.float32)
+                out = buffers.get("out", out_name)
+                if embeddings.nbytes > out.size:
+                    conn.send(("grow", embeddings.nbytes))
+                    out = buffers.get("out", conn.recv())
+                target = np.ndarray(embeddings.shape, dtype=np.float32, buffer=out.buf)
+                target[:] = embeddings
+                del target
+                conn.send(("ok", embeddings.shape[0], embeddings.shape[1]))
+            except Exception as e:
+                conn.send(("error", repr(e)))
+    finally:
+        buffers.close()
+
+
+def _shutdown(
+    processes: List[Any],
+    conns: List[Connection],
+    buffers: List[SharedMemory],
+) -> None:
+    for conn in conns:
+        try:
+            conn.send(None)
+        except (OSError, ValueError):
+            pass
+    for process in processes:
+        process.join(timeout=10)
+        if process.is_alive():
+            process.terminate()
+    for shm in buffers:
+        shm.close()
+        shm.unlink()
+
+
+class MultiProcessEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Runs a local embedding function in `workers` processes, each with its own model instance limited to
+    `threads_per_worker` threads (defaults to cores / workers). Every call is split evenly between the workers.
+
+    Texts and embeddings are exchanged through per-worker shared memory buffers, which grow as needed. A worker is
+    held by a call from the dispatch of its chunk to the collection of its result only, so concurrent calls (e.g. of
+    an `EmbeddingExecutor` with several batches in flight) queue per worker and a worker gets the next chunk as soon
+    as its previous one is collected.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[int], EmbeddingFunction],  # type: ignore
+        workers: int,
+        threads_per_worker: Optional[int] = None,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("The number of workers must be at least 1.")
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(
+            1, (os.cpu_count() or 1) // workers
+        )
+        # guards the list of all buffers, the buffers of a worker are only used by the call holding its slot
+        self._lock = threading.Lock()
+        self._slots = [threading.Lock() for _ in range(workers)]
+        self._processes: List[Any] = []
+        self._conns: List[Connection] = []
+        self._in: List[SharedMemory] = []
+        self._out: List[SharedMemory] = []
+        # all buffers ever created, unlinked on shutdown
+        self._buffers: List[SharedMemory] = []
+        # spawn, a forked child would inherit the parent's threads and model state
+        ctx = multiprocessing.get_context("spawn")
+        for _ in range(workers):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker_main,
+                args=(child_conn, factory, self.threads_per_worker),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._processes.append(process)
+            self._conns.append(parent_conn)
+            self._in.append(self._new_buffer(_INITIAL_INPUT_BUFFER))
+            self._out.append(self._new_buffer(_INITIAL_OUTPUT_BUFFER))
+        self._finalizer = weakref.finalize(
+            self, _shutdown, self._processes, self._conns, self._buffers
+        )
+
+    def _new_buffer(self, size: int) -> SharedMemory:
+        shm = SharedMemory(create=True, size=size)
+        with self._lock:
+            self._buffers.append(shm)
+        return shm
+
+    def _replace_buffer(self, buffers: List[SharedMemory], w: int, size: int) -> None:
+        old = buffers[w]
+        buffers[w] = self._new_buffer(max(size, 2 * old.size))
+        with self._lock:
+            self._buffers.remove(old)
+        old.close()
+        old.unlink()
+
+    def _send(self, w: int, encoded: Sequence[bytes]) -> None:
+        size = _texts_size(encoded)
+        if size > self._in[w].size:
+            self._replace_buffer(self._in, w, size)
+        _write_texts(self._in[w].buf, encoded)
+        self._conns[w].send((self._in[w].name, self._out[w].name))
+
+    def _receive(self, w: int) -> Any:
+        msg = self._conns[w].recv()
+        if msg[0] == "grow":
+            self._replace_buffer(self._out, w, msg[1])
+            self._conns[w].send(self._out[w].name)
+            msg = self._conns[w].recv()
+        if msg[0] == "error":
+            return RuntimeError(f"Embedding worker {w} failed: {msg[1]}")
+        _, n, dim = msg
+        embeddings = np.ndarray((n, dim), dtype=np.float32, buffer=self._out[w].buf)
+        # copied out of the buffer, so that the worker can be released before the (slower) conversion to lists
+        result = embeddings.copy()
+        del embeddings
+        return result
+
+    def __call__(self, input: Documents) -> Embeddings:
+        if len(input) == 0:
+            return []
+        chunks = min(self.workers, len(input))
+        bounds = np.linspace(0, len(input), chunks + 1).astype(int)
+        # encoded before any worker is held
+        encoded = [t.encode("utf-8") for t in input]
+        sent: List[int] = []
+        results: List[Any] = []
+        try:
+            # the slots are always acquired in the same order, so concurrent calls cannot deadlock
+            for w in range(chunks):
+                self._slots[w].acquire()
+                try:
+                    self._send(w, encoded[bounds[w] : bounds[w + 1]])
+                except BaseException:
+                    self._slots[w].release()
+                    raise
+                sent.append(w)
+        finally:
+            # always drain the workers that were sent a chunk, even if one of them failed
+            for w in sent:
+                try:
+                    results.append(self._receive(w))
+                except Exception as e:
+                    results.append(e)
+                finally:
+                    self._slots[w].release()
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return [e for result in results for e in result.tolist()]
+
+    def close(self) -> None:
+        self._finalizer()
@@ -0,0 +1,356 @@
+import ast
+import math
+import operator
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from chroma_dp import EmbeddableTextResource
+from chroma_dp.utils.tokenizer import TokenCounter, get_token_counter
+
+Evaluator = Callable[[EmbeddableTextResource], Any]
+
+# integer powers are computed exactly, bigger results would stall the pipeline
+_MAX_POWER_BITS = 1 << 16
+
+
+def _power(base: Any, exponent: Any) -> Any:
+    """`base ** exponent`, None for integer results of more than `_MAX_POWER_BITS` bits and for complex results."""
+    if (
+        isinstance(base, int)
+        and isinstance(exponent, int)
+        and exponent > 0
+        and base.bit_length() * exponent > _MAX_POWER_BITS
+    ):
+        return None
+    result = operator.pow(base, exponent)
+    return None if isinstance(result, complex) else result
+
+
+# likewise for sequence repetition, e.g. `text_chunk * 10 ** 9`
+_MAX_REPEAT_LENGTH = 1 << 20
+
+
+def _multiply(left: Any, right: Any) -> Any:
+    """`left * right`, None for repeated strings and lists of more than `_MAX_REPEAT_LENGTH` items."""
+    sequence, times = (right, left) if isinstance(left, int) else (left, right)
+    if (
+        isinstance(sequence, (str, bytes, list, tuple))
+        and isinstance(times, int)
+        and len(sequence) * times > _MAX_REPEAT_LENGTH
+    ):
+        return None
+    return operator.mul(left, right)
+
+
+_BINARY: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: _multiply,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _power,
+}
+
+_COMPARE: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+_UNARY: Dict[type, Callable[[Any], Any]] = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(float(value)) if isinstance(value, str) else int(value)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _date(value: Any, date_format: Optional[str] = None) -> Optional[int]:
+    """Epoch seconds of an ISO 8601 date (or of a date in the given strptime format), naive dates are UTC."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    try:
+        parsed = (
+            datetime.strptime(value, date_format)
+            if date_format
+            else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        )
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _concat(*values: Any) -> str:
+    return "".join(str(v) for v in values if v is not None)
+
+
+class _Functions:
+    """The functions of the expressions. All of them but `coalesce`, `concat` and `now` return None when one of their
+    arguments is None."""
+
+    def __init__(self, token_counter: Optional[TokenCounter] = None) -> None:
+        self._token_counter = token_counter
+        self.null_safe: Dict[str, Callable[..., Any]] = {
+            "len": len,
+            "lower": str.lower,
+            "upper": str.upper,
+            "strip": str.strip,
+            "replace": str.replace,
+            "str": str,
+            "int": _to_int,
+            "float": _to_float,
+            "bool": bool,
+            "round": round,
+            "abs": abs,
+            "min": min,
+            "max": max,
+            "sqrt": math.sqrt,
+            "log": math.log,
+            "words": lambda text: len(text.split()),
+            "tokens": self._tokens,
+            "date": _date,
+        }
+        self.other: Dict[str, Callable[..., Any]] = {
+            "concat": _concat,
+            "now": lambda: int(time.time()),
+        }
+
+    def _tokens(self, text: str) -> int:
+        if self._token_counter is None:
+            # loaded on first use, the same tokenizer as `cdp chunk -t token`
+            self._token_counter = get_token_counter(
+                os.environ.get("CDP_EMBED_TOKENIZER")
+            )
+        return self._token_counter.count(text)
+
+
+def _null_safe(function: Callable[..., Any], args: List[Evaluator]) -> Evaluator:
+    if len(args) == 1:
+        (arg,) = args
+
+        def call_one(doc: EmbeddableTextResource) -> Any:
+            value = arg(doc)
+            return None if value is None else function(value)
+
+        return call_one
+
+    def call(doc: EmbeddableTextResource) -> Any:
+        values = [a(doc) for a in args]
+        if any(v is None for v in values):
+            return None
+        return function(*values)
+
+    return call
+
+
+class _Compiler:
+    def __init__(self, source: str, functions: _Functions) -> None:
+        self.source = source
+        self.functions = functions
+
+    def error(self, node: ast.AST, message: str) -> ValueError:
+        return ValueError(
+            f"{message} at column {getattr(node, 'col_offset', 0) + 1} of expression: {self.source}"
+        )
+
+    def compile(self, node: ast.AST) -> Evaluator:
+        method = getattr(self, f"_{type(node).__name__.lower()}", None)
+        if method is None:
+            raise self.error(node, f"Unsupported syntax {type(node).__name__}")
+        return method(node)  # type: ignore
+
+    def _constant(self, node: ast.Constant) -> Evaluator:
+        value = node.value
+        if not isinstance(value, (str, int, float, bool, type(None))):
+            raise self.error(node, f"Unsupported constant {value!r}")
+        return lambda doc: value
+
+    def _name(self, node: ast.Name) -> Evaluator:
+        if node.id == "metadata":
+            return lambda doc: doc.metadata or {}
+        if node.id == "text_chunk":
+            return lambda doc: doc.text_chunk
+        if node.id == "id":
+            return lambda doc: doc.id
+        raise self.error(
+            node, f"Unknown name {node.id}, expected metadata, text_chunk or id"
+        )
+
+    def _metadata_key(self, key: str) -> Evaluator:
+        return lambda doc: (doc.metadata or {}).get(key)
+
+    def _attribute(self, node: ast.Attribute) -> Evaluator:
+        if isinstance(node.value, ast.Name) and node.value.id == "metadata":
+            return self._metadata_key(node.attr)
+        raise self.error(node, "Attributes are only supported on metadata")
+
+    def _subscript(self, node: ast.Subscript) -> Evaluator:
+        key = node.slice
+        if (
+            isinstance(node.value, ast.Name)
+            and node.value.id == "metadata"
+            and isinstance(key, ast.Constant)
+            and isinstance(key.value, str)
+        ):
+            return self._metadata_key(key.value)
+        value = self.compile(node.value)
+        if isinstance(key, ast.Slice):
+            lower, upper, step = (
+                self.compile(k) if k is not None else (lambda doc: None)
+                for k in (key.lower, key.upper, key.step)
+            )
+
+            def get_slice(doc: EmbeddableTextResource) -> Any:
+                v = value(doc)
+                return None if v is None else v[lower(doc) : upper(doc) : step(doc)]
+
+            return get_slice
+        index = self.compile(key)
+
+        def get_item(doc: EmbeddableTextResource) -> Any:
+            v, i = value(doc), index(doc)
+            if v is None or i is None:
+                return None
+            try:
+                return v[i]
+            except (IndexError, KeyError):
+                return None
+
+        return get_item
+
+    def _binop(self, node: ast.BinOp) -> Evaluator:
+        if type(node.op) not in _BINARY:
+            raise self.error(node, f"Unsupported operator {type(node.op).__name__}")
+        return _null_safe(
+            _BINARY[type(node.op)], [self.compile(node.left), self.compile(node.right)]
+        )
+
+    def _unaryop(self, node: ast.UnaryOp) -> Evaluator:
+        operand = self.compile(node.operand)
+        if type(node.op) not in _UNARY:
+            raise self.error(node, f"Unsupported operator {type(node.op).__name__}")
+        return _null_safe(_UNARY[type(node.op)], [operand])
+
+    def _boolop(self, node: ast.BoolOp) -> Evaluator:
+        values = [self.compile(v) for v in node.values]
+        if isinstance(node.op, ast.And):
+
+            def all_of(doc: EmbeddableTextResource) -> Any:
+                result = None
+                for v in values:
+                    result = v(doc)
+                    if not result:
+                        return result
+                return result
+
+            return all_of
+
+        def any_of(doc: EmbeddableTextResource) -> Any:
+            result = None
+            for v in values:
+                result = v(doc)
+                if result:
+                    return result
+            return result
+
+        return any_of
+
+    def _compare(self, node: ast.Compare) -> Evaluator:
+        operands = [self.compile(node.left)] + [
+            self.compile(c) for c in node.comparators
+        ]
+        ops = []
+        for op in node.ops:
+            if type(op) not in _COMPARE:
+                raise self.error(node, f"Unsupported comparison {type(op).__name__}")
+            ops.append(_COMPARE[type(op)])
+
+        def compare(doc: EmbeddableTextResource) -> Any:
+            left = operands[0](doc)
+            for op, right_operand in zip(ops, operands[1:]):
+                right = right_operand(doc)
+                if left is None or right is None:
+                    return None
+                if not op(left, right):
+                    return False
+                left = right
+            return True
+
+        return compare
+
+    def _ifexp(self, node: ast.IfExp) -> Evaluator:
+        test, body, orelse = (
+            self.compile(node.test),
+            self.compile(node.body),
+            self.compile(node.orelse),
+        )
+        return lambda doc: body(doc) if test(doc) else orelse(doc)
+
+    def _call(self, node: ast.Call) -> Evaluator:
+        if not isinstance(node.func, ast.Name):
+            raise self.error(
+                node, "Only functions can be called, e.g. lower(text_chunk)"
+            )
+        if node.keywords:
+            raise self.error(node, "Keyword arguments are not supported")
+        name = node.func.id
+        args = [self.compile(a) for a in node.args]
+        if name == "coalesce":
+
+            def coalesce(doc: EmbeddableTextResource) -> Any:
+                for a in args:
+                    value = a(doc)
+                    if value is not None:
+                        return value
+                return None
+
+            return coalesce
+        if name in self.functions.other:
+            function = self.functions.other[name]
+            return lambda doc: function(*(a(doc) for a in args))
+        if name in self.functions.null_safe:
+            return _null_safe(self.functions.null_safe[name], args)
+        raise self.error(node, f"Unknown function {name}")
+
+
+def compile_expression(
+    source: str, token_counter: Optional[TokenCounter] = None
+) -> Evaluator:
+    """Compiles a metadata expression into a function of a document. Expressions use Python syntax over `metadata`
+    (`metadata.key` or `metadata['key']`, None when missing), `text_chunk` and `id`: arithmetic, comparisons,
+    `and`/`or`/`not`, `x if cond else y`, indexing and slicing, and the functions len, lower, upper, strip, replace,
+    str, int, float, bool, round, abs, min, max, sqrt, log, words, tokens, date, now, concat and coalesce.
+
+    None propagates through operators (including `not`) and functions (except coalesce and concat), int, float and
+    date return None for values they cannot parse, and `**` returns None for integer results of more than 65536 bits.
+    Other errors (e.g. a division by zero) are raised. The expression is parsed and compiled once, into nested
+    closures.
+    """
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression {source}: {e.msg}") from e
+    return _Compiler(source, _Functions(token_counter)).compile(tree.body)
@@ -0,0 +1,74 @@
+import zlib
+from typing import List
+
+import numpy as np
+import numpy.typing as npt
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+DEFAULT_HASH_EMBEDDING_DIM = 384
+
+_TABLE_BITS = 10
+_TABLE_LOOKUPS = 4
+_CHUNK_SIZE = 8192
+
+
+def splitmix64(x: npt.NDArray[np.uint64]) -> npt.NDArray[np.uint64]:
+    """The splitmix64 finalizer, applied element-wise (uint64 arithmetic wraps around)."""
+    with np.errstate(over="ignore"):
+        x = x ^ (x >> np.uint64(30))
+        x = x * np.uint64(0xBF58476D1CE4E5B9)
+        x = x ^ (x >> np.uint64(27))
+        x = x * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def hash_texts(texts: List[str]) -> npt.NDArray[np.uint64]:
+    """64-bit hashes of the texts - the CRC-32 and Adler-32 checksums of the utf-8 bytes of each text, mixed together.
+    Stable across processes and platforms."""
+    encoded = [t.encode("utf-8") for t in texts]
+    crc = np.fromiter(
+        (zlib.crc32(e) for e in encoded), dtype=np.uint64, count=len(encoded)
+    )
+    adler = np.fromiter(
+        (zlib.adler32(e) for e in encoded), dtype=np.uint64, count=len(encoded)
+    )
+    return splitmix64(crc | (adler << np.uint64(32)))
+
+
+class HashEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Deterministic, normalized pseudo-random embeddings derived from a hash of the text. Needs no model and no
+    network, so it is meant for benchmarks and tests - the embeddings carry no meaning beyond identical texts having
+    identical embeddings.
+
+    Each embedding is the normalized sum of 4 rows of a fixed random table, selected by the bits of the text hash.
+    """
+
+    def __init__(self, dimension: int = DEFAULT_HASH_EMBEDDING_DIM) -> None:
+        if dimension < 1:
+            raise ValueError("The embedding dimension must be at least 1.")
+        self.dimension = dimension
+        # PCG64 streams are reproducible, the table is the same everywhere for a given dimension
+        self._table = (
+            np.random.default_rng(dimension)
+            .standard_normal((_TABLE_LOOKUPS << _TABLE_BITS, dimension))
+            .astype(np.float32)
+        )
+
+    def embed(self, input: List[str]) -> npt.NDArray[np.float32]:
+        """Returns the embeddings as an array of shape (len(input), dimension)."""
+        hashes = hash_texts(input)
+        shifts = np.arange(_TABLE_LOOKUPS, dtype=np.uint64) * np.uint64(_TABLE_BITS)
+        rows = ((hashes[:, None] >> shifts) & np.uint64((1 << _TABLE_BITS) - 1)).astype(
+            np.intp
+        )
+        # every lookup has its own part of the table
+        rows += np.arange(_TABLE_LOOKUPS, dtype=np.intp) << _TABLE_BITS
+        out = np.empty((len(input), self.dimension), dtype=np.float32)
+        for i in range(0, len(input), _CHUNK_SIZE):
+            chunk = self._table[rows[i : i + _CHUNK_SIZE]].sum(axis=1)
+            chunk /= np.linalg.norm(chunk, axis=1, keepdims=True)
+            out[i : i + _CHUNK_SIZE] = chunk
+        return out
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self.embed(list(input)).tolist()  # type: ignore
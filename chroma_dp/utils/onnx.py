@@ -0,0 +1,175 @@
+import os
+import tempfile
+from functools import cached_property
+from typing import List, Any, Optional
+
+import numpy as np
+import numpy.typing as npt
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+# the tuned embedding function overrides the lazily loaded `model` and `tokenizer` of Chroma's default embedding
+# function, older chromadb versions load them eagerly as plain attributes
+SUPPORTS_TUNING = all(
+    isinstance(ONNXMiniLM_L6_V2.__dict__.get(name), cached_property)
+    for name in ("model", "tokenizer")
+)
+
+
+class DynamicPaddingONNXMiniLM_L6_V2(ONNXMiniLM_L6_V2):
+    """Chroma's default embedding function, but batches are padded to their longest input instead of the maximum
+    sequence length (256). Pad tokens are masked out, so the embeddings are the same, but short inputs are embedded
+    much faster - especially when batches are formed from inputs of similar length.
+
+    The ONNX runtime session can be tuned - the intra-op and inter-op threads (e.g. when several processes share the
+    CPU), the graph optimization level (disable, basic, extended or all), the execution providers and the number of
+    inputs per model run (`batch_size`). With `quantized` an int8 (dynamically quantized) copy of the model is used,
+    created next to the original model on first use.
+
+    Requires a chromadb version that loads the model and tokenizer lazily (see `SUPPORTS_TUNING`), use
+    `default_embedding_function` to fall back to Chroma's default embedding function otherwise.
+    """
+
+    def __init__(
+        self,
+        preferred_providers: Optional[List[str]] = None,
+        intra_op_num_threads: Optional[int] = None,
+        inter_op_num_threads: Optional[int] = None,
+        graph_optimization_level: Optional[str] = None,
+        batch_size: int = 32,
+        quantized: bool = False,
+    ) -> None:
+        if (
+            graph_optimization_level is not None
+            and graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS
+        ):
+            raise ValueError(
+                f"Invalid graph optimization level {graph_optimization_level}, "
+                f"expected one of {', '.join(GRAPH_OPTIMIZATION_LEVELS.keys())}."
+            )
+        if batch_size < 1:
+            raise ValueError("The batch size must be at least 1.")
+        super().__init__(preferred_providers=preferred_providers)
+        self.intra_op_num_threads = intra_op_num_threads
+        self.inter_op_num_threads = inter_op_num_threads
+        self.graph_optimization_level = graph_optimization_level
+        self.batch_size = batch_size
+        self.quantized = quantized
+
+    def _session_options(self) -> Any:
+        so = self.ort.SessionOptions()
+        so.log_severity_level = 3
+        if self.intra_op_num_threads:
+            so.intra_op_num_threads = self.intra_op_num_threads
+            # a limited intra-op pool is meant to share the CPU, don't add inter-op threads on top of it
+            so.inter_op_num_threads = 1
+        if self.inter_op_num_threads:
+            so.inter_op_num_threads = self.inter_op_num_threads
+        if self.graph_optimization_level:
+            so.graph_optimization_level = getattr(
+                self.ort.GraphOptimizationLevel,
+                GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization_level],
+            )
+        return so
+
+    def _model_path(self) -> str:
+        model_path = os.path.join(
+            self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model.onnx"
+        )
+        if not self.quantized:
+            return model_path
+        quantized_path = os.path.join(
+            self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model_int8.onnx"
+        )
+        if not os.path.exists(quantized_path):
+            try:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+            except ImportError:
+                raise ValueError(
+                    "The onnx python package is not installed. Please install it with `pip install onnx`"
+                )
+            # concurrent workers may quantize at the same time, each writes its own copy and atomically moves it in
+            # place, so that the model is never read half-written
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(quantized_path), suffix=".onnx.tmp"
+            )
+            os.close(fd)
+            try:
+                quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+                os.replace(tmp_path, quantized_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return quantized_path
+
+    @cached_property
+    def model(self) -> Any:
+        if not (
+            self.intra_op_num_threads
+            or self.inter_op_num_threads
+            or self.graph_optimization_level
+            or self.quantized
+        ):
+            return ONNXMiniLM_L6_V2.model.func(self)  # type: ignore
+        providers = self._preferred_providers or self.ort.get_available_providers()
+        if not set(providers).issubset(set(self.ort.get_available_providers())):
+            raise ValueError(
+                f"Preferred providers must be subset of available providers: {self.ort.get_available_providers()}"
+            )
+        return self.ort.InferenceSession(
+            self._model_path(),
+            providers=providers,
+            sess_options=self._session_options(),
+        )
+
+    @cached_property
+    def tokenizer(self) -> Any:
+        tokenizer = self.Tokenizer.from_file(
+            os.path.join(
+                self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "tokenizer.json"
+            )
+        )
+        tokenizer.enable_truncation(max_length=256)
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        return tokenizer
+
+    def _forward(
+        self, documents: List[str], batch_size: Optional[int] = None
+    ) -> npt.NDArray[np.float32]:
+        batch_size = batch_size or self.batch_size
+        all_embeddings = []
+        for i in range(0, len(documents), batch_size):
+            # encode_batch pads to the longest input of the batch
+            encoded = self.tokenizer.encode_batch(documents[i : i + batch_size])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array(
+                [e.attention_mask for e in encoded], dtype=np.int64
+            )
+            onnx_input = {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.zeros_like(input_ids),
+            }
+            last_hidden_state = self.model.run(None, onnx_input)[0]
+            # mean pooling over the non-pad tokens
+            mask = attention_mask[:, :, np.newaxis].astype(np.float32)
+            embeddings = np.sum(last_hidden_state * mask, 1) / np.clip(
+                mask.sum(1), a_min=1e-9, a_max=None
+            )
+            all_embeddings.append(self._normalize(embeddings).astype(np.float32))
+        return np.concatenate(all_embeddings)
+
+
+def default_embedding_function(**kwargs: Any) -> ONNXMiniLM_L6_V2:
+    """The tuned default embedding function, or Chroma's own (with only the preferred providers and none of the tuning
+    options) when the installed chromadb version does not support tuning."""
+    if SUPPORTS_TUNING:
+        return DynamicPaddingONNXMiniLM_L6_V2(**kwargs)
+    return ONNXMiniLM_L6_V2(preferred_providers=kwargs.get("preferred_providers"))
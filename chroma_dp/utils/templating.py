@@ -1,8 +1,12 @@
+import re
 import time
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
 
-from jinja2 import Environment
+import numpy as np
+from jinja2 import Environment, meta
+
+from chroma_dp import EmbeddableTextResource
 
 
 def date(date_format: str = "epoch") -> str:
@@ -23,3 +27,126 @@ def get_jinja_env() -> Environment:
     _env.filters["date"] = date
     _env.filters["now"] = now
     return _env
+
+
+def _embedding(doc: EmbeddableTextResource) -> Any:
+    if isinstance(doc.embedding, np.ndarray):
+        return doc.embedding.tolist()
+    return doc.embedding
+
+
+# the document fields available to templates, each only read when a template references it
+DOCUMENT_FIELDS: Dict[str, Callable[[EmbeddableTextResource], Any]] = {
+    "id": lambda doc: doc.id,
+    "text_chunk": lambda doc: doc.text_chunk,
+    "metadata": lambda doc: doc.metadata,
+    "embedding": _embedding,
+}
+
+
+def document_context(
+    doc: EmbeddableTextResource, fields: Iterable[str]
+) -> Dict[str, Any]:
+    """The render context of a document with only the given fields."""
+    return {f: DOCUMENT_FIELDS[f](doc) for f in fields}
+
+
+_EXPRESSION = re.compile(r"\{\{\s*(.*?)\s*\}\}")
+_METADATA_ATTR = re.compile(r"metadata\.([A-Za-z_][A-Za-z0-9_]*)")
+_METADATA_ITEM = re.compile(r"""metadata\[\s*(['"])([^'"]*)\1\s*\]""")
+_CALL = re.compile(r"([A-Za-z_][A-Za-z0-9_]*)\(\s*\)")
+_FIELD = re.compile(r"id|text_chunk")
+_JINJA_SYNTAX = re.compile(r"\{[{%#]")
+
+
+def _metadata_part(key: str) -> Callable[[EmbeddableTextResource], str]:
+    def part(doc: EmbeddableTextResource) -> str:
+        metadata = doc.metadata or {}
+        # a missing key renders as an empty string, like an undefined value in Jinja
+        return str(metadata[key]) if key in metadata else ""
+
+    return part
+
+
+def _field_part(field: str) -> Callable[[EmbeddableTextResource], str]:
+    get = DOCUMENT_FIELDS[field]
+    return lambda doc: str(get(doc))
+
+
+def _call_part(function: Callable[[], Any]) -> Callable[[EmbeddableTextResource], str]:
+    return lambda doc: str(function())
+
+
+def _compile_fast_path(
+    source: str, functions: Dict[str, Callable[..., Any]]
+) -> Optional[List[Union[str, Callable[[EmbeddableTextResource], str]]]]:
+    """The parts of a template made only of text and simple expressions - `metadata.key`, `metadata['key']`, `id`,
+    `text_chunk` and calls of the functions without arguments (e.g. `{{ metadata.key }}-{{ ulid() }}`), or None if
+    the template needs Jinja."""
+    if source.endswith("\n"):
+        # Jinja drops a single trailing newline
+        return None
+    parts: List[Union[str, Callable[[EmbeddableTextResource], str]]] = []
+    end = 0
+    for m in _EXPRESSION.finditer(source):
+        literal = source[end : m.start()]
+        if _JINJA_SYNTAX.search(literal):
+            return None
+        if literal:
+            parts.append(literal)
+        expr = m.group(1)
+        attr = _METADATA_ATTR.fullmatch(expr)
+        item = _METADATA_ITEM.fullmatch(expr)
+        call = _CALL.fullmatch(expr)
+        if attr and not hasattr(dict, attr.group(1)):
+            parts.append(_metadata_part(attr.group(1)))
+        elif item:
+            parts.append(_metadata_part(item.group(2)))
+        elif _FIELD.fullmatch(expr):
+            parts.append(_field_part(expr))
+        elif call and call.group(1) in functions:
+            parts.append(_call_part(functions[call.group(1)]))
+        else:
+            return None
+        end = m.end()
+    literal = source[end:]
+    if _JINJA_SYNTAX.search(literal):
+        return None
+    if literal:
+        parts.append(literal)
+    return parts
+
+
+class DocumentTemplate:
+    """A Jinja template over the fields of a document (`id`, `text_chunk`, `metadata` and `embedding`), compiled once.
+    The fields the template references are found when it is parsed, and only those are read from the documents -
+    e.g. the embedding is never converted to a list unless the template uses it.
+
+    Templates made only of text and simple expressions (e.g. `{{ metadata.key }}-{{ ulid() }}`) are rendered without
+    Jinja.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        env: Optional[Environment] = None,
+        **functions: Callable[..., Any],
+    ) -> None:
+        _env = env or get_jinja_env()
+        self.source = source
+        self._template = _env.from_string(source)
+        names = meta.find_undeclared_variables(_env.parse(source))
+        self.fields = [f for f in DOCUMENT_FIELDS if f in names]
+        self._functions = {k: v for k, v in functions.items() if k in names}
+        self._parts = _compile_fast_path(source, functions)
+
+    def render(
+        self, doc: EmbeddableTextResource, context: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Renders the template for the document. The context (see `document_context`) can be shared between the
+        templates rendered for the same document."""
+        if self._parts is not None:
+            return "".join(p if isinstance(p, str) else p(doc) for p in self._parts)
+        if context is None:
+            context = document_context(doc, self.fields)
+        return self._template.render(context, **self._functions)
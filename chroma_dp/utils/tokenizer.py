@@ -0,0 +1,118 @@
+import os
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+from overrides import EnforceOverrides, override
+
+
+class TokenCounter(ABC, EnforceOverrides):
+    """Counts tokens and splits texts into pieces of at most `max_tokens` tokens."""
+
+    @abstractmethod
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        raise NotImplementedError()
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+    @abstractmethod
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        """Splits the text into consecutive pieces of at most `max_tokens` tokens. Joining the pieces gives back the
+        original text."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def offsets_many(self, texts: Sequence[str]) -> List[List[Tuple[int, int]]]:
+        """The (start, end) character offsets of the tokens of each text. Special tokens are not included."""
+        raise NotImplementedError()
+
+
+class HeuristicTokenCounter(TokenCounter):
+    """Estimates ~4 characters per token. No tokenizer needed, but only an approximation."""
+
+    def __init__(self, chars_per_token: int = 4) -> None:
+        self.chars_per_token = chars_per_token
+
+    @override
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        return [max(1, -(-len(t) // self.chars_per_token)) for t in texts]
+
+    @override
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        window = max_tokens * self.chars_per_token
+        pieces = []
+        start = 0
+        while len(text) - start > window:
+            end = start + window
+            # prefer cutting at whitespace in the second half of the window
+            ws = text.rfind(" ", start + window // 2, end)
+            if ws > start:
+                end = ws
+            pieces.append(text[start:end])
+            start = end
+        pieces.append(text[start:])
+        return pieces
+
+    @override
+    def offsets_many(self, texts: Sequence[str]) -> List[List[Tuple[int, int]]]:
+        # words of up to `chars_per_token` characters are a token, longer words are cut into several
+        n = self.chars_per_token
+        return [
+            [
+                (start, min(start + n, m.end()))
+                for m in re.finditer(r"\S+", text)
+                for start in range(m.start(), m.end(), n)
+            ]
+            for text in texts
+        ]
+
+
+class HFTokenCounter(TokenCounter):
+    """Exact counts with a HuggingFace fast tokenizer (a `tokenizer.json` file or a model name on the Hub)."""
+
+    def __init__(self, name_or_path: str) -> None:
+        try:
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise ValueError(
+                "The tokenizers python package is not installed. "
+                "Please install it with `pip install tokenizers`"
+            )
+        if os.path.exists(name_or_path):
+            self._tokenizer = Tokenizer.from_file(name_or_path)
+        else:
+            self._tokenizer = Tokenizer.from_pretrained(name_or_path)
+        self._tokenizer.no_truncation()
+        self._tokenizer.no_padding()
+
+    @override
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        # encode_batch tokenizes in parallel in Rust
+        encodings = self._tokenizer.encode_batch(list(texts), add_special_tokens=False)
+        return [len(e.ids) for e in encodings]
+
+    @override
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        offsets = self._tokenizer.encode(text, add_special_tokens=False).offsets
+        if len(offsets) <= max_tokens:
+            return [text]
+        cuts = [0]
+        cuts.extend(offsets[i][0] for i in range(max_tokens, len(offsets), max_tokens))
+        cuts.append(len(text))
+        return [text[cuts[i] : cuts[i + 1]] for i in range(len(cuts) - 1)]
+
+    @override
+    def offsets_many(self, texts: Sequence[str]) -> List[List[Tuple[int, int]]]:
+        encodings = self._tokenizer.encode_batch(list(texts), add_special_tokens=False)
+        return [e.offsets for e in encodings]
+
+
+@lru_cache(maxsize=8)
+def get_token_counter(tokenizer: Optional[str] = None) -> TokenCounter:
+    """Returns a (cached) token counter. `heuristic` or None for the character heuristic, otherwise a path to a
+    `tokenizer.json` or a HuggingFace Hub model name."""
+    if not tokenizer or tokenizer == "heuristic":
+        return HeuristicTokenCounter()
+    return HFTokenCounter(tokenizer)
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import tempfile
+
+import chromadb
+import numpy as np
+
+cdp_cmd_args = ["python", "-m", "chroma_dp.main"]
+
+
+def _create_source(path: str, count: int = 250) -> None:
+    client = chromadb.PersistentClient(path=path)
+    col = client.create_collection("source", metadata={"hnsw:space": "cosine"})
+    col.add(
+        ids=[f"{i}" for i in range(count)],
+        embeddings=np.random.rand(count, 8).tolist(),
+        documents=[f"document {i}" for i in range(count)],
+        metadatas=[{"i": i, "even": i % 2 == 0} for i in range(count)],
+    )
+
+
+def test_copy() -> None:
+    with tempfile.TemporaryDirectory() as tdir:
+        _create_source(f"{tdir}/src")
+        result = subprocess.run(
+            [
+                *cdp_cmd_args,
+                "copy",
+                f"file://{tdir}/src/source",
+                f"file://{tdir}/dst/destination",
+                "--create",
+                "--batch-size",
+                "30",
+                "-r",
+                "3",
+                "-w",
+                "3",
+            ],
+            capture_output=True,
+        )
+        assert result.returncode == 0
+        src = chromadb.PersistentClient(path=f"{tdir}/src").get_collection("source")
+        dst = chromadb.PersistentClient(path=f"{tdir}/dst").get_collection(
+            "destination"
+        )
+        assert dst.count() == 250
+        assert dst.metadata == {"hnsw:space": "cosine"}
+        src_records = src.get(ids=["42"], include=["embeddings", "documents"])
+        dst_records = dst.get(ids=["42"], include=["embeddings", "documents"])
+        assert dst_records["documents"] == src_records["documents"]
+        assert np.allclose(dst_records["embeddings"], src_records["embeddings"])
+
+
+def test_copy_where_with_checkpoint() -> None:
+    with tempfile.TemporaryDirectory() as tdir:
+        _create_source(f"{tdir}/src")
+        checkpoint = os.path.join(tdir, "checkpoint.jsonl")
+        args = [
+            *cdp_cmd_args,
+            "copy",
+            f"file://{tdir}/src/source",
+            f"file://{tdir}/dst/destination",
+            "--create",
+            "--where",
+            '{"even": true}',
+            "--checkpoint",
+            checkpoint,
+        ]
+        result = subprocess.run(args, capture_output=True)
+        assert result.returncode == 0
+        assert "Copied 125 records." in result.stderr.decode()
+        dst = chromadb.PersistentClient(path=f"{tdir}/dst").get_collection(
+            "destination"
+        )
+        assert dst.count() == 125
+        # resuming a completed copy does not transfer anything
+        result = subprocess.run(args, capture_output=True)
+        assert result.returncode == 0
+        assert "Copied 0 records." in result.stderr.decode()
+        # a copy with other filters cannot resume from the checkpoint
+        args[args.index('{"even": true}')] = '{"even": false}'
+        result = subprocess.run(args, capture_output=True)
+        assert result.returncode != 0
+        assert "different source, destination or filters" in result.stderr.decode()
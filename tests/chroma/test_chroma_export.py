@@ -0,0 +1,49 @@
+import subprocess
+
+import orjson as json
+
+cdp_cmd_args = ["python", "-m", "chroma_dp.main"]
+
+
+def test_export_include_metadatas() -> None:
+    result = subprocess.run(
+        [
+            *cdp_cmd_args,
+            "export",
+            "file://./sample-data/chroma/chroma-data-single/test_collection",
+            "--include",
+            "metadatas",
+            "--limit",
+            "1",
+        ],
+        capture_output=True,
+    )
+    assert result.returncode == 0
+    doc = json.loads(result.stdout.decode())
+    assert doc["id"] is not None
+    assert doc["metadata"]["a"] is not None
+    assert "embedding" not in doc
+    assert "text_chunk" not in doc
+
+
+def test_export_jsonl_include_documents() -> None:
+    result = subprocess.run(
+        [
+            *cdp_cmd_args,
+            "export",
+            "file://./sample-data/chroma/chroma-data-single/test_collection",
+            "--format",
+            "jsonl",
+            "-i",
+            "documents",
+            "--limit",
+            "1",
+        ],
+        capture_output=True,
+    )
+    assert result.returncode == 0
+    doc = json.loads(result.stdout.decode())
+    assert doc["id"] is not None
+    assert doc["text_chunk"] is not None
+    assert "embedding" not in doc
+    assert "a" not in doc
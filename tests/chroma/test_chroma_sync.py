@@ -0,0 +1,102 @@
+import subprocess
+import tempfile
+
+import chromadb
+import numpy as np
+import orjson as json
+
+from chroma_dp.chroma.chroma_sync import CollectionDigest
+
+cdp_cmd_args = ["python", "-m", "chroma_dp.main"]
+
+
+def test_sync() -> None:
+    with tempfile.TemporaryDirectory() as tdir:
+        embeddings = np.random.rand(300, 8).tolist()
+        src = chromadb.PersistentClient(path=f"{tdir}/src").create_collection("source")
+        src.add(
+            ids=[f"{i}" for i in range(300)],
+            embeddings=embeddings,
+            documents=[f"document {i}" for i in range(300)],
+            metadatas=[{"i": i} for i in range(300)],
+        )
+        dst = chromadb.PersistentClient(path=f"{tdir}/dst").create_collection("replica")
+        # missing 0-9, changed 10-19, extra 300-304
+        dst.add(
+            ids=[f"{i}" for i in range(10, 305)],
+            embeddings=embeddings[10:] + embeddings[:5],
+            documents=[f"document {i}" if i >= 20 else "stale" for i in range(10, 305)],
+            metadatas=[{"i": i} for i in range(10, 305)],
+        )
+        args = [
+            *cdp_cmd_args,
+            "sync",
+            f"file://{tdir}/src/source",
+            f"file://{tdir}/dst/replica",
+            "--buckets",
+            "64",
+        ]
+        result = subprocess.run([*args, "--dry-run"], capture_output=True)
+        assert result.returncode == 0
+        stats = json.loads(result.stdout)
+        assert stats["changed"] == 20
+        assert stats["extra"] == 5
+        assert stats["upserted"] == 0
+
+        result = subprocess.run(args, capture_output=True)
+        assert result.returncode == 0
+        stats = json.loads(result.stdout)
+        assert stats["upserted"] == 20
+        assert stats["deleted"] == 5
+        dst = chromadb.PersistentClient(path=f"{tdir}/dst").get_collection("replica")
+        assert dst.count() == 300
+        assert dst.get(ids=["15"])["documents"] == ["document 15"]
+
+        result = subprocess.run(args, capture_output=True)
+        assert result.returncode == 0
+        stats = json.loads(result.stdout)
+        assert stats["differing_buckets"] == 0
+
+
+def test_sync_changed_spans_batches() -> None:
+    with tempfile.TemporaryDirectory() as tdir:
+        embeddings = np.random.rand(100, 8).tolist()
+        src = chromadb.PersistentClient(path=f"{tdir}/src").create_collection("source")
+        src.add(
+            ids=[f"{i}" for i in range(100)],
+            embeddings=embeddings,
+            documents=[f"document {i}" for i in range(100)],
+        )
+        dst = chromadb.PersistentClient(path=f"{tdir}/dst").create_collection("replica")
+        dst.add(
+            ids=[f"{i}" for i in range(50, 100)],
+            embeddings=embeddings[50:],
+            documents=[f"document {i}" for i in range(50, 100)],
+        )
+        result = subprocess.run(
+            [
+                *cdp_cmd_args,
+                "sync",
+                f"file://{tdir}/src/source",
+                f"file://{tdir}/dst/replica",
+                "--batch-size",
+                "10",
+            ],
+            capture_output=True,
+        )
+        assert result.returncode == 0, result.stderr
+        stats = json.loads(result.stdout)
+        assert stats["changed"] == 50
+        assert stats["upserted"] == 50
+        dst = chromadb.PersistentClient(path=f"{tdir}/dst").get_collection("replica")
+        assert dst.count() == 100
+
+
+def test_digest_keeps_only_bucket_state() -> None:
+    ours, theirs = CollectionDigest(num_buckets=8), CollectionDigest(num_buckets=8)
+    for i in range(1000):
+        ours.add(f"{i}", f"document {i}", None)
+        theirs.add(f"{i}", f"document {i}" if i != 42 else "stale", None)
+    assert len(ours.differing_buckets(theirs)) == 1
+    # memory does not grow with the number of records
+    assert sorted(vars(ours)) == ["bucket_counts", "bucket_digests", "num_buckets"]
@@ -0,0 +1,312 @@
+import subprocess
+
+import numpy as np
+import orjson as json
+from hypothesis import given, settings, strategies as st
+from langchain.text_splitter import CharacterTextSplitter
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from chroma_dp import EmbeddableTextResource
+from chroma_dp.processor.chunkers import (
+    CharacterChunker,
+    Chunk,
+    CodeChunker,
+    HTMLChunker,
+    MarkdownChunker,
+    SemanticChunker,
+    TokenChunker,
+)
+from chroma_dp.processor.langchain_utils import (
+    convert_chroma_emb_resource_to_lc_doc,
+    convert_lc_doc_to_chroma_resource,
+)
+from chroma_dp.utils.tokenizer import get_token_counter
+
+cdp_cmd_args = ["python", "-m", "chroma_dp.main"]
+
+
+@settings(max_examples=300, deadline=None)
+@given(
+    text=st.text(alphabet="ab \n\t.", max_size=300),
+    size=st.integers(min_value=1, max_value=40),
+    overlap_ratio=st.floats(min_value=0, max_value=1),
+    separator=st.sampled_from(["\n", " ", ".", "", "ab"]),
+)
+def test_character_chunker_matches_langchain(
+    text: str, size: int, overlap_ratio: float, separator: str
+) -> None:
+    overlap = int(size * overlap_ratio)
+    splitter = CharacterTextSplitter(
+        separator=separator,
+        chunk_size=size,
+        chunk_overlap=overlap,
+        add_start_index=True,
+    )
+    expected = splitter.create_documents([text])
+    chunker = CharacterChunker(size=size, overlap=overlap, separator=separator)
+    chunks = chunker.split_text(text)
+    assert chunks == [d.page_content for d in expected]
+    assert chunker.start_indices(text, chunks) == [
+        d.metadata["start_index"] for d in expected
+    ]
+
+
+def test_chunk_cli_matches_langchain() -> None:
+    docs = [
+        EmbeddableTextResource(
+            text_chunk="\n".join(
+                f"line {i} of doc {d}" * (i % 4 + 1) for i in range(40)
+            ),
+            metadata={"source": f"doc-{d}.txt", "page": d, "draft": d == 1},
+            id=f"{d}",
+            embedding=None,
+        )
+        for d in range(3)
+    ]
+    result = subprocess.run(
+        [*cdp_cmd_args, "chunk", "-s", "100", "-o", "30", "-a"],
+        input="\n".join(json.dumps(d.model_dump()).decode() for d in docs),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    splitter = CharacterTextSplitter(
+        separator="\n", chunk_size=100, chunk_overlap=30, add_start_index=True
+    )
+    expected = [
+        convert_lc_doc_to_chroma_resource(split_doc, doc.metadata).model_dump(
+            exclude={"id"}
+        )
+        for doc in docs
+        for split_doc in splitter.split_documents(
+            [convert_chroma_emb_resource_to_lc_doc(doc)]
+        )
+    ]
+    chunks = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [{k: v for k, v in c.items() if k != "id"} for c in chunks] == expected
+    assert len({c["id"] for c in chunks}) == len(chunks)
+
+
+def test_token_chunker(tmp_path) -> None:
+    words = [f"w{i}" for i in range(50)]
+    tokenizer = Tokenizer(
+        WordLevel({w: i for i, w in enumerate(["[UNK]", *words])}, unk_token="[UNK]")
+    )
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+    counter = get_token_counter(str(tmp_path / "tokenizer.json"))
+    text = "  " + "\n".join(" ".join(words[i : i + 7]) for i in range(0, 50, 7))
+    chunker = TokenChunker(size=10, overlap=3, token_counter=counter)
+    chunks = chunker.chunk(text)
+    assert all(text[c.start_index :].startswith(c.text) for c in chunks)
+    assert all(counter.count(c.text) <= 10 for c in chunks)
+    assert chunks[0].text.startswith("w0") and chunks[-1].text.endswith("w49")
+    # consecutive chunks overlap by 3 tokens
+    assert all(
+        a.text.split()[-3:] == b.text.split()[:3] for a, b in zip(chunks, chunks[1:])
+    )
+    assert chunker.chunk_many(["", "w1 w2"]) == [[], [Chunk("w1 w2", 0)]]
+
+
+def test_chunk_cli_token() -> None:
+    doc = EmbeddableTextResource(
+        text_chunk=" ".join(["lorem ipsum dolor sit amet"] * 100),
+        metadata={"source": "lorem.txt"},
+        id="1",
+        embedding=None,
+    )
+    result = subprocess.run(
+        [*cdp_cmd_args, "chunk", "-s", "64", "-t", "token", "-a"],
+        input=json.dumps(doc.model_dump()).decode(),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    chunks = [json.loads(line) for line in result.stdout.splitlines()]
+    assert len(chunks) > 1
+    for chunk in chunks:
+        start = chunk["metadata"]["start_index"]
+        assert (
+            doc.text_chunk[start : start + len(chunk["text_chunk"])]
+            == chunk["text_chunk"]
+        )
+        assert len(chunk["text_chunk"]) <= 64 * 4
+
+
+def test_markdown_chunker() -> None:
+    text = (
+        "# Guide\n\nIntro.\n\n## Install\n\n```bash\n# not a header\npip install x\n```\n\n"
+        "### Linux\n" + "Linux text.\n\n" * 10 + "## Usage\nUsage text.\n"
+    )
+    chunks = MarkdownChunker(size=60).chunk(text)
+    assert [c.metadata["header_path"] for c in chunks] == [
+        "Guide",
+        "Guide > Install",
+        "Guide > Install > Linux",
+        "Guide > Install > Linux",
+        "Guide > Install > Linux",
+        "Guide > Usage",
+    ]
+    assert "# not a header" in chunks[1].text
+    assert all(len(c.text) <= 60 for c in chunks)
+    assert all(text[c.start_index :].startswith(c.text) for c in chunks)
+
+
+def test_code_chunker() -> None:
+    text = (
+        "import os\n\n\n@cached\ndef load(path):\n    return path\n\n\n"
+        "class Parser:\n    def parse(self):\n        return 1\n\n"
+        "    def close(self):\n        # done\n        return 2\n\n\ndef main():\n    pass\n"
+    )
+    chunks = CodeChunker(size=60, language="python").chunk(text)
+    assert [c.text.split("\n")[0] for c in chunks] == [
+        "import os",
+        "class Parser:",
+        "def close(self):",
+        "def main():",
+    ]
+    assert [(c.metadata or {}).get("header_path") for c in chunks] == [
+        None,
+        "class Parser",
+        "class Parser > def close",
+        "def main",
+    ]
+    assert all(text[c.start_index :].startswith(c.text) for c in chunks)
+
+
+def test_code_chunker_decorated_method() -> None:
+    text = (
+        "class Parser:\n    def parse(self):\n        return 1\n\n"
+        "    @property\n    def x(self):\n        return 2\n"
+    )
+    chunks = CodeChunker(size=40, language="python").chunk(text)
+    decorated = next(c for c in chunks if c.text.startswith("@property"))
+    assert decorated.metadata["header_path"] == "class Parser > def x"
+
+
+def test_html_chunker() -> None:
+    text = (
+        "<html><head><title>T</title><style>p {}</style></head><body>"
+        "<h1>Guide</h1><p>Intro &amp; more</p>"
+        "<h2>Install</h2><div>Run <b>pip</b></div><script>var x;</script>"
+        "<h2>Usage</h2><ul><li>one</li><li>two</li></ul></body></html>"
+    )
+    chunks = HTMLChunker(size=100).chunk(text)
+    assert [c.text for c in chunks] == [
+        "Guide\nIntro & more",
+        "Install\nRun pip",
+        "Usage\none\ntwo",
+    ]
+    assert [c.metadata["header_path"] for c in chunks] == [
+        "Guide",
+        "Guide > Install",
+        "Guide > Usage",
+    ]
+    assert text[chunks[1].start_index :].startswith("Install</h2>")
+
+
+def test_chunk_cli_code_language_from_source() -> None:
+    docs = [
+        EmbeddableTextResource(
+            text_chunk=text,
+            metadata={"source": source},
+            id=source,
+            embedding=None,
+        )
+        for source, text in [
+            ("a.py", "def a():\n    pass\n\n\ndef b():\n    pass\n"),
+            ("b.go", "func a() {\n}\n\nfunc b() {\n}\n"),
+        ]
+    ]
+    result = subprocess.run(
+        [*cdp_cmd_args, "chunk", "-s", "20", "-t", "code"],
+        input="\n".join(json.dumps(d.model_dump()).decode() for d in docs),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    chunks = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [c["metadata"]["header_path"] for c in chunks] == [
+        "def a",
+        "def b",
+        "func a",
+        "func b",
+    ]
+
+
+def _topic_ef(input):
+    return [[1.0, 0.0] if "cat" in t else [0.0, 1.0] for t in input]
+
+
+def test_semantic_chunker_breaks_at_topic_changes() -> None:
+    text = (
+        "The cat sleeps. A cat purrs. My cat likes fish. "
+        "The car is red. A car needs fuel. Fast cars rule."
+    )
+    chunker = SemanticChunker(
+        size=200, embedding_function=_topic_ef, window=0, pooled_embeddings=True
+    )
+    chunks = chunker.chunk(text)
+    assert [c.text for c in chunks] == [
+        "The cat sleeps. A cat purrs. My cat likes fish.",
+        "The car is red. A car needs fuel. Fast cars rule.",
+    ]
+    for c in chunks:
+        assert text[c.start_index :].startswith(c.text)
+    assert [c.embedding for c in chunks] == [[1.0, 0.0], [0.0, 1.0]]
+    # the chunk size still bounds the chunks
+    assert all(len(c.text) <= 30 for c in chunker.__class__(30, _topic_ef).chunk(text))
+
+
+def test_semantic_chunker_pools_sentence_embeddings() -> None:
+    text = (
+        "The cat sleeps. A cat purrs. My cat likes fish. "
+        "The car is red. A car needs fuel. Fast cars rule."
+    )
+    calls = []
+
+    def ef(input):
+        calls.append(input)
+        return _topic_ef(input)
+
+    chunks = SemanticChunker(
+        size=200, embedding_function=ef, window=1, pooled_embeddings=True
+    ).chunk(text)
+    # the window of "The car is red." includes a cat sentence, so it stays in the first chunk
+    assert chunks[0].text.endswith("The car is red.")
+    # the embeddings of the sentences are pooled, not the ones of their windows
+    assert np.allclose(chunks[0].embedding, np.array([3.0, 1.0]) / np.sqrt(10))
+    assert chunks[1].embedding == [0.0, 1.0]
+    # windows and sentences are embedded with a single call
+    assert len(calls) == 1
+
+
+def test_chunk_cli_semantic_pooled_embeddings() -> None:
+    doc = EmbeddableTextResource(
+        text_chunk="One sentence here. Another one follows. And a third one.",
+        metadata={"source": "a.txt"},
+        id="a",
+        embedding=None,
+    )
+    result = subprocess.run(
+        [
+            *cdp_cmd_args,
+            "chunk",
+            "-s",
+            "40",
+            "-t",
+            "semantic",
+            "--ef",
+            "hash",
+            "--pooled-embeddings",
+        ],
+        input=json.dumps(doc.model_dump()).decode(),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    chunks = [json.loads(line) for line in result.stdout.splitlines()]
+    assert len(chunks) > 1
+    assert all(len(c["embedding"]) == 384 for c in chunks)
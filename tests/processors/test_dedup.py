@@ -0,0 +1,131 @@
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+import orjson as json
+
+from chroma_dp.processor.misc.dedup import (
+    BloomFilter,
+    FingerprintTable,
+    MinHasher,
+    NearDuplicateIndex,
+)
+
+cdp_cmd_args = ["python", "-m", "chroma_dp.main"]
+
+_TEXTS = [
+    "Chroma is the open-source AI application database. Batteries included.",
+    "Embeddings, vector search, document storage, full-text search and more.",
+    "Chroma is the open-source AI application database. Batteries included!",
+    "The quick brown fox jumps over the lazy dog.",
+    "chroma is the  open-source AI application database.\nBatteries included.",
+]
+
+
+def _records(texts: list) -> str:
+    return "\n".join(
+        json.dumps({"id": f"{i}", "text_chunk": t, "metadata": {"i": i}}).decode()
+        for i, t in enumerate(texts)
+    )
+
+
+def _run(*args: str, input: str) -> list:
+    result = subprocess.run(
+        [*cdp_cmd_args, "tx", "dedup", *args],
+        input=input,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return [json.loads(line) for line in result.stdout.splitlines()]
+
+
+def test_fingerprint_table_matches_set() -> None:
+    rng = np.random.default_rng(0)
+    table = FingerprintTable(capacity=16)
+    seen: set = set()
+    for _ in range(20):
+        keys = rng.integers(1, 5000, 1000, dtype=np.uint64)
+        expected = []
+        for k in keys.tolist():
+            expected.append(k in seen)
+            seen.add(k)
+        assert table.add_many(keys).tolist() == expected
+    assert len(table) == len(seen)
+
+
+def test_minhash_estimates_jaccard() -> None:
+    a = " ".join(f"word{i}" for i in range(300))
+    b = " ".join(f"word{i}" for i in range(60, 360))
+    shingles = [
+        {t.encode()[i : i + 5] for i in range(len(t.encode()) - 4)} for t in (a, b)
+    ]
+    jaccard = len(shingles[0] & shingles[1]) / len(shingles[0] | shingles[1])
+    sig = MinHasher(num_perm=256).signatures([a, b])
+    assert abs((sig[0] == sig[1]).mean() - jaccard) < 0.1
+
+
+def test_near_duplicate_index_evicts_oldest() -> None:
+    index = NearDuplicateIndex(max_size=2)
+    assert index.query_insert(_TEXTS[:2], ["0", "1"]) == [None, None]
+    assert index.query_insert([_TEXTS[2]], ["2"])[0][0] == "0"  # type: ignore
+    index.query_insert([_TEXTS[3]], ["3"])
+    # 0 was evicted by 3, so the index does not find it anymore
+    assert index.query_insert([_TEXTS[0]], ["4"]) == [None]
+
+
+def test_dedup_cli() -> None:
+    records = _records(_TEXTS + [_TEXTS[3]])
+    assert [d["id"] for d in _run(input=records)] == ["0", "1", "2", "3", "4"]
+    assert [d["id"] for d in _run("--near", input=records)] == ["0", "1", "3"]
+
+    tagged = _run("--near", "--action", "tag", input=records)
+    assert len(tagged) == 6
+    assert tagged[2]["metadata"]["duplicate_of"] == "0"
+    assert tagged[2]["metadata"]["similarity"] >= 0.8
+    assert "duplicate" not in tagged[3]["metadata"]
+
+
+def test_dedup_cli_index_file() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        index_file = os.path.join(tmp, "index.npz")
+        first = _run("--near", "--index-file", index_file, input=_records(_TEXTS[:2]))
+        assert len(first) == 2
+        assert os.path.exists(index_file)
+        second = _run("--near", "--index-file", index_file, input=_records(_TEXTS))
+        assert [d["id"] for d in second] == ["3"]
+
+
+def test_bloom_filter_error_rate() -> None:
+    keys = np.random.default_rng(1).integers(1, 2**63, 40000, dtype=np.uint64)
+    bloom = BloomFilter(capacity=20000, error_rate=0.01)
+    assert not bloom.add_many(keys[:20000]).any()
+    assert bloom.add_many(keys[:100]).all()
+    assert bloom.add_many(keys[20000:]).mean() < 0.02
+
+
+def test_dedup_cli_keys() -> None:
+    records = "\n".join(
+        json.dumps(r).decode()
+        for r in [
+            {"id": "a", "text_chunk": "one", "metadata": {"url": "x"}},
+            {"id": "b", "text_chunk": "one", "metadata": {"url": "y"}},
+            {"id": "a", "text_chunk": "two", "metadata": {"url": "y"}},
+        ]
+    )
+    assert [d["text_chunk"] for d in _run("--key", "id", input=records)] == [
+        "one",
+        "one",
+    ]
+    by_url = _run("--expr", "{{ metadata.url }}", "--bloom", input=records)
+    assert [d["id"] for d in by_url] == ["a", "b"]
+
+
+def test_dedup_cli_exact_index_file() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, mode in (("exact", []), ("bloom", ["--bloom"])):
+            args = [*mode, "--index-file", os.path.join(tmp, f"{name}.npz")]
+            assert len(_run(*args, input=_records(_TEXTS[:2]))) == 2
+            second = _run(*args, input=_records(_TEXTS))
+            assert [d["id"] for d in second] == ["2", "3", "4"]
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import uvicorn
+from chromadb import Documents, EmbeddingFunction, Embeddings
+from fastapi.testclient import TestClient
+
+from chroma_dp.processor.embed_server import ResidentModels, create_app
+from chroma_dp.utils.embedding_server import (
+    EmbedServerEmbeddingFunction,
+    create_embed_server_client,
+)
+
+
+class LengthEmbeddingFunction(EmbeddingFunction[Documents]):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self.calls += 1
+        return [[float(len(t)), 1.0] for t in input]
+
+
+def _models(**kwargs) -> ResidentModels:
+    ef = LengthEmbeddingFunction()
+    models = ResidentModels(factory=lambda name, model=None: ef, **kwargs)
+    models.ef = ef  # type: ignore
+    return models
+
+
+def test_micro_batching_across_clients() -> None:
+    models = _models(max_wait=0.2)
+    client = TestClient(create_app(models))
+    ef = EmbedServerEmbeddingFunction(client=client)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(lambda i: ef(["x" * i, "y" * (i + 1)]), range(1, 9))
+        )
+    assert results == [[[float(i), 1.0], [float(i + 1), 1.0]] for i in range(1, 9)]
+    assert models.ef.calls < 8  # type: ignore
+    assert client.get("/api/v1/health").json()["models"] == ["default:"]
+
+
+def test_remote_local_rejected() -> None:
+    client = TestClient(create_app(_models()))
+    resp = client.post(
+        "/api/v1/embed", json={"input": ["a"], "ef": "remote-local", "model": None}
+    )
+    assert resp.status_code == 400
+
+
+def test_unix_socket() -> None:
+    with tempfile.TemporaryDirectory() as tdir:
+        sock = os.path.join(tdir, "cdp.sock")
+        server = uvicorn.Server(
+            uvicorn.Config(create_app(_models()), uds=sock, log_level="warning")
+        )
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        try:
+            for _ in range(100):
+                if server.started:
+                    break
+                time.sleep(0.05)
+            ef = EmbedServerEmbeddingFunction(url=f"unix://{sock}")
+            assert ef(["abc"]) == [[3.0, 1.0]]
+        finally:
+            server.should_exit = True
+            thread.join()
+    with pytest.raises(ValueError):
+        EmbedServerEmbeddingFunction(
+            client=create_embed_server_client(f"unix://{sock}")
+        )(["abc"])
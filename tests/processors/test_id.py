@@ -0,0 +1,87 @@
+import hashlib
+import subprocess
+
+import orjson as json
+import pytest
+
+from chroma_dp import EmbeddableTextResource
+from chroma_dp.processor.id import (
+    ContentHashStrategy,
+    HashAlgorithm,
+    RandomHashStrategy,
+)
+
+cdp_cmd_args = ["python", "-m", "chroma_dp.main"]
+
+
+def _docs() -> list:
+    return [
+        EmbeddableTextResource(
+            id=None, text_chunk=text, metadata={"source": source}, embedding=None
+        )
+        for text, source in [("a", "x.txt"), ("b", "x.txt"), ("a", "y.txt")]
+    ]
+
+
+def _run(*args: str, docs: list) -> list:
+    result = subprocess.run(
+        [*cdp_cmd_args, "id", *args],
+        input="\n".join(json.dumps(d.model_dump()).decode() for d in docs),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return [json.loads(line)["id"] for line in result.stdout.splitlines()]
+
+
+def test_doc_hash_is_content_addressed() -> None:
+    docs = _docs()
+    ids = _run("--doc-hash", docs=docs)
+    assert ids[0] == hashlib.sha256(b"a").hexdigest()
+    # each document is hashed independently of the ones before it
+    assert ids[0] == ids[2]
+    assert _run("--doc-hash", docs=docs[1:2]) == ids[1:2]
+
+
+def test_doc_hash_fields_and_algorithms() -> None:
+    docs = _docs()
+    ids = _run(
+        "--doc-hash",
+        "--hash-field",
+        "text",
+        "--hash-field",
+        "metadata.source",
+        "--hash-algorithm",
+        "xxhash",
+        "--digest-size",
+        "16",
+        docs=docs,
+    )
+    assert len(set(ids)) == 3
+    assert all(len(i) == 32 for i in ids)
+    blake = ContentHashStrategy(
+        fields=["metadata.source"], algorithm=HashAlgorithm.blake2b, digest_size=4
+    ).generate_ids(docs)
+    assert blake[0] == blake[1] != blake[2]
+    assert len(blake[0]) == 8
+
+
+def test_content_hash_errors() -> None:
+    with pytest.raises(ValueError):
+        ContentHashStrategy(fields=["embedding"])
+    with pytest.raises(ValueError):
+        ContentHashStrategy(algorithm=HashAlgorithm.xxhash, digest_size=4)
+    doc = EmbeddableTextResource(id="1", text_chunk=None, metadata=None, embedding=None)
+    with pytest.raises(ValueError):
+        ContentHashStrategy().generate_ids([doc])
+
+
+def test_random_hash_is_unique() -> None:
+    strategy = RandomHashStrategy()
+    assert len(set(strategy.generate_ids(_docs()))) == 3
+
+
+def test_expr_id() -> None:
+    ids = _run("--expr", "{{ metadata.source }}-{{ ulid() }}", docs=_docs())
+    assert [i.split("-")[0] for i in ids] == ["x.txt", "x.txt", "y.txt"]
+    assert len(set(ids)) == 3
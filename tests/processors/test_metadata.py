@@ -2,9 +2,12 @@ import subprocess
 import tempfile
 import time
 
+import numpy as np
 import orjson as json
 
 from chroma_dp import EmbeddableTextResource
+from chroma_dp.processor.metadata import MetadataProcessor, process_value
+from chroma_dp.utils.expressions import compile_expression
 
 cdp_cmd_args = ["python", "-m", "chroma_dp.main"]
 
@@ -125,3 +128,78 @@ def test_meta_process_add_metadata_template_stdin() -> None:
         assert "date_key" in doc.metadata
         end_time = time.time()
         assert start_time <= float(doc.metadata["date_key"]) <= end_time
+
+
+class _NoListEmbedding(np.ndarray):
+    def tolist(self) -> list:  # type: ignore
+        raise AssertionError("the embedding was converted to a list")
+
+
+def test_metadata_processor_templates_share_context() -> None:
+    doc = EmbeddableTextResource(
+        id="test_id",
+        text_chunk="test_text",
+        metadata={"n": 2},
+        embedding=np.ones(3, dtype=np.float32).view(_NoListEmbedding),
+    )
+    processor = MetadataProcessor(
+        metadata={
+            "double": process_value("{{ metadata.n * 2 }}"),
+            "length": process_value("{{ text_chunk | length }}"),
+            # sees the values rendered before it
+            "sum": process_value("{{ metadata.double + metadata.length }}"),
+        }
+    )
+    (result,) = processor.process(documents=[doc])
+    assert result.metadata == {"n": 2, "double": 4, "length": 9, "sum": 13}
+
+
+def test_meta_process_expressions() -> None:
+    docs = [
+        EmbeddableTextResource(
+            id="1", text_chunk="one two", metadata={"n": "4"}, embedding=None
+        ),
+        EmbeddableTextResource(id="2", text_chunk="", metadata=None, embedding=None),
+    ]
+    result = subprocess.run(
+        [
+            *cdp_cmd_args,
+            "meta",
+            "-e",
+            "words=words(text_chunk)",
+            "-e",
+            "half=int(metadata.n) / 2",
+            "-e",
+            "big=coalesce(metadata.half, 0) >= 2",
+        ],
+        input="\n".join(json.dumps(d.model_dump()).decode() for d in docs),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    metadata = [json.loads(line)["metadata"] for line in result.stdout.splitlines()]
+    assert metadata == [
+        {"n": "4", "words": 2, "half": 2.0, "big": True},
+        {"words": 0, "big": False},
+    ]
+
+
+def test_metadata_processor_expression_errors(capsys) -> None:
+    docs = [
+        EmbeddableTextResource(
+            id=f"{i}", text_chunk="", metadata={"b": b}, embedding=None
+        )
+        for i, b in enumerate([2, 0, "x", 0])
+    ]
+    processor = MetadataProcessor(
+        expressions={"r": compile_expression("10 / metadata.b")}
+    )
+    # a failing record does not stop the stream, its key is left unset
+    assert [d.metadata.get("r") for d in processor.process(documents=docs)] == [
+        5.0,
+        None,
+        None,
+        None,
+    ]
+    # only the first failure is reported
+    assert capsys.readouterr().err.count("Cannot evaluate r") == 1
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+import orjson as json
+
+from chroma_dp.processor.misc.quantize import dequantize_int8, quantize_int8
+
+cdp_cmd_args = ["python", "-m", "chroma_dp.main"]
+
+
+def _records(count: int = 50, dim: int = 16) -> str:
+    rng = np.random.default_rng(42)
+    return "\n".join(
+        json.dumps(
+            {
+                "id": f"{i}",
+                "text_chunk": f"doc {i}",
+                "metadata": {"i": i},
+                "embedding": rng.normal(size=dim).tolist(),
+            }
+        ).decode()
+        for i in range(count)
+    )
+
+
+def _run(*args: str, input: str) -> list:
+    result = subprocess.run(
+        [*cdp_cmd_args, "tx", "quantize", *args],
+        input=input,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return [json.loads(line) for line in result.stdout.splitlines()]
+
+
+def test_int8_roundtrip() -> None:
+    x = np.random.default_rng(0).normal(size=(10, 32)).astype(np.float32)
+    codes, scale, offset = quantize_int8(x)
+    assert codes.dtype == np.int8
+    assert np.abs(dequantize_int8(codes, scale, offset) - x).max() <= scale.max()
+
+
+def test_quantize_cli() -> None:
+    records = _records()
+    original = [json.loads(line) for line in records.splitlines()]
+
+    int8 = _run("--type", "int8", "--batch-size", "7", input=records)
+    assert [r["id"] for r in int8] == [r["id"] for r in original]
+    assert all(isinstance(v, int) for v in int8[0]["embedding"])
+    assert "quantization_scale" in int8[0]["metadata"]
+    restored = _run(
+        "--type",
+        "dequantize",
+        input="\n".join(json.dumps(r).decode() for r in int8),
+    )
+    assert restored[0]["metadata"] == {"i": 0}
+    assert np.allclose(restored[0]["embedding"], original[0]["embedding"], atol=0.05)
+    # the offset is optional
+    without_offset = {**int8[0], "metadata": {"quantization_scale": 0.5}}
+    restored = _run("--type", "dequantize", input=json.dumps(without_offset).decode())
+    assert restored[0]["embedding"] == [(c + 128) * 0.5 for c in int8[0]["embedding"]]
+
+    truncated = _run("--type", "truncate", "--dim", "4", input=records)
+    assert len(truncated[0]["embedding"]) == 4
+    assert np.isclose(np.linalg.norm(truncated[0]["embedding"]), 1.0, atol=1e-5)
+
+    float16 = _run("--type", "float16", input=records)
+    assert np.allclose(float16[0]["embedding"], original[0]["embedding"], atol=1e-2)
+
+
+def test_quantize_pca_persisted() -> None:
+    records = _records()
+    with tempfile.TemporaryDirectory() as tdir:
+        pca_file = os.path.join(tdir, "pca.npz")
+        fitted = _run(
+            "--type",
+            "pca",
+            "--dim",
+            "8",
+            "--pca-file",
+            pca_file,
+            "--sample-size",
+            "20",
+            input=records,
+        )
+        assert os.path.exists(pca_file)
+        assert len(fitted) == 50 and len(fitted[0]["embedding"]) == 8
+        # the persisted PCA is reused, no dimension needed
+        reused = _run("--type", "pca", "--pca-file", pca_file, input=records)
+        assert np.allclose(reused[0]["embedding"], fitted[0]["embedding"], atol=1e-5)
@@ -0,0 +1,100 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from chroma_dp.utils.batch_planner import (
+    OverflowPolicy,
+    RequestLimits,
+    RequestPlanner,
+    get_provider_limits,
+    pool_embeddings,
+)
+from chroma_dp.utils.tokenizer import HeuristicTokenCounter, get_token_counter
+
+
+def _batches(texts, size=3):
+    for i in range(0, len(texts), size):
+        yield {
+            "documents": texts[i : i + size],
+            "ids": [f"{j}" for j in range(i, min(i + size, len(texts)))],
+        }
+
+
+def test_planner_packs_by_tokens_and_inputs() -> None:
+    # 4 chars per token, so "a" * 40 is 10 tokens
+    texts = ["a" * 40] * 5 + ["b" * 4] * 6
+    planner = RequestPlanner(
+        RequestLimits(max_inputs=4, max_tokens=25), HeuristicTokenCounter()
+    )
+    requests = list(planner.plan(_batches(texts)))
+    assert [r["inputs"] for r in requests] == [
+        ["a" * 40] * 2,
+        ["a" * 40] * 2,
+        ["a" * 40, "b" * 4, "b" * 4, "b" * 4],
+        ["b" * 4] * 3,
+    ]
+    assert [i for r in requests for i in r["ids"]] == [f"{i}" for i in range(11)]
+    assert planner.requests == 4
+
+
+def test_planner_overflow_policies() -> None:
+    text = "word " * 20  # 25 tokens
+    limits = RequestLimits(max_inputs=10, max_input_tokens=10)
+    counter = HeuristicTokenCounter()
+    truncated = list(
+        RequestPlanner(limits, counter, OverflowPolicy.truncate).plan(_batches([text]))
+    )
+    assert truncated[0]["documents"] == [text]
+    assert len(truncated[0]["inputs"]) == 1
+    assert text.startswith(truncated[0]["inputs"][0])
+
+    split = list(
+        RequestPlanner(limits, counter, OverflowPolicy.split).plan(
+            _batches([text, "short"])
+        )
+    )
+    assert "".join(split[0]["inputs"][:-1]) == text
+    assert split[0]["spans"] == [(0, 3), (3, 4)]
+
+    with pytest.raises(ValueError):
+        list(
+            RequestPlanner(limits, counter, OverflowPolicy.error).plan(_batches([text]))
+        )
+
+
+def test_pool_embeddings() -> None:
+    pooled = pool_embeddings(
+        [[1.0, 0.0], [0.0, 1.0], [0.5, 0.5]], [(0, 2), (2, 3)], [1, 1, 1]
+    )
+    assert np.allclose(pooled[0], [np.sqrt(0.5), np.sqrt(0.5)])
+    assert pooled[1] == [0.5, 0.5]
+
+
+def test_provider_limits_overrides() -> None:
+    limits = get_provider_limits("openai", max_tokens=1000)
+    assert limits.max_inputs == 2048
+    assert limits.max_tokens == 1000
+    assert get_provider_limits(None).max_inputs == 100
+
+
+def test_hf_token_counter() -> None:
+    from tokenizers import Tokenizer
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+
+    tokenizer = Tokenizer(
+        WordLevel({"[UNK]": 0, "hello": 1, "world": 2}, unk_token="[UNK]")
+    )
+    tokenizer.pre_tokenizer = Whitespace()
+    with tempfile.TemporaryDirectory() as tdir:
+        path = os.path.join(tdir, "tokenizer.json")
+        tokenizer.save(path)
+        counter = get_token_counter(path)
+        assert get_token_counter(path) is counter
+        assert counter.count_many(["hello world", "hello  big world !"]) == [2, 4]
+        text = "hello world foo bar baz"
+        pieces = counter.split(text, 2)
+        assert pieces == ["hello world ", "foo bar ", "baz"]
+        assert "".join(pieces) == text
@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+import pytest
+
+from chroma_dp.utils import smart_open
+from chroma_dp.utils.compression import Compression, get_compression_for_filename
+
+
+def test_get_compression_for_filename() -> None:
+    assert get_compression_for_filename("dump.jsonl.gz") == Compression.gzip
+    assert get_compression_for_filename("dump.jsonl.zst") == Compression.zstd
+    assert get_compression_for_filename("dump.jsonl.LZ4") == Compression.lz4
+    assert get_compression_for_filename("dump.jsonl") is None
+
+
+@pytest.mark.parametrize("ext", ["gz", "zst", "lz4"])
+def test_smart_open_compressed_roundtrip(ext: str) -> None:
+    if ext == "zst":
+        pytest.importorskip("zstandard")
+    if ext == "lz4":
+        pytest.importorskip("lz4")
+    lines = [f'{{"id": "{i}", "text_chunk": "{"x" * i}"}}\n' for i in range(5000)]
+    with tempfile.TemporaryDirectory() as tdir:
+        path = os.path.join(tdir, f"dump.jsonl.{ext}")
+        with smart_open(path, mode="w") as f:
+            for line in lines[:2500]:
+                f.write(line)
+        with smart_open(path, mode="a") as f:
+            for line in lines[2500:]:
+                f.write(line)
+        with open(path, "rb") as f:
+            assert not f.read().startswith(b'{"id"')
+        with smart_open(path) as f:
+            assert list(f) == lines
+
+
+def test_smart_open_compressed_early_close() -> None:
+    with tempfile.TemporaryDirectory() as tdir:
+        path = os.path.join(tdir, "dump.jsonl.gz")
+        with smart_open(path, mode="w") as f:
+            for i in range(100000):
+                f.write(f"{i}\n")
+        with smart_open(path) as f:
+            for i, line in enumerate(f):
+                if i == 10:
+                    break
+        assert line == "10\n"
@@ -0,0 +1,130 @@
+import os
+import tempfile
+from typing import List
+
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+from chroma_dp.utils.embedding_cache import (
+    CachedEmbeddingFunction,
+    DedupEmbeddingFunction,
+    EmbeddingCache,
+)
+
+
+class CountingEmbeddingFunction(EmbeddingFunction[Documents]):
+    def __init__(self) -> None:
+        self.calls: List[str] = []
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self.calls.extend(input)
+        return [[float(len(t)), 1.0, 2.0] for t in input]
+
+
+def test_cached_embedding_function() -> None:
+    with tempfile.TemporaryDirectory() as tdir:
+        path = os.path.join(tdir, "cache.sqlite3")
+        ef = CountingEmbeddingFunction()
+        cached_ef = CachedEmbeddingFunction(
+            ef, cache=EmbeddingCache(path), namespace="test:model"
+        )
+        assert cached_ef(["a", "bb", "a"]) == [
+            [1.0, 1.0, 2.0],
+            [2.0, 1.0, 2.0],
+            [1.0, 1.0, 2.0],
+        ]
+        assert ef.calls == ["a", "bb"]
+        assert cached_ef(["bb", "ccc"]) == [[2.0, 1.0, 2.0], [3.0, 1.0, 2.0]]
+        assert ef.calls == ["a", "bb", "ccc"]
+        assert cached_ef.stats() == {"hits": 1, "misses": 4}
+
+        # persisted across instances, but keyed by namespace
+        ef = CountingEmbeddingFunction()
+        cached_ef = CachedEmbeddingFunction(
+            ef, cache=EmbeddingCache(path), namespace="test:model"
+        )
+        cached_ef(["a", "bb", "ccc"])
+        assert ef.calls == []
+        other_ef = CachedEmbeddingFunction(
+            ef, cache=EmbeddingCache(path), namespace="test:other-model"
+        )
+        other_ef(["a"])
+        assert ef.calls == ["a"]
+
+
+def test_embedding_cache_lru_eviction() -> None:
+    with tempfile.TemporaryDirectory() as tdir:
+        cache = EmbeddingCache(os.path.join(tdir, "cache.sqlite3"), max_entries=10)
+        ef = CachedEmbeddingFunction(
+            CountingEmbeddingFunction(), cache=cache, namespace="test"
+        )
+        ef([f"{i}" for i in range(10)])
+        # touch the oldest entry so that it survives the eviction
+        ef(["0"])
+        ef(["new"])
+        assert len(cache) <= 10
+        before = cache.hits
+        ef(["0", "new"])
+        assert cache.hits == before + 2
+
+
+def test_dedup_embedding_function() -> None:
+    ef = CountingEmbeddingFunction()
+    dedup_ef = DedupEmbeddingFunction(ef, window=2)
+    assert dedup_ef(["a", "bb", "a", "a"]) == [
+        [1.0, 1.0, 2.0],
+        [2.0, 1.0, 2.0],
+        [1.0, 1.0, 2.0],
+        [1.0, 1.0, 2.0],
+    ]
+    assert ef.calls == ["a", "bb"]
+    # "a" and "bb" are still in the window, "ccc" evicts "a"
+    dedup_ef(["bb", "ccc", "ccc"])
+    assert ef.calls == ["a", "bb", "ccc"]
+    dedup_ef(["a"])
+    assert ef.calls == ["a", "bb", "ccc", "a"]
+    assert dedup_ef.stats() == {"texts": 8, "embedded": 4, "saved": 4}
+
+
+def test_remote_local_cache_namespace(monkeypatch) -> None:
+    from chroma_dp.utils.embedding import (
+        SupportedEmbeddingFunctions,
+        get_embedding_function_for_name,
+    )
+
+    def namespace(**env: str) -> str:
+        for var in ("CDP_EMBED_SERVER_EF", "CDP_EMBED_SERVER_MODEL"):
+            monkeypatch.delenv(var, raising=False)
+        for var, value in env.items():
+            monkeypatch.setenv(var, value)
+        with tempfile.TemporaryDirectory() as tmp:
+            ef = get_embedding_function_for_name(
+                SupportedEmbeddingFunctions.remote_local,
+                cache_path=os.path.join(tmp, "cache.db"),
+            )
+            return ef.namespace  # type: ignore
+
+    namespaces = {
+        namespace(),
+        namespace(CDP_EMBED_SERVER_EF="default"),
+        namespace(CDP_EMBED_SERVER_EF="st"),
+        namespace(CDP_EMBED_SERVER_EF="st", CDP_EMBED_SERVER_MODEL="all-mpnet-base-v2"),
+    }
+    assert len(namespaces) == 4
+
+
+def test_st_cache_namespace(monkeypatch) -> None:
+    from chroma_dp.utils.embedding import (
+        SupportedEmbeddingFunctions,
+        _resolve_embedding_function,
+    )
+
+    def resolve(normalize: str):
+        monkeypatch.setenv("ST_NORMALIZE", normalize)
+        return _resolve_embedding_function(
+            SupportedEmbeddingFunctions.st, model="all-MiniLM-L6-v2"
+        )
+
+    (normalized_factory, normalized, _), (_, raw, _) = resolve("True"), resolve("False")
+    assert normalized != raw
+    # the model itself is unchanged
+    assert normalized_factory.keywords["model_name"] == "all-MiniLM-L6-v2"
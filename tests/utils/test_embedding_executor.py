@@ -0,0 +1,252 @@
+import os
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import orjson as json
+import pytest
+
+from chroma_dp.utils.embedding import (
+    SupportedEmbeddingFunctions,
+    get_embedding_function_for_name,
+)
+from chroma_dp.utils.embedding_executor import (
+    EmbeddingExecutor,
+    LengthBucketedEmbeddingFunction,
+    RateLimitedEmbeddingFunction,
+    TokenBucket,
+)
+
+cdp_cmd_args = ["python", "-m", "chroma_dp.main"]
+
+
+class _StubState:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.failed: Dict[str, int] = {}
+
+
+def _make_handler(state: _StubState) -> type:
+    class OllamaStubHandler(BaseHTTPRequestHandler):
+        """Mimics Ollama's /api/embeddings. Prompts starting with `fail` fail once."""
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = body["prompt"]
+            with state.lock:
+                state.requests += 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                fail = prompt.startswith("fail") and prompt not in state.failed
+                if fail:
+                    state.failed[prompt] = 1
+            time.sleep(0.02)
+            with state.lock:
+                state.in_flight -= 1
+            if fail:
+                self.send_response(500)
+                response = {"error": "server error"}
+            else:
+                self.send_response(200)
+                response = {"embedding": [float(len(prompt)), 1.0]}
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(response))
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    return OllamaStubHandler
+
+
+@pytest.fixture
+def ollama_stub() -> Iterator[Tuple[str, _StubState]]:
+    state = _StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/embeddings", state
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_embedding_preserves_order(
+    ollama_stub: Tuple[str, _StubState], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    url, state = ollama_stub
+    monkeypatch.setenv("OLLAMA_EMBED_URL", url)
+    ef = get_embedding_function_for_name(
+        SupportedEmbeddingFunctions.ollama, max_retries=3
+    )
+    assert isinstance(ef, RateLimitedEmbeddingFunction)
+    # fast retries for the test
+    ef = RateLimitedEmbeddingFunction(ef._ef, retry_min_wait=0.01, retry_max_wait=0.05)
+    batches = [{"documents": ["x" * (i + 1), "fail" + "y" * i]} for i in range(16)]
+    results = list(EmbeddingExecutor(ef, max_in_flight=4).map(iter(batches)))
+    assert [r["documents"] for r in results] == [b["documents"] for b in batches]
+    for i, r in enumerate(results):
+        assert r["embeddings"] == [[float(i + 1), 1.0], [float(4 + i), 1.0]]
+    assert state.max_in_flight > 1
+    # every batch failed once and was retried as a whole
+    assert state.requests == 16 * 2 * 2
+
+
+def test_length_bucketed_embedding_function() -> None:
+    calls = []
+
+    def ef(input):
+        calls.append(list(input))
+        return [[float(len(t))] for t in input]
+
+    texts = ["aaaa", "b", "ccc", "dd", "eeeeee", "f"]
+    bucketed = LengthBucketedEmbeddingFunction(ef, batch_size=2)
+    assert bucketed(texts) == [[float(len(t))] for t in texts]
+    assert calls == [["b", "f"], ["dd", "ccc"], ["aaaa", "eeeeee"]]
+
+
+def test_token_bucket() -> None:
+    bucket = TokenBucket(rate_per_minute=600)  # 10/s
+    for _ in range(600):
+        bucket.acquire()
+    start = time.monotonic()
+    bucket.acquire(5)
+    assert time.monotonic() - start >= 0.4
+
+
+def test_embed_cli_max_in_flight(ollama_stub: Tuple[str, _StubState]) -> None:
+    url, state = ollama_stub
+    docs = [
+        json.dumps(
+            {
+                "id": f"{i}",
+                "text_chunk": "z" * i,
+                "metadata": {"i": i},
+                "embedding": None,
+            }
+        ).decode()
+        for i in range(1, 41)
+    ]
+    result = subprocess.run(
+        [
+            *cdp_cmd_args,
+            "embed",
+            "--ef",
+            "ollama",
+            "--batch-size",
+            "5",
+            "--max-in-flight",
+            "4",
+        ],
+        input="\n".join(docs) + "\n",
+        capture_output=True,
+        text=True,
+        env={**os.environ, "OLLAMA_EMBED_URL": url},
+    )
+    assert result.returncode == 0, result.stderr
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [line["id"] for line in lines] == [f"{i}" for i in range(1, 41)]
+    assert all(line["embedding"] == [float(int(line["id"])), 1.0] for line in lines)
+    assert state.max_in_flight > 1
+
+
+def test_embed_cli_packs_requests_by_tokens(
+    ollama_stub: Tuple[str, _StubState]
+) -> None:
+    url, _ = ollama_stub
+    # 10 heuristic tokens each
+    docs = [
+        json.dumps(
+            {"id": f"{i}", "text_chunk": "z" * 40, "metadata": None, "embedding": None}
+        ).decode()
+        for i in range(10)
+    ]
+    result = subprocess.run(
+        [*cdp_cmd_args, "embed", "--ef", "ollama", "--max-tokens", "30"],
+        input="\n".join(docs) + "\n",
+        capture_output=True,
+        text=True,
+        env={**os.environ, "OLLAMA_EMBED_URL": url},
+    )
+    assert result.returncode == 0, result.stderr
+    assert len(result.stdout.splitlines()) == 10
+    assert "Embedding requests: 4." in result.stderr
+
+
+def test_embed_cli_dedup(ollama_stub: Tuple[str, _StubState]) -> None:
+    url, state = ollama_stub
+    docs = [
+        json.dumps(
+            {"id": f"{i}", "text_chunk": f"footer {i % 3}", "embedding": None}
+        ).decode()
+        for i in range(30)
+    ]
+    result = subprocess.run(
+        [
+            *cdp_cmd_args,
+            "embed",
+            "--ef",
+            "ollama",
+            "--batch-size",
+            "4",
+            "--dedup-window",
+            "100",
+        ],
+        input="\n".join(docs) + "\n",
+        capture_output=True,
+        text=True,
+        env={**os.environ, "OLLAMA_EMBED_URL": url},
+    )
+    assert result.returncode == 0, result.stderr
+    assert len(result.stdout.splitlines()) == 30
+    assert state.requests == 3
+    assert "embedded 3 of 30 texts, 27 embeddings saved" in result.stderr
+
+
+def test_embed_cli_only_missing(ollama_stub: Tuple[str, _StubState]) -> None:
+    url, state = ollama_stub
+
+    def _embedding(i: int) -> Optional[List[float]]:
+        if i % 4 == 0:
+            return None
+        if i % 12 == 2:
+            return [1.0, 2.0, 3.0]  # wrong dimension, re-embedded
+        return [9.0, 9.0]
+
+    docs = [
+        json.dumps(
+            {"id": f"{i}", "text_chunk": "z" * i, "embedding": _embedding(i)}
+        ).decode()
+        for i in range(60)
+    ]
+    result = subprocess.run(
+        [
+            *cdp_cmd_args,
+            "embed",
+            "--ef",
+            "ollama",
+            "--batch-size",
+            "2",
+            "--max-in-flight",
+            "2",
+            "--only-missing",
+        ],
+        input="\n".join(docs) + "\n",
+        capture_output=True,
+        text=True,
+        env={**os.environ, "OLLAMA_EMBED_URL": url},
+    )
+    assert result.returncode == 0, result.stderr
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [line["id"] for line in lines] == [f"{i}" for i in range(60)]
+    for i, line in enumerate(lines):
+        if _embedding(i) == [9.0, 9.0]:
+            assert line["embedding"] == [9.0, 9.0]
+        else:
+            assert line["embedding"] == [float(i), 1.0]
+    # 15 missing, 5 of the wrong dimension and the dimension probe
+    assert state.requests == 21
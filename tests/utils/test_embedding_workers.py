@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+from chroma_dp.utils.embedding_workers import MultiProcessEmbeddingFunction
+
+
+class PidEmbeddingFunction(EmbeddingFunction[Documents]):
+    def __init__(self, threads: int) -> None:
+        self.threads = threads
+
+    def __call__(self, input: Documents) -> Embeddings:
+        if any(t == "boom" for t in input):
+            raise ValueError("boom")
+        return [[float(len(t)), float(os.getpid()), float(self.threads)] for t in input]
+
+
+def _factory(threads: int) -> EmbeddingFunction:
+    return PidEmbeddingFunction(threads)
+
+
+def test_multi_process_embedding_function() -> None:
+    ef = MultiProcessEmbeddingFunction(_factory, workers=2, threads_per_worker=3)
+    try:
+        texts = [f"{'x' * i} ünïcode" for i in range(10)]
+        embeddings = ef(texts)
+        assert [e[0] for e in embeddings] == [float(len(t)) for t in texts]
+        assert len({e[1] for e in embeddings}) == 2
+        assert all(e[2] == 3.0 for e in embeddings)
+        # inputs and outputs larger than the initial shared memory buffers
+        big = ["y" * 100_000] * 30 + ["z"] * 200_000
+        embeddings = ef(big)
+        assert len(embeddings) == len(big)
+        assert embeddings[0][0] == 100_000.0 and embeddings[-1][0] == 1.0
+        with pytest.raises(RuntimeError):
+            ef(["ok", "boom"])
+        # workers keep serving after a failure
+        assert ef(["abc"])[0][0] == 3.0
+    finally:
+        ef.close()
+
+
+def test_multi_process_embedding_function_concurrent_calls() -> None:
+    ef = MultiProcessEmbeddingFunction(_factory, workers=2, threads_per_worker=1)
+    try:
+        batches = [[f"{'x' * (i + j)}" for j in range(i % 5 + 1)] for i in range(40)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(ef, batches))
+        for batch, embeddings in zip(batches, results):
+            assert [e[0] for e in embeddings] == [float(len(t)) for t in batch]
+    finally:
+        ef.close()
@@ -0,0 +1,63 @@
+from typing import Any
+
+import pytest
+
+from chroma_dp import EmbeddableTextResource
+from chroma_dp.utils.expressions import compile_expression
+
+_DOC = EmbeddableTextResource(
+    id="doc-1",
+    text_chunk="Hello big world",
+    metadata={"price": "12.5", "qty": 3, "published": "2024-01-02T03:04:05Z"},
+    embedding=None,
+)
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ("len(text_chunk)", 15),
+        ("words(text_chunk)", 3),
+        ("tokens(text_chunk)", 4),
+        ("float(metadata.price) * metadata.qty", 37.5),
+        ("metadata['qty'] // 2 + 1", 2),
+        ("date(metadata.published)", 1704164645),
+        ("date('02/01/2024', '%d/%m/%Y')", 1704153600),
+        ("coalesce(metadata.missing, metadata.qty)", 3),
+        ("metadata.missing + 1", None),
+        ("int('not a number')", None),
+        ("upper(text_chunk[:5])", "HELLO"),
+        ("'big' in lower(text_chunk) and metadata.qty > 2", True),
+        ("1 < metadata.qty <= 2", False),
+        ("concat(id, '-', metadata.qty, metadata.missing)", "doc-1-3"),
+        ("'many' if metadata.qty > 2 else 'few'", "many"),
+        ("not metadata.missing", None),
+        ("not metadata.qty", False),
+        ("metadata.qty ** 2", 9),
+        ("10 ** 10 ** 10", None),
+        ("(-8) ** 0.5", None),
+        ("text_chunk * 10 ** 9", None),
+        ("10 ** 9 * id", None),
+        ("lower(text_chunk[:2]) * 2", "hehe"),
+    ],
+)
+def test_expressions(source: str, expected: Any) -> None:
+    value = compile_expression(source)(_DOC)
+    assert value == expected
+    assert type(value) is type(expected)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "__import__('os')",
+        "text_chunk.upper()",
+        "[1, 2]",
+        "lambda: 1",
+        "embedding",
+        "len(text_chunk",
+    ],
+)
+def test_invalid_expressions(source: str) -> None:
+    with pytest.raises(ValueError):
+        compile_expression(source)
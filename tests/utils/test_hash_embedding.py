@@ -0,0 +1,59 @@
+import os
+import subprocess
+
+import numpy as np
+import orjson as json
+
+from chroma_dp.utils.embedding import (
+    SupportedEmbeddingFunctions,
+    get_embedding_function_for_name,
+)
+from chroma_dp.utils.hash_embedding import HashEmbeddingFunction
+
+cdp_cmd_args = ["python", "-m", "chroma_dp.main"]
+
+
+def test_hash_embedding_function() -> None:
+    ef = HashEmbeddingFunction(dimension=64)
+    texts = ["hello", "world", "", "hello", "héllo wörld " * 100]
+    embeddings = np.asarray(ef(texts))
+    assert embeddings.shape == (5, 64)
+    assert np.allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-5)
+    assert np.array_equal(embeddings[0], embeddings[3])
+    assert not np.array_equal(embeddings[0], embeddings[1])
+    # deterministic across instances
+    assert np.array_equal(HashEmbeddingFunction(dimension=64).embed(texts), embeddings)
+
+
+def test_hash_embedding_dimension_from_env(monkeypatch) -> None:
+    monkeypatch.setenv("CDP_HASH_EMBEDDING_DIM", "16")
+    ef = get_embedding_function_for_name(SupportedEmbeddingFunctions.hash)
+    assert len(ef(["text"])[0]) == 16
+
+
+def test_embed_cli_hash() -> None:
+    records = "\n".join(
+        json.dumps(
+            {
+                "id": f"{i}",
+                "text_chunk": f"chunk {i}",
+                "metadata": {},
+                "embedding": None,
+            }
+        ).decode()
+        for i in range(10)
+    )
+    env = {**os.environ, "CDP_HASH_EMBEDDING_DIM": "32"}
+    outputs = []
+    for _ in range(2):
+        result = subprocess.run(
+            [*cdp_cmd_args, "embed", "--ef", "hash"],
+            input=records,
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        assert result.returncode == 0, result.stderr
+        outputs.append([json.loads(line) for line in result.stdout.splitlines()])
+    assert [len(d["embedding"]) for d in outputs[0]] == [32] * 10
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,117 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from chroma_dp.processor.embed_bench import benchmark_configurations
+from chroma_dp.utils import onnx
+from chroma_dp.utils.embedding import (
+    SupportedEmbeddingFunctions,
+    get_embedding_function_for_name,
+)
+from chroma_dp.utils.hash_embedding import HashEmbeddingFunction
+from chroma_dp.utils.onnx import DynamicPaddingONNXMiniLM_L6_V2
+
+
+class FakeSession:
+    """Stands in for the ONNX model - the hidden state of a token depends only on the token (and is 0 for [PAD])."""
+
+    def run(self, _, inputs):
+        ids = inputs["input_ids"].astype(np.float32)
+        return [np.stack([ids, ids * ids, np.ones_like(ids) * (ids > 0)], axis=-1)]
+
+
+def _tokenizer(length=None) -> Tokenizer:
+    vocab = {"[PAD]": 0, "[UNK]": 1, **{w: i + 2 for i, w in enumerate("abcdefgh")}}
+    tokenizer = Tokenizer(WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.enable_truncation(max_length=256)
+    if length is None:
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+    else:
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]", length=length)
+    return tokenizer
+
+
+def test_dynamic_padding_matches_fixed_padding() -> None:
+    fixed = ONNXMiniLM_L6_V2()
+    fixed.__dict__["tokenizer"] = _tokenizer(length=256)
+    fixed.__dict__["model"] = FakeSession()
+    dynamic = DynamicPaddingONNXMiniLM_L6_V2()
+    dynamic.__dict__["tokenizer"] = _tokenizer()
+    dynamic.__dict__["model"] = FakeSession()
+    docs = ["a", "a b c d e f g h", "h g", "c c c", "b"]
+    assert np.allclose(fixed._forward(docs, 2), dynamic._forward(docs, 2))
+
+
+def test_session_options_and_batch_size(monkeypatch) -> None:
+    monkeypatch.setenv("ONNX_INTER_OP_THREADS", "2")
+    monkeypatch.setenv("ONNX_GRAPH_OPTIMIZATION", "basic")
+    monkeypatch.setenv("ONNX_BATCH_SIZE", "2")
+    ef = get_embedding_function_for_name(SupportedEmbeddingFunctions.default)
+    so = ef._session_options()
+    assert so.inter_op_num_threads == 2
+    assert so.graph_optimization_level == ef.ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    calls = []
+
+    class CountingSession(FakeSession):
+        def run(self, _, inputs):
+            calls.append(len(inputs["input_ids"]))
+            return super().run(_, inputs)
+
+    ef.__dict__["tokenizer"] = _tokenizer()
+    ef.__dict__["model"] = CountingSession()
+    ef._forward(["a", "b", "c", "d", "e"])
+    assert calls == [2, 2, 1]
+    with pytest.raises(ValueError):
+        DynamicPaddingONNXMiniLM_L6_V2(graph_optimization_level="max")
+
+
+def test_falls_back_without_tuning_support(monkeypatch) -> None:
+    monkeypatch.setattr(onnx, "SUPPORTS_TUNING", False)
+    ef = onnx.default_embedding_function(intra_op_num_threads=2, quantized=True)
+    assert type(ef) is ONNXMiniLM_L6_V2
+
+
+def test_quantized_model_is_written_atomically(monkeypatch, tmp_path) -> None:
+    (tmp_path / "onnx").mkdir()
+    (tmp_path / "onnx" / "model.onnx").write_bytes(b"fp32")
+    final_path = tmp_path / "onnx" / "model_int8.onnx"
+
+    def quantize_dynamic(model_input, model_output, weight_type) -> None:
+        # the final model only appears once it is completely written
+        assert not final_path.exists()
+        with open(model_output, "wb") as f:
+            f.write(b"int8")
+
+    monkeypatch.setitem(
+        sys.modules,
+        "onnxruntime.quantization",
+        types.SimpleNamespace(
+            QuantType=types.SimpleNamespace(QInt8=None),
+            quantize_dynamic=quantize_dynamic,
+        ),
+    )
+    ef = DynamicPaddingONNXMiniLM_L6_V2(quantized=True)
+    ef.DOWNLOAD_PATH = tmp_path
+    assert ef._model_path() == str(final_path)
+    assert final_path.read_bytes() == b"int8"
+    assert sorted(p.name for p in (tmp_path / "onnx").iterdir()) == [
+        "model.onnx",
+        "model_int8.onnx",
+    ]
+
+
+def test_benchmark_configurations() -> None:
+    results = benchmark_configurations(
+        ["a", "b"],
+        [{"dimension": 4}, {"dimension": 8}],
+        factory=HashEmbeddingFunction,
+    )
+    assert [r["dimension"] for r in results] == [4, 8]
+    assert all(r["docs_per_second"] > 0 for r in results)
@@ -0,0 +1,50 @@
+import itertools
+
+import numpy as np
+import pytest
+from jinja2 import Environment
+
+from chroma_dp import EmbeddableTextResource
+from chroma_dp.utils.templating import DocumentTemplate
+
+_DOCS = [
+    EmbeddableTextResource(
+        id="doc-1",
+        text_chunk="some text",
+        metadata={"key": "value", "n": 1.5, "flag": True, "items": 3},
+        embedding=np.ones(4, dtype=np.float32),
+    ),
+    EmbeddableTextResource(id=None, text_chunk=None, metadata=None, embedding=None),
+]
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "{{ metadata.key }}-{{ counter() }}",
+        "{{metadata.n}}/{{ metadata['flag'] }}:{{ metadata[\"items\"] }}-{{id}}",
+        "{{ text_chunk }} {{ metadata.missing }}",
+        "{{ metadata.key }}{# comment #}",
+        "prefix-{{ metadata.key | upper }}",
+        "{% if metadata %}{{ metadata.key }}{% endif %}",
+        "{{ embedding }}",
+        "{{ id }}\n",
+    ],
+)
+def test_document_template_renders_like_jinja(source: str) -> None:
+    template = DocumentTemplate(
+        source, env=Environment(), counter=itertools.count().__next__
+    )
+    counter = itertools.count().__next__
+    for doc in _DOCS:
+        expected = (
+            Environment()
+            .from_string(source)
+            .render(counter=counter, **doc.model_dump())
+        )
+        assert template.render(doc) == expected
+
+
+def test_document_template_fields() -> None:
+    assert DocumentTemplate("{{ metadata.key }}-{{ id }}").fields == ["id", "metadata"]
+    assert DocumentTemplate("{{ embedding | length }}").fields == ["embedding"]